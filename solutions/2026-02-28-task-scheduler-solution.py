@@ -0,0 +1,1177 @@
+"""
+Reference Solution: 2026-02-28 — Task Scheduler
+Language: Python | Difficulty: Advanced
+
+## Approach
+
+1. **Kahn's algorithm for order + cycle detection.**
+   Count in-degrees, seed a deque with every task that has none, and pop
+   tasks while decrementing their dependents. If fewer tasks come out than
+   went in, whatever is left sits on a cycle.
+
+2. **Earliest start = max finish of the deps.**
+   Walking the topological order guarantees every dependency's start time
+   is final before we look at a task, so one pass is enough. The total
+   build time is the largest finish time — the critical path length.
+
+3. **Execution is dynamic, not replayed.**
+   `solve` predicts start times from declared durations, but real tasks
+   never take exactly that long. `execute` / `execute_async` keep the same
+   in-degree bookkeeping live: a task is dispatched the moment its last
+   dependency finishes and a worker slot is free. When more tasks are
+   ready than there are slots, the one with the longest remaining path
+   (duration + longest chain of dependents) goes first — the classic
+   critical-path list-scheduling heuristic.
+
+4. **Observed vs predicted.**
+   Every run records its real start/finish (seconds since the run began),
+   and the report keeps the `solve` prediction next to it so drift can be
+   inspected per task.
+
+5. **Content-hash fingerprints for incremental runs.**
+   A task's fingerprint hashes its name, optional `key`, the contents of
+   its `inputs` files and the fingerprints of its deps — a Merkle chain,
+   so any upstream change ripples down. A `TaskCache` directory maps
+   fingerprint -> pickled result; tasks whose fingerprint is cached are
+   skipped and count as zero duration in the schedule.
+
+6. **Forward + backward passes for analytics.**
+   The forward pass gives each task's earliest start; a backward pass gives
+   its tail (longest chain after it finishes), hence latest start and
+   slack. What-if queries are O(1): the new total is the longer of the
+   path forced through the changed task (earliest start + new duration +
+   tail) and the longest path that avoids it. The latter is precomputed
+   for every task in one sweep over the topological order — a path
+   avoiding position p lies wholly before p, wholly after p, or uses an
+   edge that jumps over p.
+
+7. **Cycles are reported, not just detected.**
+   Kahn's algorithm stays the fast path. Only when it stalls do we run
+   Tarjan's SCC algorithm — iteratively, with an explicit stack of
+   (node, successor-iterator) frames so 200k-task chains don't hit the
+   recursion limit — over the tasks Kahn could not order, and raise
+   `CircularDependencyError` carrying each strongly connected component.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import heapq
+import os
+import pickle
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Awaitable, Callable, Collection
+
+
+# ──────────────────────────────────────────────
+# Static scheduling
+# ──────────────────────────────────────────────
+
+class CircularDependencyError(ValueError):
+    """
+    Raised when the task graph has a cycle.
+
+    `cycles` lists every strongly connected component involved (each sorted,
+    largest first); a task that depends on itself forms a component of one.
+    """
+
+    def __init__(self, cycles: list[list[str]]):
+        shown = "; ".join(" <-> ".join(c[:8]) + (" ..." if len(c) > 8 else "") for c in cycles[:3])
+        more = f" (+{len(cycles) - 3} more)" if len(cycles) > 3 else ""
+        super().__init__(f"Circular dependency detected: {shown}{more}")
+        self.cycles = cycles
+
+
+def _strongly_connected(nodes: list[str], succ: dict[str, list[str]]) -> list[list[str]]:
+    """Iterative Tarjan: every SCC of the graph restricted to `nodes`."""
+    index: dict[str, int] = {}
+    low: dict[str, int] = {}
+    on_stack: set[str] = set()
+    stack: list[str] = []
+    components: list[list[str]] = []
+
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(succ[root]))]
+        while work:
+            node, successors = work[-1]
+            for nxt in successors:
+                if nxt not in index:
+                    index[nxt] = low[nxt] = len(index)
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(succ[nxt])))
+                    break
+                if nxt in on_stack:
+                    low[node] = min(low[node], index[nxt])
+            else:
+                # All successors explored: fold low-link into the parent and
+                # pop a component if this node is its root.
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+def find_cycles(tasks: dict[str, dict[str, Any]]) -> list[list[str]]:
+    """
+    Return the strongly connected components that make the graph cyclic.
+
+    Components are sorted internally and ordered largest first; an acyclic
+    graph returns []. Unknown deps are ignored here (`solve` reports them).
+    """
+    succ = {name: [d for d in spec["deps"] if d in tasks] for name, spec in tasks.items()}
+    cycles = [
+        sorted(c) for c in _strongly_connected(list(tasks), succ)
+        if len(c) > 1 or c[0] in succ[c[0]]
+    ]
+    cycles.sort(key=lambda c: (-len(c), c))
+    return cycles
+
+
+def _kahn(tasks: dict[str, dict[str, Any]]) -> tuple[list[str], dict[str, list[str]]]:
+    """Return (topological order, dependents adjacency list)."""
+    dependents: dict[str, list[str]] = {name: [] for name in tasks}
+    indegree: dict[str, int] = {}
+    for name, spec in tasks.items():
+        deps = spec["deps"]
+        indegree[name] = len(deps)
+        for dep in deps:
+            if dep not in tasks:
+                raise ValueError(f"Task '{name}' depends on unknown task '{dep}'")
+            dependents[dep].append(name)
+
+    queue = deque(name for name, degree in indegree.items() if degree == 0)
+    order: list[str] = []
+    while queue:
+        name = queue.popleft()
+        order.append(name)
+        for child in dependents[name]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                queue.append(child)
+
+    if len(order) != len(tasks):
+        # Only the tasks Kahn could not order can be on (or behind) a cycle.
+        ordered = set(order)
+        stuck = {name: tasks[name] for name in tasks if name not in ordered}
+        raise CircularDependencyError(find_cycles(stuck))
+    return order, dependents
+
+
+def topological_order(tasks: dict[str, dict[str, Any]]) -> list[str]:
+    """Return a valid execution order, raising ValueError on a cycle."""
+    return _kahn(tasks)[0]
+
+
+def _durations(tasks: dict[str, dict[str, Any]], skip: Collection[str] = ()) -> dict[str, int]:
+    return {name: 0 if name in skip else spec["duration"] for name, spec in tasks.items()}
+
+
+def solve(
+    tasks: dict[str, dict[str, Any]],
+    skip: Collection[str] = (),
+) -> tuple[list[tuple[int, str]], int]:
+    """
+    Resolve task dependencies and compute a parallel schedule.
+
+    Returns (schedule, total_time) where schedule is a sorted list of
+    (start_time, task_name) tuples and total_time is the minimum wall-clock
+    time with unlimited parallelism. Tasks named in `skip` (e.g. cache hits
+    from `plan_incremental`) are scheduled with zero duration.
+    """
+    order, _ = _kahn(tasks)
+    duration = _durations(tasks, skip)
+    start: dict[str, int] = {}
+    total_time = 0
+    for name in order:
+        begin = max((start[dep] + duration[dep] for dep in tasks[name]["deps"]), default=0)
+        start[name] = begin
+        total_time = max(total_time, begin + duration[name])
+
+    schedule = sorted((begin, name) for name, begin in start.items())
+    return schedule, total_time
+
+
+# ──────────────────────────────────────────────
+# Critical-path analytics
+# ──────────────────────────────────────────────
+
+@dataclass
+class ScheduleAnalysis:
+    """Forward/backward pass results for one task graph."""
+    total_time: int
+    earliest_start: dict[str, int]
+    latest_start: dict[str, int]
+    slack: dict[str, int]
+    _tasks: dict[str, dict[str, Any]] = field(repr=False)
+    _duration: dict[str, int] = field(repr=False)
+    _dependents: dict[str, list[str]] = field(repr=False)
+    _tail: dict[str, int] = field(repr=False)
+    _avoid: dict[str, int] = field(repr=False)
+
+    @property
+    def critical_tasks(self) -> set[str]:
+        """Tasks with zero slack — delaying any of them delays the build."""
+        return {name for name, s in self.slack.items() if s == 0}
+
+    def _critical_next(self, name: str) -> list[str]:
+        finish = self.earliest_start[name] + self._duration[name]
+        return sorted(
+            child for child in set(self._dependents[name])
+            if self.slack[child] == 0 and self.earliest_start[child] == finish
+        )
+
+    def critical_paths(self, limit: int | None = None) -> list[list[str]]:
+        """
+        Every chain of zero-slack tasks running back-to-back from time 0 to
+        total_time (up to `limit` of them — there can be exponentially many).
+        """
+        paths: list[list[str]] = []
+        starts = sorted(
+            name for name in self.critical_tasks
+            if self.earliest_start[name] == 0 and not self._tasks[name]["deps"]
+        )
+        stack = [[name] for name in reversed(starts)]
+        while stack and (limit is None or len(paths) < limit):
+            path = stack.pop()
+            last = path[-1]
+            nxt = self._critical_next(last)
+            if not nxt:
+                if self.earliest_start[last] + self._duration[last] == self.total_time:
+                    paths.append(path)
+                continue
+            stack.extend(path + [child] for child in reversed(nxt))
+        return paths
+
+    def critical_path(self) -> list[str]:
+        """One critical path (empty for an empty graph)."""
+        paths = self.critical_paths(limit=1)
+        return paths[0] if paths else []
+
+    def what_if(self, task: str, duration: int) -> int:
+        """Total time if `task` took `duration` instead — O(1)."""
+        if task not in self._duration:
+            raise KeyError(task)
+        through = self.earliest_start[task] + duration + self._tail[task]
+        return max(through, self._avoid[task])
+
+    def bottlenecks(self, top: int | None = None) -> list[tuple[str, int]]:
+        """
+        Rank tasks by how much total time would drop if they took zero time.
+
+        Returns (task_name, saving) pairs, largest saving first; tasks whose
+        speed-up would not shorten the build are left out.
+        """
+        savings = [
+            (name, self.total_time - self.what_if(name, 0))
+            for name in self._duration
+        ]
+        ranked = sorted((pair for pair in savings if pair[1] > 0), key=lambda p: (-p[1], p[0]))
+        return ranked[:top] if top is not None else ranked
+
+
+def analyze(tasks: dict[str, dict[str, Any]], skip: Collection[str] = ()) -> ScheduleAnalysis:
+    """Run the forward and backward passes and precompute what-if tables."""
+    order, dependents = _kahn(tasks)
+    duration = _durations(tasks, skip)
+
+    earliest: dict[str, int] = {}
+    for name in order:
+        earliest[name] = max((earliest[d] + duration[d] for d in tasks[name]["deps"]), default=0)
+    total_time = max((earliest[n] + duration[n] for n in order), default=0)
+
+    tail: dict[str, int] = {}
+    for name in reversed(order):
+        tail[name] = max((duration[c] + tail[c] for c in dependents[name]), default=0)
+    latest = {name: total_time - duration[name] - tail[name] for name in order}
+    slack = {name: latest[name] - earliest[name] for name in order}
+
+    # Longest path avoiding each task, by position p in the topological order:
+    #   before[p]  — longest path wholly inside order[:p]  (prefix max of finish)
+    #   after[p]   — longest path wholly inside order[p+1:] (suffix max of head)
+    #   crossing   — best edge (u, v) with pos(u) < p < pos(v), found with a
+    #                lazily-pruned max-heap as p sweeps forward.
+    n = len(order)
+    pos = {name: i for i, name in enumerate(order)}
+    after = [0] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        name = order[i]
+        after[i] = max(after[i + 1], duration[name] + tail[name])
+
+    edges_from: list[list[tuple[int, int]]] = [[] for _ in range(n)]
+    for child in order:
+        head = duration[child] + tail[child]
+        for dep in set(tasks[child]["deps"]):
+            edges_from[pos[dep]].append((-(earliest[dep] + duration[dep] + head), pos[child]))
+
+    avoid: dict[str, int] = {}
+    heap: list[tuple[int, int]] = []
+    before = 0
+    for p, name in enumerate(order):
+        if p:
+            prev = order[p - 1]
+            before = max(before, earliest[prev] + duration[prev])
+            for edge in edges_from[p - 1]:
+                heapq.heappush(heap, edge)
+        while heap and heap[0][1] <= p:
+            heapq.heappop(heap)
+        crossing = -heap[0][0] if heap else 0
+        avoid[name] = max(before, after[p + 1], crossing)
+
+    return ScheduleAnalysis(
+        total_time=total_time,
+        earliest_start=earliest,
+        latest_start=latest,
+        slack=slack,
+        _tasks=tasks,
+        _duration=duration,
+        _dependents=dependents,
+        _tail=tail,
+        _avoid=avoid,
+    )
+
+
+# ──────────────────────────────────────────────
+# Fingerprints and result cache
+# ──────────────────────────────────────────────
+
+_MISSING_FILE = b"\0missing"
+
+
+def _file_digest(path: str) -> bytes:
+    """SHA-256 of a file's contents, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+    except FileNotFoundError:
+        # A missing input still fingerprints deterministically, and
+        # creating the file later changes the fingerprint.
+        return _MISSING_FILE
+    return digest.digest()
+
+
+def fingerprint_tasks(tasks: dict[str, dict[str, Any]]) -> dict[str, str]:
+    """
+    Compute a content fingerprint for every task.
+
+    Optional task fields:
+        inputs: list of file paths whose contents the task reads.
+        key: any string that should invalidate the task when it changes
+            (a command line, a tool version, ...).
+
+    Each fingerprint also folds in its deps' fingerprints, so a change
+    anywhere upstream changes every task downstream of it.
+    """
+    order, _ = _kahn(tasks)
+    fingerprints: dict[str, str] = {}
+    for name in order:
+        spec = tasks[name]
+        digest = hashlib.sha256()
+        digest.update(name.encode())
+        digest.update(b"\0" + str(spec.get("key", "")).encode())
+        for path in sorted(spec.get("inputs", ())):
+            digest.update(b"\0" + os.fsencode(path) + b"\0")
+            digest.update(_file_digest(path))
+        for dep in sorted(set(spec["deps"])):
+            digest.update(b"\0" + fingerprints[dep].encode())
+        fingerprints[name] = digest.hexdigest()
+    return fingerprints
+
+
+class TaskCache:
+    """
+    Persistent fingerprint -> result store: one pickle file per entry.
+
+    Writes go to a temp file and are renamed into place, so a crash never
+    leaves a half-written entry that a later run would trust.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, fingerprint: str) -> str:
+        return os.path.join(self.directory, fingerprint + ".pickle")
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return os.path.exists(self._path(fingerprint))
+
+    def get(self, fingerprint: str) -> Any:
+        with open(self._path(fingerprint), "rb") as f:
+            return pickle.load(f)
+
+    def put(self, fingerprint: str, result: Any) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f)
+            os.replace(tmp, self._path(fingerprint))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def plan_incremental(
+    tasks: dict[str, dict[str, Any]],
+    cache: TaskCache,
+) -> tuple[dict[str, str], set[str]]:
+    """Return (fingerprints, names of tasks whose result is already cached)."""
+    fingerprints = fingerprint_tasks(tasks)
+    return fingerprints, {name for name, fp in fingerprints.items() if fp in cache}
+
+
+# ──────────────────────────────────────────────
+# Execution engine
+# ──────────────────────────────────────────────
+
+@dataclass
+class TaskRun:
+    """Observed timing of one task, in seconds since the run started."""
+    name: str
+    start: float
+    finish: float
+    result: Any = None
+    cached: bool = False
+
+    @property
+    def duration(self) -> float:
+        return self.finish - self.start
+
+
+@dataclass
+class ExecutionReport:
+    """Real timings of an execution alongside the `solve` prediction."""
+    runs: dict[str, TaskRun] = field(default_factory=dict)
+    predicted_start: dict[str, int] = field(default_factory=dict)
+    predicted_total: int = 0
+    total_time: float = 0.0
+
+    def drift(self) -> dict[str, float]:
+        """Actual minus predicted start time for every task that ran."""
+        return {name: run.start - self.predicted_start[name] for name, run in self.runs.items()}
+
+
+class TaskFailedError(RuntimeError):
+    """Raised by the executors when a task's callable raises."""
+
+    def __init__(self, task: str, error: BaseException):
+        super().__init__(f"Task '{task}' failed: {error!r}")
+        self.task = task
+
+
+class _ReadyQueue:
+    """
+    Live in-degree tracking for dynamic dispatch.
+
+    Ready tasks sit in a heap keyed by their bottom level (own duration plus
+    the longest chain of dependents), so with limited slots the task that
+    gates the most remaining work is started first.
+    """
+
+    def __init__(self, tasks: dict[str, dict[str, Any]], skip: Collection[str] = ()):
+        order, dependents = _kahn(tasks)
+        duration = _durations(tasks, skip)
+        self._dependents = dependents
+        self._pending = {name: len(tasks[name]["deps"]) for name in order}
+
+        self._level: dict[str, int] = {}
+        for name in reversed(order):
+            tail = max((self._level[child] for child in dependents[name]), default=0)
+            self._level[name] = duration[name] + tail
+
+        self._heap = [(-self._level[name], name) for name in order if self._pending[name] == 0]
+        heapq.heapify(self._heap)
+
+    def __bool__(self) -> bool:
+        return bool(self._heap)
+
+    def pop(self) -> str:
+        return heapq.heappop(self._heap)[1]
+
+    def complete(self, name: str) -> None:
+        for child in self._dependents[name]:
+            self._pending[child] -= 1
+            if self._pending[child] == 0:
+                heapq.heappush(self._heap, (-self._level[child], child))
+
+
+def _check_actions(tasks: dict[str, dict[str, Any]], actions: dict[str, Callable]) -> None:
+    missing = sorted(tasks.keys() - actions.keys())
+    if missing:
+        raise ValueError(f"No action given for tasks: {missing}")
+
+
+def _timed_call(action: Callable[[], Any]) -> tuple[float, float, Any]:
+    """
+    Run an action and time it from inside the worker.
+
+    time.monotonic() reads a system-wide clock, so stamps taken in a pool
+    process are comparable with the parent's.
+    """
+    start = time.monotonic()
+    result = action()
+    return start, time.monotonic(), result
+
+
+async def _timed_await(action: Callable[[], Awaitable[Any]]) -> tuple[float, float, Any]:
+    start = time.monotonic()
+    result = await action()
+    return start, time.monotonic(), result
+
+
+class _Run:
+    """Per-execution state shared by the thread/process and async drivers."""
+
+    def __init__(
+        self,
+        tasks: dict[str, dict[str, Any]],
+        actions: dict[str, Callable],
+        cache: TaskCache | None,
+    ):
+        _check_actions(tasks, actions)
+        self.cache = cache
+        if cache is not None:
+            self.fingerprints, skip = plan_incremental(tasks, cache)
+        else:
+            self.fingerprints, skip = {}, set()
+        self.skip = skip
+        self.ready = _ReadyQueue(tasks, skip)
+        schedule, total = solve(tasks, skip)
+        self.report = ExecutionReport(
+            predicted_start={name: begin for begin, name in schedule},
+            predicted_total=total,
+        )
+        self.failure: TaskFailedError | None = None
+        self.t0 = time.monotonic()
+
+    def next_to_dispatch(self) -> str | None:
+        """Pop the next task that needs a worker, resolving cache hits inline."""
+        while self.failure is None and self.ready:
+            name = self.ready.pop()
+            if name not in self.skip:
+                return name
+            now = time.monotonic() - self.t0
+            result = self.cache.get(self.fingerprints[name])
+            self.report.runs[name] = TaskRun(name, now, now, result, cached=True)
+            self.ready.complete(name)
+        return None
+
+    def finished(self, name: str, error: BaseException | None, outcome: Any) -> None:
+        if error is not None:
+            if self.failure is None:
+                self.failure = TaskFailedError(name, error)
+                self.failure.__cause__ = error
+            return
+        start, finish, result = outcome
+        self.report.runs[name] = TaskRun(name, start - self.t0, finish - self.t0, result)
+        if self.cache is not None:
+            self.cache.put(self.fingerprints[name], result)
+        self.ready.complete(name)
+
+    def close(self) -> ExecutionReport:
+        if self.failure is not None:
+            raise self.failure
+        self.report.total_time = time.monotonic() - self.t0
+        return self.report
+
+
+def execute(
+    tasks: dict[str, dict[str, Any]],
+    actions: dict[str, Callable[[], Any]],
+    mode: str = "thread",
+    max_workers: int | None = None,
+    cache: TaskCache | None = None,
+) -> ExecutionReport:
+    """
+    Run every task's action, starting each as soon as its deps finish.
+
+    Args:
+        tasks: the same mapping `solve` takes.
+        actions: task_name -> zero-argument callable. In "process" mode the
+            callables must be picklable (module-level functions, partials).
+        mode: "thread", "process" or "async". "async" expects coroutine
+            functions and runs them on a fresh event loop.
+        max_workers: concurrency limit. Defaults to the CPU count in
+            "thread" and "process" mode; in "async" mode the default is no
+            limit, as coroutines waiting on I/O don't compete for CPUs.
+        cache: optional TaskCache. Tasks whose fingerprint is cached are not
+            run (their TaskRun has cached=True and the stored result); fresh
+            results are written back.
+
+    Raises:
+        ValueError: on cycles, unknown deps, missing actions or a bad mode.
+        TaskFailedError: if an action raises. Tasks already running are
+            allowed to finish; nothing new is dispatched.
+    """
+    if mode == "async":
+        return asyncio.run(execute_async(tasks, actions, max_concurrency=max_workers, cache=cache))
+    pools = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+    if mode not in pools:
+        raise ValueError(f"Unknown execution mode: {mode!r}")
+
+    run = _Run(tasks, actions, cache)
+    limit = max_workers or os.cpu_count() or 1
+
+    # The pool gets exactly `limit` workers, so a submitted task starts
+    # immediately instead of queueing inside the executor.
+    with pools[mode](max_workers=limit) as pool:
+        running: dict[Future, str] = {}
+        while True:
+            while len(running) < limit and (name := run.next_to_dispatch()) is not None:
+                running[pool.submit(_timed_call, actions[name])] = name
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                run.finished(running.pop(future), error, None if error else future.result())
+
+    return run.close()
+
+
+async def execute_async(
+    tasks: dict[str, dict[str, Any]],
+    actions: dict[str, Callable[[], Awaitable[Any]]],
+    max_concurrency: int | None = None,
+    cache: TaskCache | None = None,
+) -> ExecutionReport:
+    """
+    Async counterpart of `execute`: actions are coroutine functions run on
+    the current loop, at most `max_concurrency` at a time (unbounded if None).
+    """
+    run = _Run(tasks, actions, cache)
+    limit = max_concurrency or max(len(tasks), 1)
+
+    running: dict[asyncio.Task, str] = {}
+    while True:
+        while len(running) < limit and (name := run.next_to_dispatch()) is not None:
+            running[asyncio.ensure_future(_timed_await(actions[name]))] = name
+        if not running:
+            break
+
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            run.finished(running.pop(task), error, None if error else task.result())
+
+    return run.close()
+
+
+# ──────────────────────────────────────────────
+# Benchmarks
+# ──────────────────────────────────────────────
+
+def generate_dag(kind: str, n: int, edges: int = 0, seed: int = 0) -> dict[str, dict[str, Any]]:
+    """
+    Build a synthetic task graph for benchmarking.
+
+    kind:
+        "chain"   — t0 <- t1 <- ... (n - 1 edges, the deepest possible graph)
+        "layered" — sqrt(n) layers; every task depends on up to
+                    edges / n random tasks from the previous layer
+        "random"  — `edges` deps drawn uniformly from lower-numbered tasks
+                    (none when n < 2: there is no lower-numbered task)
+    """
+    rng = random.Random(seed)
+    names = [f"t{i}" for i in range(n)]
+    deps: list[list[str]] = [[] for _ in range(n)]
+    if kind == "chain":
+        for i in range(1, n):
+            deps[i].append(names[i - 1])
+    elif kind == "layered":
+        width = max(1, int(n ** 0.5))
+        per_task = max(1, edges // n) if edges else 2
+        for i in range(width, n):
+            layer_start = (i // width - 1) * width
+            k = min(per_task, width)
+            deps[i] = [names[j] for j in rng.sample(range(layer_start, layer_start + width), k)]
+    elif kind == "random":
+        for _ in range(edges if n > 1 else 0):
+            j = rng.randrange(1, n)
+            deps[j].append(names[rng.randrange(j)])
+    else:
+        raise ValueError(f"Unknown graph kind: {kind!r}")
+    return {
+        name: {"duration": rng.randint(1, 100), "deps": d}
+        for name, d in zip(names, deps)
+    }
+
+
+def _measure(fn: Callable[[], Any]) -> tuple[float, float]:
+    """(seconds, peak MiB) — timed without tracemalloc, then traced once."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def run_benchmarks(scale: float = 1.0) -> None:
+    """
+    Time and memory of solve() and cycle reporting on synthetic graphs.
+
+        python 2026-02-28-task-scheduler-solution.py --bench [scale]
+
+    scale=1.0 goes up to 500k tasks / 3M edges.
+    """
+    cases = [
+        ("chain", 200_000, 0),
+        ("layered", 100_000, 1_000_000),
+        ("random", 100_000, 1_000_000),
+        ("random", 500_000, 3_000_000),
+    ]
+    print(f"{'graph':<10}{'tasks':>10}{'edges':>12}{'solve s':>10}{'peak MiB':>10}")
+    for kind, n, m in cases:
+        n, m = int(n * scale), int(m * scale)
+        tasks = generate_dag(kind, n, m)
+        m = sum(len(spec["deps"]) for spec in tasks.values())
+        elapsed, peak = _measure(lambda: solve(tasks))
+        print(f"{kind:<10}{n:>10,}{m:>12,}{elapsed:>10.2f}{peak:>10.1f}")
+
+    # One back edge closes a cycle through the whole 200k-task chain.
+    n = int(200_000 * scale)
+    tasks = generate_dag("chain", n)
+    tasks["t0"]["deps"].append(f"t{n - 1}")
+
+    def report_cycle():
+        try:
+            solve(tasks)
+        except CircularDependencyError as e:
+            assert len(e.cycles[0]) == n
+
+    elapsed, peak = _measure(report_cycle)
+    print(f"{'cycle':<10}{n:>10,}{n:>12,}{elapsed:>10.2f}{peak:>10.1f}")
+
+
+# ─── Tests ───────────────────────────────────────────────────────────
+
+BUILD = {
+    "compile":   {"duration": 5, "deps": ["parse"]},
+    "parse":     {"duration": 3, "deps": ["lex"]},
+    "lex":       {"duration": 2, "deps": []},
+    "link":      {"duration": 4, "deps": ["compile", "resources"]},
+    "resources": {"duration": 1, "deps": []},
+    "test":      {"duration": 6, "deps": ["link"]},
+}
+
+
+def test_basic():
+    schedule, total_time = solve(BUILD)
+    assert total_time == 20, f"Expected 20, got {total_time}"
+    assert schedule == [
+        (0, "lex"), (0, "resources"), (2, "parse"),
+        (5, "compile"), (10, "link"), (14, "test"),
+    ], f"Unexpected schedule: {schedule}"
+    print("✅ test_basic passed")
+
+
+def test_circular():
+    tasks = {
+        "a": {"duration": 1, "deps": ["b"]},
+        "b": {"duration": 1, "deps": ["c"]},
+        "c": {"duration": 1, "deps": ["a"]},
+    }
+    try:
+        solve(tasks)
+        assert False, "Should have raised ValueError"
+    except ValueError as e:
+        assert "ircular" in str(e)
+    print("✅ test_circular passed")
+
+
+def test_cycle_report():
+    tasks = {
+        "a": {"duration": 1, "deps": ["b"]},
+        "b": {"duration": 1, "deps": ["a"]},
+        "c": {"duration": 1, "deps": ["a"]},       # blocked, not on a cycle
+        "d": {"duration": 1, "deps": ["d"]},       # self-loop
+        "x": {"duration": 1, "deps": ["z"]},
+        "y": {"duration": 1, "deps": ["x"]},
+        "z": {"duration": 1, "deps": ["y"]},
+        "ok": {"duration": 1, "deps": []},
+    }
+    try:
+        solve(tasks)
+        assert False, "Should have raised CircularDependencyError"
+    except CircularDependencyError as e:
+        assert e.cycles == [["x", "y", "z"], ["a", "b"], ["d"]], e.cycles
+        assert "Circular dependency detected" in str(e)
+    assert find_cycles({"ok": {"duration": 1, "deps": []}}) == []
+    print("✅ test_cycle_report passed")
+
+
+def test_cycle_report_deep():
+    """A 200k-task cycle must not hit the recursion limit."""
+    n = 200_000
+    tasks = generate_dag("chain", n)
+    tasks["t0"]["deps"].append(f"t{n - 1}")
+    try:
+        solve(tasks)
+        assert False, "Should have raised CircularDependencyError"
+    except CircularDependencyError as e:
+        assert len(e.cycles) == 1 and len(e.cycles[0]) == n
+    print("✅ test_cycle_report_deep passed")
+
+
+def test_generate_dag():
+    for kind in ("chain", "layered", "random"):
+        tasks = generate_dag(kind, 400, 2_000, seed=1)
+        assert len(tasks) == 400
+        assert len(topological_order(tasks)) == 400
+    _, total = solve(generate_dag("chain", 50))
+    assert total >= 50
+    for kind in ("chain", "layered", "random"):
+        assert generate_dag(kind, 1, 10)["t0"]["deps"] == []
+    print("✅ test_generate_dag passed")
+
+
+def test_independent():
+    tasks = {
+        "a": {"duration": 3, "deps": []},
+        "b": {"duration": 5, "deps": []},
+        "c": {"duration": 2, "deps": []},
+    }
+    schedule, total_time = solve(tasks)
+    assert total_time == 5
+    assert all(t == 0 for t, _ in schedule)
+    print("✅ test_independent passed")
+
+
+def test_diamond():
+    tasks = {
+        "d": {"duration": 1, "deps": ["b", "c"]},
+        "b": {"duration": 3, "deps": ["a"]},
+        "c": {"duration": 2, "deps": ["a"]},
+        "a": {"duration": 1, "deps": []},
+    }
+    schedule, total_time = solve(tasks)
+    assert total_time == 5
+    assert schedule == [(0, "a"), (1, "b"), (1, "c"), (4, "d")]
+    print("✅ test_diamond passed")
+
+
+def test_unknown_dependency():
+    try:
+        solve({"a": {"duration": 1, "deps": ["ghost"]}})
+        assert False, "Should have raised ValueError"
+    except ValueError as e:
+        assert "ghost" in str(e)
+    print("✅ test_unknown_dependency passed")
+
+
+def _sleep_actions(tasks, scale=0.01):
+    return {name: partial(time.sleep, spec["duration"] * scale) for name, spec in tasks.items()}
+
+
+def _assert_deps_respected(tasks, report):
+    for name, spec in tasks.items():
+        for dep in spec["deps"]:
+            assert report.runs[name].start >= report.runs[dep].finish, f"{name} started before {dep} finished"
+
+
+def test_execute_threads():
+    # The two roots must overlap: "resources" waits until "lex" has started.
+    lex_started = threading.Event()
+    actions = _sleep_actions(BUILD)
+    lex = actions["lex"]
+    actions["lex"] = lambda: (lex_started.set(), lex())
+    actions["resources"] = partial(lex_started.wait, 5)
+    report = execute(BUILD, actions, mode="thread", max_workers=4)
+    assert set(report.runs) == set(BUILD)
+    _assert_deps_respected(BUILD, report)
+    assert report.runs["resources"].result is True, "Independent tasks did not run concurrently"
+    assert report.predicted_total == 20
+    # 20 units of critical path at 10ms each; only a lower bound is reliable.
+    assert report.total_time >= 0.19, f"Took {report.total_time:.3f}s"
+    assert set(report.drift()) == set(BUILD)
+    print("✅ test_execute_threads passed")
+
+
+def test_execute_concurrency_limit():
+    lock = threading.Lock()
+    active = peak = 0
+
+    def work():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+
+    tasks = {f"t{i}": {"duration": 1, "deps": []} for i in range(6)}
+    execute(tasks, {name: work for name in tasks}, max_workers=2)
+    assert peak == 2, f"Expected at most 2 concurrent tasks, saw {peak}"
+    print("✅ test_execute_concurrency_limit passed")
+
+
+def test_execute_critical_first():
+    """With one slot, the task heading the longest chain is dispatched first."""
+    tasks = {
+        "short": {"duration": 1, "deps": []},
+        "long":  {"duration": 1, "deps": []},
+        "tail":  {"duration": 9, "deps": ["long"]},
+    }
+    order = []
+    actions = {name: partial(order.append, name) for name in tasks}
+    execute(tasks, actions, max_workers=1)
+    assert order == ["long", "tail", "short"], order
+    print("✅ test_execute_critical_first passed")
+
+
+def test_execute_process():
+    tasks = {
+        "a": {"duration": 1, "deps": []},
+        "b": {"duration": 1, "deps": ["a"]},
+    }
+    actions = {"a": partial(pow, 2, 10), "b": partial(pow, 3, 2)}
+    report = execute(tasks, actions, mode="process", max_workers=2)
+    assert report.runs["a"].result == 1024
+    assert report.runs["b"].result == 9
+    _assert_deps_respected(tasks, report)
+    print("✅ test_execute_process passed")
+
+
+def test_execute_async():
+    def make(name, delay):
+        async def action():
+            await asyncio.sleep(delay)
+            return name.upper()
+        return action
+
+    lex_started = asyncio.Event()
+
+    async def lex():
+        lex_started.set()
+        return await make("lex", 0.02)()
+
+    async def resources():
+        await asyncio.wait_for(lex_started.wait(), 5)
+        return "RESOURCES"
+
+    actions = {name: make(name, spec["duration"] * 0.01) for name, spec in BUILD.items()}
+    actions.update(lex=lex, resources=resources)
+    report = execute(BUILD, actions, mode="async")
+    _assert_deps_respected(BUILD, report)
+    assert report.runs["link"].result == "LINK"
+    assert report.runs["resources"].result == "RESOURCES", "Independent tasks did not run concurrently"
+    assert report.total_time >= 0.19, f"Took {report.total_time:.3f}s"
+    print("✅ test_execute_async passed")
+
+
+def test_execute_failure():
+    ran = []
+
+    def boom():
+        raise RuntimeError("disk full")
+
+    tasks = {
+        "a": {"duration": 1, "deps": []},
+        "b": {"duration": 1, "deps": ["a"]},
+    }
+    try:
+        execute(tasks, {"a": boom, "b": partial(ran.append, "b")})
+        assert False, "Should have raised TaskFailedError"
+    except TaskFailedError as e:
+        assert e.task == "a"
+        assert isinstance(e.__cause__, RuntimeError)
+    assert ran == [], "Dependents of a failed task must not run"
+    print("✅ test_execute_failure passed")
+
+
+def test_fingerprints():
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "main.c")
+        with open(src, "w") as f:
+            f.write("int main() { return 0; }")
+        tasks = {
+            "compile": {"duration": 5, "deps": [], "inputs": [src]},
+            "link":    {"duration": 2, "deps": ["compile"], "key": "ld -O2"},
+            "docs":    {"duration": 1, "deps": []},
+        }
+        before = fingerprint_tasks(tasks)
+        assert before == fingerprint_tasks(tasks), "Fingerprints must be deterministic"
+
+        with open(src, "w") as f:
+            f.write("int main() { return 1; }")
+        after = fingerprint_tasks(tasks)
+        assert after["compile"] != before["compile"]
+        assert after["link"] != before["link"], "Upstream change must ripple down"
+        assert after["docs"] == before["docs"]
+
+        tasks["link"]["key"] = "ld -O3"
+        assert fingerprint_tasks(tasks)["link"] != after["link"]
+    print("✅ test_fingerprints passed")
+
+
+def test_incremental_schedule():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TaskCache(tmp)
+        fingerprints, skip = plan_incremental(BUILD, cache)
+        assert skip == set()
+        for name in ("lex", "parse", "compile"):
+            cache.put(fingerprints[name], name)
+
+        _, skip = plan_incremental(BUILD, cache)
+        assert skip == {"lex", "parse", "compile"}
+        schedule, total_time = solve(BUILD, skip)
+        # Only resources -> link -> test remain: 1 + 4 + 6, but link waits
+        # on resources (1), not on the skipped compile chain.
+        assert total_time == 11, f"Expected 11, got {total_time}"
+        assert (1, "link") in schedule
+    print("✅ test_incremental_schedule passed")
+
+
+def test_execute_with_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "lexer.l")
+        with open(src, "w") as f:
+            f.write("v1")
+        tasks = {name: dict(spec) for name, spec in BUILD.items()}
+        tasks["lex"]["inputs"] = [src]
+        calls = []
+        actions = {name: partial(calls.append, name) for name in tasks}
+        cache = TaskCache(os.path.join(tmp, "cache"))
+
+        first = execute(tasks, actions, cache=cache, max_workers=2)
+        assert sorted(calls) == sorted(tasks)
+        assert not any(run.cached for run in first.runs.values())
+
+        calls.clear()
+        second = execute(tasks, actions, cache=cache, max_workers=2)
+        assert calls == [], f"Nothing changed, but ran {calls}"
+        assert all(run.cached for run in second.runs.values())
+        assert second.predicted_total == 0
+
+        with open(src, "w") as f:
+            f.write("v2")
+        calls.clear()
+        execute(tasks, actions, cache=cache, max_workers=2)
+        # lex changed, so everything downstream of it reruns; resources doesn't.
+        assert sorted(calls) == ["compile", "lex", "link", "parse", "test"], calls
+    print("✅ test_execute_with_cache passed")
+
+
+def test_analyze_slack():
+    analysis = analyze(BUILD)
+    assert analysis.total_time == 20
+    assert analysis.latest_start["resources"] == 9
+    assert analysis.slack["resources"] == 9
+    assert analysis.critical_tasks == {"lex", "parse", "compile", "link", "test"}
+    assert analysis.critical_path() == ["lex", "parse", "compile", "link", "test"]
+    print("✅ test_analyze_slack passed")
+
+
+def test_critical_paths_tie():
+    tasks = {
+        "a": {"duration": 1, "deps": []},
+        "b": {"duration": 2, "deps": ["a"]},
+        "c": {"duration": 2, "deps": ["a"]},
+        "d": {"duration": 1, "deps": ["b", "c"]},
+    }
+    paths = analyze(tasks).critical_paths()
+    assert paths == [["a", "b", "d"], ["a", "c", "d"]], paths
+    assert len(analyze(tasks).critical_paths(limit=1)) == 1
+    print("✅ test_critical_paths_tie passed")
+
+
+def test_what_if():
+    analysis = analyze(BUILD)
+    assert analysis.what_if("compile", 1) == 16
+    assert analysis.what_if("compile", 0) == 15
+    assert analysis.what_if("resources", 12) == 22
+    assert analysis.what_if("link", 0) == 16
+    assert analysis.bottlenecks(top=2) == [("test", 6), ("compile", 5)]
+    assert "resources" not in dict(analysis.bottlenecks())
+    print("✅ test_what_if passed")
+
+
+def test_what_if_matches_resolve():
+    """Cross-check the O(1) answers against re-running solve()."""
+    rng = random.Random(7)
+    for _ in range(30):
+        n = rng.randint(1, 25)
+        tasks = {
+            f"t{i}": {
+                "duration": rng.randint(0, 9),
+                "deps": [f"t{j}" for j in range(i) if rng.random() < 0.2],
+            }
+            for i in range(n)
+        }
+        analysis = analyze(tasks)
+        for name in tasks:
+            for new in (0, 3, 15):
+                changed = {k: dict(v) for k, v in tasks.items()}
+                changed[name]["duration"] = new
+                assert analysis.what_if(name, new) == solve(changed)[1]
+    print("✅ test_what_if_matches_resolve passed")
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        args = sys.argv[sys.argv.index("--bench") + 1:]
+        run_benchmarks(float(args[0]) if args else 1.0)
+        sys.exit()
+
+    test_basic()
+    test_circular()
+    test_cycle_report()
+    test_cycle_report_deep()
+    test_generate_dag()
+    test_independent()
+    test_diamond()
+    test_unknown_dependency()
+    test_execute_threads()
+    test_execute_concurrency_limit()
+    test_execute_critical_first()
+    test_execute_process()
+    test_execute_async()
+    test_execute_failure()
+    test_fingerprints()
+    test_incremental_schedule()
+    test_execute_with_cache()
+    test_analyze_slack()
+    test_critical_paths_tie()
+    test_what_if()
+    test_what_if_matches_resolve()
+    print("\n🎉 All tests passed!")
@@ -0,0 +1,1666 @@
+"""
+Reference Solution: 2026-03-01 — Async Rate Limiter
+Language: Python | Difficulty: Advanced
+
+## Approach
+
+The bucket itself is the textbook one: `tokens` refills continuously at
+`rate` per second up to `capacity`, computed lazily from the elapsed loop
+time whenever someone looks at it. What matters is how waiting works.
+
+1. **No lock on the fast path.**
+   asyncio runs one callback at a time on one thread, so "refill, compare,
+   subtract" with no `await` in between is already atomic. An
+   `asyncio.Lock` only adds overhead: an uncontended `acquire` is a refill
+   and a subtraction, nothing else.
+
+2. **FIFO of futures instead of sleep-and-retry.**
+   The naive design has every blocked coroutine compute a wait, sleep, wake
+   up, re-check, and usually sleep again — under contention N sleepers wake
+   for every token (thundering herd). Here a blocked caller parks a future
+   in a queue and awaits it. Exactly one timer exists per limiter, armed
+   for the moment the *head* waiter's tokens will have accrued. When it
+   fires, it grants as many waiters from the front as the bucket allows,
+   resolves their futures, and re-arms for the new head. Each waiter is
+   woken once, when it actually has its tokens.
+
+3. **No barging.**
+   While anyone is queued, `try_acquire` and new `acquire` calls go to the
+   back of the line rather than grabbing freshly refilled tokens. That
+   keeps the order strictly FIFO and means a large `acquire(n)` can't be
+   starved by a stream of small requests.
+
+4. **Cancellation is clean.**
+   A cancelled waiter is unlinked from the queue; if it was the head, the
+   timer is re-armed for the next one. If it was cancelled *after* being
+   granted but before it resumed, its tokens are put back.
+
+5. **Keyed limiter: one bucket per key, stored as columns.**
+   `KeyedRateLimiter` keeps hundreds of thousands of buckets without a
+   `RateLimiter` object each. A dict maps key -> slot, and the bucket state
+   lives in two `array('d')` columns (token count, last refill), i.e. 16
+   bytes of payload per key. Buckets are created lazily — already full —
+   and a bucket that has refilled to capacity is indistinguishable from
+   one that doesn't exist, so it can be dropped. Every call advances a
+   sweep cursor a few slots and frees full, idle ones; freed slots are
+   reused, so memory tracks the set of recently active keys. Waiter queues
+   exist only for keys that currently have blocked callers.
+
+6. **Other algorithms behind the same API.**
+   The waiting machinery (fast path, FIFO, single timer, cancellation)
+   lives in `_FifoLimiter`; an algorithm only says whether tokens can be
+   taken at time `now`, how long until they can, and how to refund. That
+   gives `GCRALimiter` (the token bucket as one timestamp),
+   `SlidingWindowLogLimiter` (exact trailing window),
+   `SlidingWindowCounterLimiter` (two counters, weighted) and
+   `LeakyBucketLimiter` (constant-rate outlet with a bounded queue), all
+   selectable with `create_limiter(name, rate, capacity)`.
+
+7. **Shared limiter: one bucket for every process on the host.**
+   `SharedRateLimiter` keeps (tokens, last refill) as two doubles in a
+   `multiprocessing.shared_memory` block, timestamped with
+   `time.monotonic()` (a system-wide clock), and updates them under a
+   `multiprocessing.Lock` held only for the read-modify-write. A blocked
+   `acquire` *reserves* its tokens — the count may go negative, i.e. into
+   debt — and sleeps exactly until the debt is repaid. Reservations are
+   serialized by the lock, so callers across processes are served in the
+   order they asked, with one sleep each and no polling. Cancelling a
+   reserved acquire gives its tokens back.
+
+8. **Time is injectable.**
+   Every limiter takes an optional `clock` (seconds, monotonic) and
+   `sleep` (async, used for the wake-up timer instead of `call_later`).
+   By default they use the running loop's clock. The test harness goes
+   further: `VirtualTimeLoop` is a real selector event loop whose clock
+   jumps straight to the next scheduled timer whenever nothing is ready
+   to run, so a scenario that "waits" ten seconds finishes in
+   microseconds and the elapsed times it observes are exact.
+
+9. **Priority classes and weighted-fair sharing among tenants.**
+   `acquire(tokens, priority=..., tenant=...)` queues by strict priority
+   class first (lower number first, so interactive traffic passes batch),
+   then by start-time fair queuing within the class: each waiter gets a
+   virtual start tag `max(class clock, tenant's last finish)` and the
+   tenant's finish advances by `tokens / weight`. The smallest start tag
+   is served next, so tenants share the rate in proportion to
+   `set_weight(tenant, w)`, and a large request is ordered by when it
+   *started* rather than by its size — once it is at the head, nothing
+   passes it and the tokens accrue for it. With the defaults (one class,
+   one tenant) the tags grow in arrival order and the queue is plain FIFO.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import math
+import multiprocessing
+import os
+import random
+import selectors
+import struct
+import sys
+import time
+import tracemalloc
+from array import array
+from collections import deque
+from multiprocessing.shared_memory import SharedMemory
+from typing import Awaitable, Callable, Hashable
+
+Clock = Callable[[], float]
+Sleep = Callable[[float], Awaitable[None]]
+
+# Slack, in seconds, for float rounding in admission checks. Without it, a
+# timer firing exactly on its deadline can find the bucket a rounding error
+# short and re-arm for a delay too small to move the clock forward at all.
+# Token-count comparisons use the tokens accrued in that time (_EPSILON * rate).
+_EPSILON = 1e-9
+
+
+def _call_later(
+    loop: asyncio.AbstractEventLoop,
+    sleep: Sleep | None,
+    delay: float,
+    callback: Callable[..., None],
+    *args,
+) -> asyncio.TimerHandle | asyncio.Task:
+    """A cancellable wake-up: a loop timer, or a task around an injected sleep."""
+    if sleep is None:
+        return loop.call_later(delay, callback, *args)
+
+    async def wake():
+        await sleep(delay)
+        callback(*args)
+
+    return loop.create_task(wake())
+
+
+class _WaiterQueue:
+    """
+    Blocked callers ordered by (priority, virtual start tag, arrival).
+
+    Entries are lists `[priority, start, seq, tokens, future, queued]` in
+    a heap. A cancelled entry stays in the heap until it surfaces at the
+    top, where `head` drops it; whichever of `head` and `discard` sees it
+    first clears `queued` and counts it out, so `_live` is always the number
+    of entries still waiting.
+    """
+
+    __slots__ = ("weights", "_heap", "_live", "_seq", "_clock", "_finish")
+
+    def __init__(self):
+        self.weights: dict[Hashable, float] = {}
+        self._heap: list[list] = []
+        self._live = 0
+        self._seq = 0
+        self._clock: dict[int, float] = {}  # priority -> start tag last served
+        self._finish: dict[tuple[int, Hashable], float] = {}
+
+    def __len__(self) -> int:
+        return self._live
+
+    def push(self, tokens: float, future: asyncio.Future, priority: int, tenant: Hashable) -> list:
+        key = (priority, tenant)
+        start = max(self._clock.get(priority, 0.0), self._finish.get(key, 0.0))
+        self._finish[key] = start + tokens / self.weights.get(tenant, 1.0)
+        entry = [priority, start, self._seq, tokens, future, True]
+        self._seq += 1
+        heapq.heappush(self._heap, entry)
+        self._live += 1
+        return entry
+
+    def _count_out(self, entry: list) -> None:
+        entry[5] = False
+        self._live -= 1
+        if not self._live:
+            self._reset()
+
+    def head(self) -> list | None:
+        heap = self._heap
+        while heap and heap[0][4].cancelled():
+            entry = heapq.heappop(heap)
+            if entry[5]:
+                self._count_out(entry)
+        return heap[0] if heap else None
+
+    def pop(self) -> list:
+        """Remove and return the head; call `head()` first."""
+        entry = heapq.heappop(self._heap)
+        self._clock[entry[0]] = entry[1]
+        self._count_out(entry)
+        return entry
+
+    def discard(self, entry: list) -> bool:
+        """Count out a cancelled entry. Returns True if it was the head."""
+        if not entry[5]:
+            return False  # `head` already dropped it.
+        heap = self._heap
+        while heap and heap[0] is not entry and heap[0][4].cancelled():
+            dropped = heapq.heappop(heap)
+            if dropped[5]:
+                self._count_out(dropped)
+        was_head = bool(heap) and heap[0] is entry
+        self._count_out(entry)
+        return was_head
+
+    def _reset(self) -> None:
+        # Nobody is waiting, so no tag needs to be compared with a future one.
+        self._heap.clear()
+        self._clock.clear()
+        self._finish.clear()
+
+
+class _FifoLimiter:
+    """
+    Shared waiting machinery: lock-free fast path, a queue of futures
+    (FIFO by default, see `_WaiterQueue`), and a single timer armed for the
+    head waiter.
+
+    Subclasses define the limiting policy through three hooks, all called
+    with the current clock reading:
+        _take(tokens, now)   -> bool   consume if allowed right now
+        _delay(tokens, now)  -> float  seconds until _take would succeed
+        _refund(tokens, now, granted)  give back tokens of a cancelled grant
+                                       made at time `granted`
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Clock | None = None,
+        sleep: Sleep | None = None,
+    ):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._waiters = _WaiterQueue()
+        self._timer: asyncio.TimerHandle | asyncio.Task | None = None
+        self._deadline = 0.0
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    def _now(self) -> float:
+        if self._clock is not None:
+            return self._clock()
+        return self._get_loop().time()
+
+    def _check(self, tokens: float) -> None:
+        if tokens <= 0 or tokens > self.capacity:
+            raise ValueError(f"tokens must be in (0, {self.capacity}], got {tokens}")
+
+    def _take(self, tokens: float, now: float) -> bool:
+        raise NotImplementedError
+
+    def _delay(self, tokens: float, now: float) -> float:
+        raise NotImplementedError
+
+    def _refund(self, tokens: float, now: float, granted: float) -> None:
+        raise NotImplementedError
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Try to consume tokens without waiting. Returns True on success."""
+        self._check(tokens)
+        if self._waiters:
+            return False  # Someone is already queued for the next tokens.
+        return self._take(tokens, self._now())
+
+    def set_weight(self, tenant: Hashable, weight: float) -> None:
+        """Give `tenant` a `weight`-times share of the rate (default 1)."""
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        self._waiters.weights[tenant] = weight
+
+    async def acquire(self, tokens: float = 1, priority: int = 0, tenant: Hashable = None) -> None:
+        """Consume tokens, waiting if necessary until they're available.
+
+        Waiters with a lower `priority` are served first; within a priority,
+        tenants share the rate by weight (see `set_weight`).
+        """
+        if self.try_acquire(tokens):
+            return
+
+        future = self._get_loop().create_future()
+        entry = self._waiters.push(tokens, future, priority, tenant)
+        if self._waiters.head() is entry:
+            # New head (first waiter, or it outranks the old head): re-aim.
+            if self._timer is not None:
+                self._timer.cancel()
+            self._arm_timer(entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            self._abandon(entry)
+            raise
+
+    # ── waiter queue ──────────────────────────────────────────────────
+
+    def _arm_timer(self, head: list) -> None:
+        """Schedule the single wake-up for when the `head` waiter can be served."""
+        now = self._now()
+        delay = max(self._delay(head[3], now), 0.0)
+        self._deadline = now + delay
+        self._timer = _call_later(self._get_loop(), self._sleep, delay, self._dispatch)
+
+    def _dispatch(self) -> None:
+        """Timer callback: grant waiters from the front while the policy allows."""
+        self._timer = None
+        now = self._now()
+        waiters = self._waiters
+        # head() skips waiters cancelled since the timer was armed, even
+        # ones cancelled in this same loop iteration.
+        while (head := waiters.head()) is not None:
+            if not self._take(head[3], now):
+                self._arm_timer(head)
+                return
+            waiters.pop()
+            head[4].set_result(now)  # The grant time, in case it is refunded.
+
+    def _abandon(self, entry: list) -> None:
+        tokens, future = entry[3], entry[4]
+        if not future.cancelled():
+            # Granted, then cancelled before it could resume: refund.
+            self._refund(tokens, self._now(), future.result())
+            if self._timer is not None:
+                self._timer.cancel()
+                self._dispatch()
+            return
+        was_head = self._waiters.discard(entry)
+        if was_head and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+            self._dispatch()
+
+
+class RateLimiter(_FifoLimiter):
+    """Token-bucket rate limiter for async code.
+
+    Args:
+        rate: Tokens added per second.
+        capacity: Maximum tokens (burst size).
+        clock: Monotonic time source in seconds (default: the loop's time).
+        sleep: Async sleep used for wake-ups (default: a loop timer).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Clock | None = None,
+        sleep: Sleep | None = None,
+    ):
+        super().__init__(rate, capacity, clock, sleep)
+        self._tokens = float(capacity)
+        self._last: float | None = None  # A full bucket needs no start time.
+
+    def _refill(self, now: float) -> None:
+        """Update token count based on elapsed time."""
+        if self._last is not None:
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _take(self, tokens: float, now: float) -> bool:
+        self._refill(now)
+        if self._tokens + _EPSILON * self.rate >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def _delay(self, tokens: float, now: float) -> float:
+        self._refill(now)
+        return (tokens - self._tokens) / self.rate
+
+    def _refund(self, tokens: float, now: float, granted: float) -> None:
+        self._refill(now)
+        self._tokens = min(self.capacity, self._tokens + tokens)
+
+
+class GCRALimiter(_FifoLimiter):
+    """Generic Cell Rate Algorithm: a token bucket stored as one timestamp.
+
+    The only state is the theoretical arrival time (TAT). Taking n tokens
+    pushes TAT n/rate into the future; a request fits if the resulting TAT
+    is no more than capacity/rate ahead of now. It admits exactly what
+    RateLimiter admits, without a float count or a refill step.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Clock | None = None, sleep: Sleep | None = None):
+        super().__init__(rate, capacity, clock, sleep)
+        self._interval = 1.0 / rate
+        self._tolerance = capacity / rate
+        self._tat = float("-inf")
+
+    def _take(self, tokens: float, now: float) -> bool:
+        tat = max(self._tat, now) + tokens * self._interval
+        if tat - now <= self._tolerance + _EPSILON:
+            self._tat = tat
+            return True
+        return False
+
+    def _delay(self, tokens: float, now: float) -> float:
+        return max(self._tat, now) + tokens * self._interval - now - self._tolerance
+
+    def _refund(self, tokens: float, now: float, granted: float) -> None:
+        self._tat -= tokens * self._interval
+
+
+class SlidingWindowLogLimiter(_FifoLimiter):
+    """At most `capacity` tokens in any trailing window of capacity/rate s.
+
+    Keeps a log of (timestamp, tokens) grants. Exact, but memory grows
+    with the number of grants per window.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Clock | None = None, sleep: Sleep | None = None):
+        super().__init__(rate, capacity, clock, sleep)
+        self.window = capacity / rate
+        self._log: deque[tuple[float, float]] = deque()
+        self._used = 0.0
+
+    def _expire(self, now: float) -> None:
+        log, horizon = self._log, now - self.window
+        while log and log[0][0] <= horizon + _EPSILON:
+            self._used -= log.popleft()[1]
+
+    def _take(self, tokens: float, now: float) -> bool:
+        self._expire(now)
+        if self._used + tokens <= self.capacity + _EPSILON * self.rate:
+            self._log.append((now, tokens))
+            self._used += tokens
+            return True
+        return False
+
+    def _delay(self, tokens: float, now: float) -> float:
+        self._expire(now)
+        excess = self._used + tokens - self.capacity
+        for stamp, amount in self._log:
+            excess -= amount
+            if excess <= 0:
+                return stamp + self.window - now
+        return 0.0
+
+    def _refund(self, tokens: float, now: float, granted: float) -> None:
+        # Drop this grant's own entry (any other one of the same size made
+        # at the same time expires alike); if it has expired, nothing is owed.
+        self._expire(now)
+        for i in range(len(self._log) - 1, -1, -1):
+            if self._log[i] == (granted, tokens):
+                del self._log[i]
+                self._used -= tokens
+                return
+
+
+class SlidingWindowCounterLimiter(_FifoLimiter):
+    """Approximate sliding window from two fixed-window counters.
+
+    The previous window's count is weighted by how much of it still
+    overlaps the trailing window. Constant memory, slightly permissive at
+    window edges compared with the exact log.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Clock | None = None, sleep: Sleep | None = None):
+        super().__init__(rate, capacity, clock, sleep)
+        self.window = capacity / rate
+        self._start = 0.0
+        self._previous = 0.0
+        self._current = 0.0
+
+    def _roll(self, now: float) -> None:
+        elapsed = now - self._start
+        if elapsed + _EPSILON >= self.window:
+            windows = max(1, int((elapsed + _EPSILON) // self.window))
+            self._previous = self._current if windows == 1 else 0.0
+            self._current = 0.0
+            self._start += windows * self.window
+
+    def _estimate(self, now: float) -> float:
+        overlap = 1.0 - (now - self._start) / self.window
+        return self._previous * overlap + self._current
+
+    def _take(self, tokens: float, now: float) -> bool:
+        self._roll(now)
+        if self._estimate(now) + tokens <= self.capacity + _EPSILON * self.rate:
+            self._current += tokens
+            return True
+        return False
+
+    def _delay(self, tokens: float, now: float) -> float:
+        self._roll(now)
+        room = self.capacity - self._current - tokens
+        if room >= 0:
+            # Wait for the previous window's weight to decay enough.
+            if self._previous <= room:
+                return 0.0
+            overlap = room / self._previous
+            return self._start + (1.0 - overlap) * self.window - now
+        # Not before the next window; there the current count becomes the
+        # decaying one.
+        next_start = self._start + self.window
+        room = self.capacity - tokens
+        overlap = room / self._current if self._current > room else 1.0
+        return next_start + (1.0 - overlap) * self.window - now
+
+    def _refund(self, tokens: float, now: float, granted: float) -> None:
+        self._roll(now)
+        self._current = max(0.0, self._current - tokens)
+
+
+class LimiterQueueFull(RuntimeError):
+    """Raised by LeakyBucketLimiter.acquire when its queue is full."""
+
+
+class LeakyBucketLimiter(_FifoLimiter):
+    """Leaky bucket as a queue: requests drain at a constant rate, no bursts.
+
+    Each grant occupies the outlet for tokens/rate seconds, so callers are
+    spaced evenly. `capacity` bounds the tokens waiting in the queue;
+    `acquire` raises LimiterQueueFull instead of queueing beyond it.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Clock | None = None, sleep: Sleep | None = None):
+        super().__init__(rate, capacity, clock, sleep)
+        self._free_at = float("-inf")
+        self._queued = 0.0
+
+    def _take(self, tokens: float, now: float) -> bool:
+        if self._free_at <= now + _EPSILON:
+            self._free_at = now + tokens / self.rate
+            return True
+        return False
+
+    def _delay(self, tokens: float, now: float) -> float:
+        return self._free_at - now
+
+    def _refund(self, tokens: float, now: float, granted: float) -> None:
+        self._free_at -= tokens / self.rate
+
+    async def acquire(self, tokens: float = 1, priority: int = 0, tenant: Hashable = None) -> None:
+        self._check(tokens)
+        if self._queued + tokens > self.capacity:
+            raise LimiterQueueFull(f"{self._queued:g} tokens already queued (capacity {self.capacity:g})")
+        self._queued += tokens
+        try:
+            await super().acquire(tokens, priority, tenant)
+        finally:
+            self._queued -= tokens
+
+
+LIMITERS: dict[str, type[_FifoLimiter]] = {
+    "token_bucket": RateLimiter,
+    "gcra": GCRALimiter,
+    "sliding_log": SlidingWindowLogLimiter,
+    "sliding_counter": SlidingWindowCounterLimiter,
+    "leaky_bucket": LeakyBucketLimiter,
+}
+
+
+def create_limiter(
+    algorithm: str,
+    rate: float,
+    capacity: float,
+    clock: Clock | None = None,
+    sleep: Sleep | None = None,
+) -> _FifoLimiter:
+    """Build a limiter by algorithm name; all share acquire/try_acquire."""
+    try:
+        cls = LIMITERS[algorithm]
+    except KeyError:
+        raise ValueError(f"Unknown algorithm {algorithm!r}; choose from {sorted(LIMITERS)}") from None
+    return cls(rate, capacity, clock, sleep)
+
+
+class _KeyQueue:
+    """Blocked callers of one key, plus that key's single wake-up timer."""
+    __slots__ = ("waiters", "timer")
+
+    def __init__(self):
+        self.waiters: deque[tuple[float, asyncio.Future]] = deque()
+        self.timer: asyncio.TimerHandle | asyncio.Task | None = None
+
+
+class KeyedRateLimiter:
+    """One token bucket per key with bounded memory.
+
+    Same semantics as RateLimiter, applied independently per key.
+
+    Args:
+        rate: Tokens added per second to each key's bucket.
+        capacity: Maximum tokens (burst size) of each bucket.
+        sweep_batch: Slots inspected for eviction on every call.
+        clock, sleep: as for RateLimiter.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        sweep_batch: int = 4,
+        clock: Clock | None = None,
+        sleep: Sleep | None = None,
+    ):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self.sweep_batch = sweep_batch
+        self._slot: dict[Hashable, int] = {}
+        self._keys: list[Hashable | None] = []
+        self._tokens = array("d")
+        self._last = array("d")
+        self._free: list[int] = []
+        self._cursor = 0
+        self._queues: dict[Hashable, _KeyQueue] = {}
+        self._clock = clock
+        self._sleep = sleep
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def __len__(self) -> int:
+        """Number of buckets currently held in memory."""
+        return len(self._slot)
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    def _now(self) -> float:
+        if self._clock is not None:
+            return self._clock()
+        return self._get_loop().time()
+
+    def _check(self, tokens: float) -> None:
+        if tokens <= 0 or tokens > self.capacity:
+            raise ValueError(f"tokens must be in (0, {self.capacity}], got {tokens}")
+
+    def _bucket(self, key: Hashable, now: float) -> int:
+        """Slot of key's bucket, refilled to `now`; created full if absent."""
+        slot = self._slot.get(key)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self._keys[slot] = key
+                self._tokens[slot] = self.capacity
+                self._last[slot] = now
+            else:
+                slot = len(self._keys)
+                self._keys.append(key)
+                self._tokens.append(self.capacity)
+                self._last.append(now)
+            self._slot[key] = slot
+            return slot
+        tokens = self._tokens[slot] + (now - self._last[slot]) * self.rate
+        self._tokens[slot] = tokens if tokens < self.capacity else self.capacity
+        self._last[slot] = now
+        return slot
+
+    def _sweep(self, now: float, limit: int) -> int:
+        """Advance the eviction cursor `limit` slots; return buckets freed."""
+        keys, n = self._keys, len(self._keys)
+        if not n:
+            return 0
+        freed = 0
+        cursor = self._cursor
+        for _ in range(min(limit, n)):
+            cursor = cursor + 1 if cursor + 1 < n else 0
+            key = keys[cursor]
+            if key is None or key in self._queues:
+                continue
+            if self._tokens[cursor] + (now - self._last[cursor]) * self.rate >= self.capacity:
+                del self._slot[key]
+                keys[cursor] = None
+                self._free.append(cursor)
+                freed += 1
+        self._cursor = cursor
+        return freed
+
+    def evict_idle(self) -> int:
+        """Drop every full, idle bucket now. Returns how many were freed."""
+        return self._sweep(self._now(), len(self._keys))
+
+    def available(self, key: Hashable) -> float:
+        """Tokens key could take right now (capacity for unknown keys)."""
+        slot = self._slot.get(key)
+        if slot is None:
+            return float(self.capacity)
+        tokens = self._tokens[slot] + (self._now() - self._last[slot]) * self.rate
+        return min(self.capacity, tokens)
+
+    def try_acquire(self, key: Hashable, tokens: float = 1) -> bool:
+        """Try to consume tokens from key's bucket without waiting."""
+        self._check(tokens)
+        now = self._now()
+        if self.sweep_batch:
+            self._sweep(now, self.sweep_batch)
+        if key in self._queues:
+            return False  # Don't jump ahead of this key's queued callers.
+        slot = self._bucket(key, now)
+        if self._tokens[slot] + _EPSILON * self.rate >= tokens:
+            self._tokens[slot] -= tokens
+            return True
+        return False
+
+    async def acquire(self, key: Hashable, tokens: float = 1) -> None:
+        """Consume tokens from key's bucket, waiting if necessary."""
+        if self.try_acquire(key, tokens):
+            return
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _KeyQueue()
+        entry = (tokens, self._get_loop().create_future())
+        queue.waiters.append(entry)
+        if len(queue.waiters) == 1:
+            self._arm_timer(key, queue)
+        try:
+            await entry[1]
+        except asyncio.CancelledError:
+            self._abandon(key, entry)
+            raise
+
+    # ── per-key waiter queues ─────────────────────────────────────────
+
+    def _arm_timer(self, key: Hashable, queue: _KeyQueue) -> None:
+        deficit = queue.waiters[0][0] - self._tokens[self._slot[key]]
+        delay = max(deficit, 0.0) / self.rate
+        queue.timer = _call_later(self._get_loop(), self._sleep, delay, self._dispatch, key)
+
+    def _dispatch(self, key: Hashable) -> None:
+        queue = self._queues[key]
+        queue.timer = None
+        slot = self._bucket(key, self._now())
+        waiters = queue.waiters
+        while waiters:
+            tokens, future = waiters[0]
+            if future.cancelled():
+                # Cancelled in this same loop iteration; its _abandon,
+                # still to run, will find it gone.
+                waiters.popleft()
+                continue
+            if self._tokens[slot] + _EPSILON * self.rate < tokens:
+                break
+            waiters.popleft()
+            self._tokens[slot] -= tokens
+            future.set_result(None)
+        if waiters:
+            self._arm_timer(key, queue)
+        else:
+            del self._queues[key]
+
+    def _abandon(self, key: Hashable, entry: tuple[float, asyncio.Future]) -> None:
+        tokens, future = entry
+        queue = self._queues.get(key)
+        if not future.cancelled():
+            # Granted, then cancelled before it could resume: refund.
+            slot = self._bucket(key, self._now())
+            self._tokens[slot] = min(self.capacity, self._tokens[slot] + tokens)
+            if queue is not None and queue.timer is not None:
+                queue.timer.cancel()
+                self._dispatch(key)
+            return
+        if queue is None or entry not in queue.waiters:
+            return  # _dispatch already dropped it.
+        was_head = queue.waiters[0] is entry
+        queue.waiters.remove(entry)
+        if was_head and queue.timer is not None:
+            queue.timer.cancel()
+            queue.timer = None
+            if queue.waiters:
+                self._dispatch(key)
+            else:
+                del self._queues[key]
+
+
+_SHARED_STATE = struct.Struct("dd")  # tokens, last refill (time.monotonic)
+
+
+class SharedRateLimiter:
+    """Token bucket shared by every local process that holds a handle.
+
+    Create it once in the parent, then pass the instance to worker
+    processes (as a Process/Pool argument or initializer arg); each
+    unpickled copy attaches to the same shared memory and lock. The
+    creating process should `close()` it — which also unlinks the shared
+    block — once the workers are done.
+
+    Args:
+        rate: Tokens added per second, across all processes.
+        capacity: Maximum tokens (burst size).
+        context: multiprocessing context the workers are started from
+            (the lock must come from the same one); default context if None.
+        clock: Time source shared by all processes (default time.monotonic;
+            must be picklable and system-wide).
+        sleep: Async sleep used while waiting (default asyncio.sleep).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        context=None,
+        clock: Clock = time.monotonic,
+        sleep: Sleep = asyncio.sleep,
+    ):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = (context or multiprocessing).Lock()
+        self._shm = SharedMemory(create=True, size=_SHARED_STATE.size)
+        # By pid rather than a flag: forked children inherit the object
+        # without pickling and must not unlink the parent's block.
+        self._owner_pid = os.getpid()
+        _SHARED_STATE.pack_into(self._shm.buf, 0, float(capacity), clock())
+
+    def __getstate__(self) -> dict:
+        return {
+            "rate": self.rate, "capacity": self.capacity, "lock": self._lock,
+            "name": self._shm.name, "clock": self._clock, "sleep": self._sleep,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.rate = state["rate"]
+        self.capacity = state["capacity"]
+        self._lock = state["lock"]
+        self._clock = state["clock"]
+        self._sleep = state["sleep"]
+        self._shm = SharedMemory(name=state["name"])
+        self._owner_pid = None
+
+    def close(self) -> None:
+        """Detach from the shared block (and remove it, in the creator)."""
+        self._shm.close()
+        if self._owner_pid == os.getpid():
+            self._shm.unlink()
+
+    def __enter__(self) -> SharedRateLimiter:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _update(self, tokens: float, reserve: bool) -> float:
+        """
+        Atomically refill and take `tokens`.
+
+        Returns how long the caller must wait before the tokens are really
+        theirs: 0.0 when they were available, the time until the debt is
+        repaid when `reserve` is set, or -1.0 when not taken at all.
+        """
+        buf = self._shm.buf
+        with self._lock:
+            current, last = _SHARED_STATE.unpack_from(buf, 0)
+            now = self._clock()
+            current = min(self.capacity, current + (now - last) * self.rate)
+            if current >= tokens:
+                wait = 0.0
+                current -= tokens
+            elif reserve:
+                current -= tokens
+                wait = -current / self.rate
+            else:
+                wait = -1.0
+            _SHARED_STATE.pack_into(buf, 0, current, now)
+        return wait
+
+    def _check(self, tokens: float) -> None:
+        if tokens <= 0 or tokens > self.capacity:
+            raise ValueError(f"tokens must be in (0, {self.capacity}], got {tokens}")
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Try to consume tokens without waiting. Returns True on success."""
+        self._check(tokens)
+        return self._update(tokens, reserve=False) == 0.0
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """Reserve tokens, then sleep once until the reservation is covered."""
+        self._check(tokens)
+        wait = self._update(tokens, reserve=True)
+        if wait <= 0:
+            return
+        try:
+            await self._sleep(wait)
+        except asyncio.CancelledError:
+            self._refund(tokens)
+            raise
+
+    def _refund(self, tokens: float) -> None:
+        buf = self._shm.buf
+        with self._lock:
+            current, last = _SHARED_STATE.unpack_from(buf, 0)
+            _SHARED_STATE.pack_into(buf, 0, min(self.capacity, current + tokens), last)
+
+
+# ─── Virtual time ────────────────────────────────────────────────────
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """Selector that turns "block for t seconds" into "advance the clock by t"."""
+
+    loop: VirtualTimeLoop
+
+    def select(self, timeout=None):
+        if timeout is not None and timeout > 0:
+            # Always move at least one ulp so a tiny timeout can't stall time.
+            now = self.loop._virtual_now
+            self.loop._virtual_now = max(now + timeout, math.nextafter(now, math.inf))
+            timeout = 0
+        return super().select(timeout)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop on a virtual clock.
+
+    Whenever nothing is ready to run, asyncio asks the selector to block
+    until the next timer is due; here that wait happens instantly by moving
+    the clock forward instead. Callbacks, tasks, sleeps and timers behave
+    exactly as on a real loop (I/O still works, it just never waits), and
+    `loop.time()` readings are exact.
+    """
+
+    def __init__(self):
+        self._virtual_now = 0.0
+        selector = _VirtualSelector()
+        selector.loop = self
+        super().__init__(selector)
+
+    def time(self) -> float:
+        return self._virtual_now
+
+
+def run_virtual(main: Awaitable):
+    """asyncio.run() on a VirtualTimeLoop."""
+    with asyncio.Runner(loop_factory=VirtualTimeLoop) as runner:
+        return runner.run(main)
+
+
+# ─── Benchmark ───────────────────────────────────────────────────────
+
+async def run_benchmark(n: int = 200_000) -> None:
+    """
+    Per-call overhead of the uncontended and contended paths.
+
+        python 2026-03-01-async-rate-limiter-solution.py --bench
+    """
+    limiter = RateLimiter(rate=1e12, capacity=1e12)
+    start = time.perf_counter()
+    for _ in range(n):
+        await limiter.acquire()
+    fast = time.perf_counter() - start
+    print(f"uncontended acquire: {n / fast:>12,.0f} /s  ({fast / n * 1e9:,.0f} ns/call)")
+
+    # 1000 coroutines contending for a 100k/s bucket. The loop's timers
+    # have ~1ms granularity, so the burst must cover at least that long.
+    rate, workers, per_worker = 100_000, 1000, 50
+    limiter = RateLimiter(rate=rate, capacity=rate / 100)
+
+    async def worker():
+        for _ in range(per_worker):
+            await limiter.acquire()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    elapsed = time.perf_counter() - start
+    total = workers * per_worker
+    print(f"contended acquire:   {total / elapsed:>12,.0f} /s  (target {rate:,}/s)")
+
+    # Memory per key: one RateLimiter per client vs the keyed limiter.
+    keys = [f"10.0.{i >> 8 & 255}.{i & 255}:{i}" for i in range(100_000)]
+    for label, build in (
+        ("RateLimiter per key", lambda: {k: RateLimiter(10, 10) for k in keys}),
+        ("KeyedRateLimiter", lambda: _fill_keyed(keys)),
+    ):
+        tracemalloc.start()
+        held = build()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del held
+        print(f"{label:<22} {used / len(keys):>8.0f} bytes/key")
+
+
+def _fill_keyed(keys: list[str]) -> KeyedRateLimiter:
+    limiter = KeyedRateLimiter(10, 10, sweep_batch=0, clock=time.monotonic)
+    for key in keys:
+        limiter.try_acquire(key)
+    return limiter
+
+
+async def run_precision_benchmark(rate: float = 50_000, seconds: float = 2.0) -> None:
+    """
+    How accurately a real event loop holds a high rate.
+
+    Achieved rate counts only the throttled part (the initial burst is
+    free), and jitter is how late each timer wake-up fired relative to the
+    moment the head waiter's tokens were due.
+    """
+    loop = asyncio.get_running_loop()
+    capacity = rate / 100
+    limiter = RateLimiter(rate=rate, capacity=capacity)
+    lateness: list[float] = []
+    dispatch = limiter._dispatch
+
+    def timed_dispatch():
+        lateness.append(loop.time() - limiter._deadline)
+        dispatch()
+
+    limiter._dispatch = timed_dispatch
+    total = int(rate * seconds + capacity)
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await limiter.acquire()
+
+    start = loop.time()
+    await asyncio.gather(*(worker() for _ in range(500)))
+    elapsed = loop.time() - start
+    achieved = (total - capacity) / elapsed
+    lateness.sort()
+    pct = lambda q: lateness[min(len(lateness) - 1, int(q * len(lateness)))] * 1e6
+    print(
+        f"\nrate {rate:,.0f}/s for {seconds:g}s: achieved {achieved:,.0f}/s "
+        f"({(achieved / rate - 1) * 100:+.2f}%), {len(lateness):,} wake-ups, "
+        f"lateness p50 {pct(0.5):,.0f}us p99 {pct(0.99):,.0f}us max {lateness[-1] * 1e6:,.0f}us"
+    )
+
+
+def _simulate(limiter: _FifoLimiter, every: float, duration: float) -> list[float]:
+    """Offer one token every `every` seconds of synthetic time; return grant times."""
+    granted = []
+    steps = int(duration / every)
+    for i in range(steps):
+        now = i * every
+        if limiter._take(1, now):
+            granted.append(now)
+    return granted
+
+
+def run_algorithm_benchmark(n: int = 200_000) -> None:
+    """Per-call overhead and burst shape of every algorithm."""
+    print(f"\n{'algorithm':<16}{'ns/call':>9}{'first 100ms':>13}{'max in 1s':>11}{'total 3s':>10}")
+    for name, cls in LIMITERS.items():
+        limiter = cls(rate=1e12, capacity=1e12, clock=time.monotonic)
+        start = time.perf_counter()
+        for _ in range(n):
+            limiter.try_acquire()
+        per_call = (time.perf_counter() - start) / n * 1e9
+
+        # 100 tokens/s, burst 20, hammered every millisecond for 3s.
+        grants = _simulate(cls(rate=100, capacity=20), every=0.001, duration=3.0)
+        first = sum(1 for t in grants if t < 0.1)
+        peak, lo = 0, 0
+        for hi, t in enumerate(grants):
+            while grants[lo] <= t - 1.0:
+                lo += 1
+            peak = max(peak, hi - lo + 1)
+        print(f"{name:<16}{per_call:>9.0f}{first:>13}{peak:>11}{len(grants):>10}")
+
+
+# ─── Test Harness ────────────────────────────────────────────────────
+#
+# Everything except the multi-process tests runs on a VirtualTimeLoop, so
+# elapsed times are exact rather than "somewhere in a window".
+
+def _close(a: float, b: float) -> bool:
+    return abs(a - b) < 1e-6
+
+
+async def test_burst():
+    """Full capacity should be available immediately."""
+    limiter = RateLimiter(rate=100, capacity=10)
+    start = asyncio.get_running_loop().time()
+    for _ in range(10):
+        await limiter.acquire()
+    elapsed = asyncio.get_running_loop().time() - start
+    assert elapsed == 0, f"Burst took {elapsed:.3f}s"
+    print("✅ test_burst passed")
+
+
+async def test_throttle():
+    """Requests beyond capacity should be throttled."""
+    limiter = RateLimiter(rate=10, capacity=5)
+    start = asyncio.get_running_loop().time()
+    for _ in range(10):  # 5 burst + 5 throttled (0.5s total wait)
+        await limiter.acquire()
+    elapsed = asyncio.get_running_loop().time() - start
+    assert _close(elapsed, 0.5), f"Expected 0.5s, got {elapsed:.6f}s"
+    print("✅ test_throttle passed")
+
+
+async def test_try_acquire():
+    """try_acquire should not block."""
+    limiter = RateLimiter(rate=1, capacity=2)
+    assert limiter.try_acquire() is True
+    assert limiter.try_acquire() is True
+    assert limiter.try_acquire() is False  # bucket empty
+    print("✅ test_try_acquire passed")
+
+
+async def test_concurrent():
+    """Multiple coroutines should share the limiter safely."""
+    limiter = RateLimiter(rate=20, capacity=5)
+    results = []
+
+    async def worker(wid: int):
+        for _ in range(5):
+            await limiter.acquire()
+            results.append(wid)
+
+    start = asyncio.get_running_loop().time()
+    await asyncio.gather(*(worker(i) for i in range(4)))  # 20 total
+    elapsed = asyncio.get_running_loop().time() - start
+
+    assert len(results) == 20
+    # 5 burst + 15 throttled at 20/s = 0.75s
+    assert _close(elapsed, 0.75), f"Expected 0.75s, got {elapsed:.6f}s"
+    print("✅ test_concurrent passed")
+
+
+async def test_multi_token():
+    """acquire() with tokens > 1 should work."""
+    limiter = RateLimiter(rate=10, capacity=10)
+    await limiter.acquire(5)  # instant
+    assert limiter.try_acquire(6) is False  # only 5 left
+    assert limiter.try_acquire(5) is True
+    print("✅ test_multi_token passed")
+
+
+async def test_fifo_no_starvation():
+    """A large request queued first is served before later small ones."""
+    limiter = RateLimiter(rate=100, capacity=5)
+    await limiter.acquire(5)
+    order = []
+
+    async def take(name, n):
+        await limiter.acquire(n)
+        order.append(name)
+
+    big = asyncio.create_task(take("big", 5))
+    await asyncio.sleep(0)
+    smalls = [asyncio.create_task(take(f"s{i}", 1)) for i in range(3)]
+    assert limiter.try_acquire() is False, "try_acquire must not jump the queue"
+    await asyncio.gather(big, *smalls)
+    assert order == ["big", "s0", "s1", "s2"], order
+    print("✅ test_fifo_no_starvation passed")
+
+
+async def test_single_wakeup_per_waiter():
+    """Blocked callers are woken by one timer, not by polling."""
+    limiter = RateLimiter(rate=200, capacity=1)
+    await limiter.acquire()
+    dispatches = 0
+    original = limiter._dispatch
+
+    def counting_dispatch():
+        nonlocal dispatches
+        dispatches += 1
+        original()
+
+    limiter._dispatch = counting_dispatch
+    await asyncio.gather(*(limiter.acquire() for _ in range(20)))
+    # One timer firing per granted token (plus the odd float-rounding re-arm).
+    assert 20 <= dispatches <= 25, f"Unexpected dispatch count: {dispatches}"
+    print("✅ test_single_wakeup_per_waiter passed")
+
+
+async def test_cancelled_waiter():
+    limiter = RateLimiter(rate=20, capacity=2)
+    await limiter.acquire(2)
+    head = asyncio.create_task(limiter.acquire(2))
+    tail = asyncio.create_task(limiter.acquire(1))
+    await asyncio.sleep(0)
+    head.cancel()
+    start = asyncio.get_running_loop().time()
+    await tail
+    elapsed = asyncio.get_running_loop().time() - start
+    # The tail only needed one token (50ms), not the head's two.
+    assert _close(elapsed, 0.05), f"Tail waited for the cancelled head: {elapsed:.6f}s"
+    assert head.cancelled()
+    assert not limiter._waiters
+    print("✅ test_cancelled_waiter passed")
+
+
+async def test_invalid_tokens():
+    limiter = RateLimiter(rate=1, capacity=3)
+    for bad in (0, -1, 4):
+        try:
+            await limiter.acquire(bad)
+            assert False, f"acquire({bad}) should raise"
+        except ValueError:
+            pass
+    print("✅ test_invalid_tokens passed")
+
+
+async def test_virtual_scenarios():
+    """Thousands of throttling scenarios, checked exactly, in well under a second."""
+    rng = random.Random(11)
+    loop = asyncio.get_running_loop()
+    wall = time.perf_counter()
+    for _ in range(2000):
+        rate = rng.choice((1, 7, 50, 1000, 50_000))
+        capacity = rng.randint(1, 20)
+        n = rng.randint(1, 40)
+        limiter = RateLimiter(rate=rate, capacity=capacity)
+        start = loop.time()
+        for _ in range(n):
+            await limiter.acquire()
+        expected = max(0, n - capacity) / rate
+        assert abs((loop.time() - start) - expected) < 1e-6 * max(1.0, expected)
+    wall = time.perf_counter() - wall
+    assert wall < 2.0, f"Virtual-time scenarios took {wall:.2f}s of real time"
+    print("✅ test_virtual_scenarios passed")
+
+
+async def test_injected_clock():
+    """A hand-driven clock and sleeper replace the loop's time entirely."""
+    now = 100.0
+    slept = []
+
+    async def sleep(delay: float) -> None:
+        nonlocal now
+        slept.append(delay)
+        now += delay
+        await asyncio.sleep(0)
+
+    # The second token is due after 1/rate — except for the window counter,
+    # which has to wait out the whole previous window's weight.
+    expected = dict.fromkeys(LIMITERS, 0.25) | {"sliding_counter": 0.5}
+    for name in LIMITERS:
+        now, slept = 100.0, []
+        limiter = create_limiter(name, rate=4, capacity=1, clock=lambda: now, sleep=sleep)
+        await limiter.acquire()
+        await limiter.acquire()
+        assert _close(now, 100 + expected[name]), f"{name}: clock at {now}"
+        assert _close(sum(slept), expected[name]), f"{name}: slept {slept}"
+    print("✅ test_injected_clock passed")
+
+
+async def test_real_loop_smoke():
+    """The limiter still behaves on a real clock, not just a virtual one."""
+    limiter = RateLimiter(rate=100, capacity=5)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(10):
+        await limiter.acquire()
+    elapsed = loop.time() - start
+    assert 0.04 < elapsed < 0.3, f"Expected ~0.05s, got {elapsed:.3f}s"
+    print("✅ test_real_loop_smoke passed")
+
+
+async def test_keyed_independent_buckets():
+    limiter = KeyedRateLimiter(rate=1, capacity=2)
+    assert limiter.try_acquire("alice", 2) is True
+    assert limiter.try_acquire("alice") is False
+    assert limiter.try_acquire("bob", 2) is True, "each key has its own bucket"
+    assert len(limiter) == 2
+    print("✅ test_keyed_independent_buckets passed")
+
+
+async def test_keyed_acquire_waits():
+    limiter = KeyedRateLimiter(rate=20, capacity=2)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.gather(*(limiter.acquire("k") for _ in range(4)), limiter.acquire("other", 2))
+    elapsed = loop.time() - start
+    # 2 burst + 2 throttled at 20/s = 0.1s; "other" never waits.
+    assert _close(elapsed, 0.1), f"Expected 0.1s, got {elapsed:.6f}s"
+    assert not limiter._queues
+    print("✅ test_keyed_acquire_waits passed")
+
+
+async def test_keyed_eviction():
+    limiter = KeyedRateLimiter(rate=10, capacity=1)   # refills in 100ms
+    for i in range(10_000):
+        limiter.try_acquire(f"old{i}")
+    assert len(limiter) == 10_000
+    await asyncio.sleep(0.11)
+
+    # Incremental sweeping reclaims the refilled buckets as new keys arrive.
+    for i in range(10_000):
+        limiter.try_acquire(f"new{i}")
+    assert len(limiter) <= 10_000 + limiter.sweep_batch, len(limiter)
+    assert len(limiter._keys) < 12_000, "Freed slots should be reused"
+
+    await asyncio.sleep(0.11)
+    limiter.evict_idle()
+    assert len(limiter) == 0
+    assert limiter.available("old1") == 1
+    print("✅ test_keyed_eviction passed")
+
+
+async def test_keyed_waiting_key_not_evicted():
+    limiter = KeyedRateLimiter(rate=50, capacity=1)
+    await limiter.acquire("busy")
+    waiter = asyncio.create_task(limiter.acquire("busy"))
+    await asyncio.sleep(0)
+    limiter.evict_idle()
+    assert "busy" in limiter._slot
+    await waiter
+    print("✅ test_keyed_waiting_key_not_evicted passed")
+
+
+async def test_keyed_cancel_at_wakeup():
+    loop = asyncio.get_running_loop()
+    limiter = KeyedRateLimiter(rate=10, capacity=1)
+    await limiter.acquire("k")
+    head = asyncio.create_task(limiter.acquire("k"))
+    loop.call_at(0.1, head.cancel)  # runs just before the key's timer
+    await asyncio.sleep(0)
+    tail = asyncio.create_task(limiter.acquire("k"))
+    await asyncio.gather(head, return_exceptions=True)
+    assert head.cancelled()
+    await asyncio.wait_for(tail, 1)
+    assert _close(loop.time(), 0.1), "The tail got the cancelled head's token"
+    assert "k" not in limiter._queues
+    print("✅ test_keyed_cancel_at_wakeup passed")
+
+
+def _shared_try_worker(limiter: SharedRateLimiter, attempts: int, results) -> None:
+    results.put(sum(limiter.try_acquire() for _ in range(attempts)))
+    limiter.close()
+
+
+def _shared_acquire_worker(limiter: SharedRateLimiter, count: int) -> None:
+    async def run():
+        for _ in range(count):
+            await limiter.acquire()
+    asyncio.run(run())
+    limiter.close()
+
+
+async def test_shared_no_double_spend():
+    """Four processes racing on try_acquire can't take more than capacity."""
+    with SharedRateLimiter(rate=0.001, capacity=20) as limiter:
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=_shared_try_worker, args=(limiter, 10, results))
+            for _ in range(4)
+        ]
+        for p in procs:
+            p.start()
+        taken = sum(results.get(timeout=10) for _ in procs)
+        for p in procs:
+            p.join()
+        assert taken == 20, f"Expected exactly 20 tokens taken, got {taken}"
+    print("✅ test_shared_no_double_spend passed")
+
+
+async def test_shared_rate_across_processes():
+    """The configured rate holds for all processes together, not each."""
+    with SharedRateLimiter(rate=100, capacity=10) as limiter:
+        procs = [
+            multiprocessing.Process(target=_shared_acquire_worker, args=(limiter, 15))
+            for _ in range(4)
+        ]
+        start = time.monotonic()
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.monotonic() - start
+        assert all(p.exitcode == 0 for p in procs)
+        # 60 tokens: 10 burst + 50 at 100/s = 0.5s. Per-process buckets
+        # would have finished in ~0.05s.
+        assert 0.45 < elapsed < 1.5, f"Expected ~0.5s, got {elapsed:.3f}s"
+    print("✅ test_shared_rate_across_processes passed")
+
+
+async def test_shared_cancel_refunds():
+    with SharedRateLimiter(rate=10, capacity=1) as limiter:
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0.1)
+        # The cancelled reservation was returned, so a token is available.
+        assert limiter.try_acquire() is True
+    print("✅ test_shared_cancel_refunds passed")
+
+
+async def test_create_limiter():
+    for name, cls in LIMITERS.items():
+        assert isinstance(create_limiter(name, 10, 5), cls)
+    try:
+        create_limiter("fixed_window", 10, 5)
+        assert False, "Unknown algorithm should raise"
+    except ValueError:
+        pass
+    print("✅ test_create_limiter passed")
+
+
+async def test_gcra_matches_token_bucket():
+    """GCRA admits exactly what the token bucket admits."""
+    rng = random.Random(3)
+    bucket, gcra = RateLimiter(7, 5), GCRALimiter(7, 5)
+    now = 0.0
+    for _ in range(2000):
+        now += rng.expovariate(10)
+        tokens = rng.choice((1, 1, 2, 3))
+        assert bucket._take(tokens, now) == gcra._take(tokens, now), f"diverged at t={now:.3f}"
+    print("✅ test_gcra_matches_token_bucket passed")
+
+
+async def test_sliding_windows():
+    log = SlidingWindowLogLimiter(rate=2, capacity=4)          # 4 per 2s
+    assert all(log._take(1, t) for t in (0.0, 0.5, 1.0, 1.5))
+    assert log._take(1, 1.9) is False
+    assert abs(log._delay(1, 1.9) - 0.1) < 1e-9                # t=0 grant expires at 2.0
+    assert log._take(1, 2.0) is True
+
+    counter = SlidingWindowCounterLimiter(rate=2, capacity=4)  # 2s windows
+    assert all(counter._take(1, 0.1 * i) for i in range(4))
+    assert counter._take(1, 1.0) is False
+    # At t=3.0 the previous window (4 grants) still overlaps by half: 2 + 0.
+    assert counter._take(2, 3.0) is True
+    assert counter._take(1, 3.0) is False
+    assert abs(counter._delay(1, 3.0) - 0.5) < 1e-9
+    print("✅ test_sliding_windows passed")
+
+
+async def test_leaky_bucket_smooths():
+    limiter = LeakyBucketLimiter(rate=50, capacity=3)
+    loop = asyncio.get_running_loop()
+    assert limiter.try_acquire() is True
+    assert limiter.try_acquire() is False, "No bursts through a leaky bucket"
+    stamps = []
+
+    async def call():
+        await limiter.acquire()
+        stamps.append(loop.time())
+
+    tasks = [asyncio.create_task(call()) for _ in range(3)]
+    await asyncio.sleep(0)
+    try:
+        await limiter.acquire()
+        assert False, "Queue of 3 is full"
+    except LimiterQueueFull:
+        pass
+    await asyncio.gather(*tasks)
+    gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+    assert all(_close(g, 0.02) for g in gaps), f"Expected 20ms spacing, got {gaps}"
+    print("✅ test_leaky_bucket_smooths passed")
+
+
+async def test_all_algorithms_throttle():
+    loop = asyncio.get_running_loop()
+    # Token bucket family: 2 burst + 4 at 40/s = 0.1s. The exact window
+    # releases 2 per 50ms window; the counter's weighted estimate is more
+    # conservative and settles at one per window; the leaky bucket spaces
+    # all six 25ms apart.
+    expected = {
+        "token_bucket": 0.1, "gcra": 0.1, "sliding_log": 0.1,
+        "sliding_counter": 0.2, "leaky_bucket": 0.125,
+    }
+    for name in LIMITERS:
+        limiter = create_limiter(name, rate=40, capacity=2)
+        start = loop.time()
+        for _ in range(6):
+            await limiter.acquire()
+        elapsed = loop.time() - start
+        assert _close(elapsed, expected[name]), f"{name}: {elapsed:.6f}s"
+    print("✅ test_all_algorithms_throttle passed")
+
+
+async def test_priority_classes():
+    """Interactive waiters (priority 0) are served before queued batch ones."""
+    limiter = RateLimiter(rate=100, capacity=1)
+    await limiter.acquire()
+    order = []
+
+    async def take(name, priority):
+        await limiter.acquire(priority=priority)
+        order.append(name)
+
+    batch = [asyncio.create_task(take(f"b{i}", 1)) for i in range(3)]
+    await asyncio.sleep(0)
+    interactive = [asyncio.create_task(take(f"i{i}", 0)) for i in range(2)]
+    await asyncio.gather(*batch, *interactive)
+    assert order == ["i0", "i1", "b0", "b1", "b2"], order
+    print("✅ test_priority_classes passed")
+
+
+async def test_weighted_tenants():
+    """Backlogged tenants share the rate in proportion to their weights."""
+    limiter = RateLimiter(rate=100, capacity=1)
+    limiter.set_weight("a", 3)
+    await limiter.acquire()
+    order = []
+
+    async def take(tenant):
+        await limiter.acquire(tenant=tenant)
+        order.append(tenant)
+
+    tasks = [asyncio.create_task(take(t)) for t in ["a"] * 12 + ["b"] * 12]
+    await asyncio.gather(*tasks)
+    assert order[:8].count("a") == 6, order
+    assert order[:16].count("a") == 12, order
+    print("✅ test_weighted_tenants passed")
+
+
+async def test_large_request_not_starved():
+    """A multi-token request from one tenant isn't starved by another's stream."""
+    limiter = RateLimiter(rate=100, capacity=5)
+    await limiter.acquire(5)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    small_done = 0
+
+    async def stream():
+        nonlocal small_done
+        for _ in range(30):
+            await limiter.acquire(1, tenant="stream")
+            small_done += 1
+
+    streamer = asyncio.create_task(stream())
+    await asyncio.sleep(0.001)
+    await limiter.acquire(5, tenant="bulk")
+    # Equal weights: the bulk request starts level with the stream's next
+    # request and waits for at most one small grant, then its own five.
+    assert small_done <= 2, f"{small_done} small requests passed the big one"
+    assert loop.time() - start <= 0.07 + 1e-6
+    await streamer
+    print("✅ test_large_request_not_starved passed")
+
+
+async def test_priority_cancelled_head():
+    """Cancelling an outranking head hands the timer back to the next waiter."""
+    limiter = RateLimiter(rate=10, capacity=1)
+    await limiter.acquire()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    batch = asyncio.create_task(limiter.acquire(priority=1))
+    await asyncio.sleep(0)
+    urgent = asyncio.create_task(limiter.acquire(priority=0))
+    await asyncio.sleep(0.05)
+    urgent.cancel()
+    await batch
+    assert _close(loop.time() - start, 0.1), loop.time() - start
+    assert not limiter._waiters
+    print("✅ test_priority_cancelled_head passed")
+
+
+async def test_waiter_queue_counts_dropped_entries():
+    """Entries `head` drops are counted out once, whoever sees them first."""
+    loop = asyncio.get_running_loop()
+    queue = _WaiterQueue()
+    first = queue.push(1, loop.create_future(), 0, None)
+    second = queue.push(1, loop.create_future(), 0, None)
+    first[4].cancel()
+    assert queue.head() is second and len(queue) == 1
+    assert queue.discard(first) is False and len(queue) == 1
+    second[4].cancel()
+    assert queue.head() is None and not queue
+    assert queue.discard(second) is False and not queue
+    print("✅ test_waiter_queue_counts_dropped_entries passed")
+
+
+async def test_sliding_log_refunds_own_grant():
+    """A refund drops the cancelled grant's log entry, not a later one of the same size."""
+    now = [0.0]
+    limiter = SlidingWindowLogLimiter(rate=2, capacity=2, clock=lambda: now[0])  # 1 s window
+    assert limiter.try_acquire() and limiter.try_acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    now[0] = 1.0
+    limiter._timer.cancel()
+    limiter._dispatch()  # Granted at 1.0; the task has not resumed yet.
+    now[0] = 1.2
+    assert limiter.try_acquire()
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    assert list(limiter._log) == [(1.2, 1)], limiter._log
+    now[0] = 2.1
+    assert limiter.try_acquire() and not limiter.try_acquire(), "The 1.2 grant expired early"
+    print("✅ test_sliding_log_refunds_own_grant passed")
+
+
+async def test_cancel_at_wakeup():
+    """A waiter cancelled in the same loop iteration as its wake-up timer."""
+    loop = asyncio.get_running_loop()
+    limiter = RateLimiter(rate=10, capacity=1)
+    await limiter.acquire()
+    head = asyncio.create_task(limiter.acquire())
+    loop.call_at(0.1, head.cancel)  # queued before the timer, so it runs first
+    await asyncio.sleep(0)
+    tail = asyncio.create_task(limiter.acquire())
+    try:
+        await head
+        assert False, "head should be cancelled"
+    except asyncio.CancelledError:
+        pass
+    await asyncio.wait_for(tail, 1)
+    assert _close(loop.time(), 0.1) and not limiter._waiters and limiter._timer is None
+    # Alone in the queue: the timer finds nobody and must not re-arm.
+    only = asyncio.create_task(limiter.acquire())
+    loop.call_at(0.2, only.cancel)
+    await asyncio.sleep(0)
+    await asyncio.gather(only, return_exceptions=True)
+    assert only.cancelled() and not limiter._waiters and limiter._timer is None
+    print("✅ test_cancel_at_wakeup passed")
+
+
+VIRTUAL_TIME_TESTS = [
+    test_burst,
+    test_throttle,
+    test_try_acquire,
+    test_concurrent,
+    test_multi_token,
+    test_fifo_no_starvation,
+    test_single_wakeup_per_waiter,
+    test_cancelled_waiter,
+    test_invalid_tokens,
+    test_virtual_scenarios,
+    test_injected_clock,
+    test_keyed_independent_buckets,
+    test_keyed_acquire_waits,
+    test_keyed_eviction,
+    test_keyed_waiting_key_not_evicted,
+    test_keyed_cancel_at_wakeup,
+    test_create_limiter,
+    test_gcra_matches_token_bucket,
+    test_sliding_windows,
+    test_leaky_bucket_smooths,
+    test_all_algorithms_throttle,
+    test_priority_classes,
+    test_weighted_tenants,
+    test_large_request_not_starved,
+    test_priority_cancelled_head,
+    test_waiter_queue_counts_dropped_entries,
+    test_cancel_at_wakeup,
+    test_sliding_log_refunds_own_grant,
+]
+
+REAL_TIME_TESTS = [
+    test_real_loop_smoke,
+    test_shared_no_double_spend,
+    test_shared_rate_across_processes,
+    test_shared_cancel_refunds,
+]
+
+
+def main():
+    for test in VIRTUAL_TIME_TESTS:
+        run_virtual(test())
+    for test in REAL_TIME_TESTS:
+        asyncio.run(test())
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        asyncio.run(run_benchmark())
+        asyncio.run(run_precision_benchmark())
+        run_algorithm_benchmark()
+    else:
+        main()
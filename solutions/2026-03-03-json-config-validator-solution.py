@@ -1,53 +1,892 @@
 """
 Daily Challenge 2026-03-03 — JSON Config Validator (SOLUTION)
 Language: Python | Difficulty: Beginner
+
+Schema rules, per key (only "type" is mandatory):
+
+    "type":     the Python type the value must be (bool is not an int)
+    "required": missing key is an error (default False)
+    "default":  value `apply_defaults` fills in; the key is never missing
+    "schema":   nested schema for a dict value
+    "items":    rules for every element of a list value
+    "values":   rules for every value of a dict value (any keys)
+    "enum":     allowed values
+    "min"/"max": inclusive bounds for a number
+    "pattern":  regex a string must contain (re.search)
+
+Nested keys are reported by path: "db.port", "servers[0].host".
 """
 
-def validate_config(config: dict, schema: dict) -> list[str]:
+from __future__ import annotations
+
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import chain, islice
+from typing import Callable, Hashable, Iterator, TextIO
+
+# A path is a linked list of (parent, segment, index) triples, rendered to
+# text only when an error needs it. Segments are dict keys of any type, or
+# list positions, which have `index` set.
+Path = tuple | None
+
+
+def _render(parent: Path, segment: object, index: bool) -> str:
+    parts = []
+    while True:
+        parts.append(f"[{segment}]" if index else f".{segment}")
+        if parent is None:
+            return "".join(reversed(parts))[1:]
+        parent, segment, index = parent
+
+
+def validate_config(config: dict, schema: dict, max_errors: int | None = None) -> list[str]:
     """
-    Validate config against schema, collecting all errors.
+    Validate config against schema, collecting all errors — or only the
+    first `max_errors` of them, stopping as soon as they are found.
 
     Strategy:
     - Iterate over the schema (not the config) so we always check every
       declared key, even if it's absent from the config.
-    - For each schema key, two checks:
-        1. Missing required key.
+    - For each schema key, up to three kinds of check:
+        1. Missing required key (unless it has a default).
         2. Present key with wrong type (with special-case for bool vs int).
+        3. Constraints (enum, min/max, pattern), only once the type is right.
+    - Nested dicts and lists are walked depth-first with an explicit stack
+      of iterators instead of recursion, so depth costs no Python frames.
+      Errors come out in schema order, parents before their children.
+    - Paths are linked (parent, segment, index) triples: descending a
+      level costs one tuple, and the dotted string is only built for an
+      error, so deep documents don't pay for re-copying ever longer path
+      prefixes.
     - Extra keys in config (not in schema) are silently ignored.
     """
     errors = []
+    # Each frame: (path of the container, iterator over it, the dict being
+    # checked against a schema — or None for list/dict contents, whose
+    # iterator yields (segment, value) pairs checked against `item_rules` —
+    # and whether the segments are list positions).
+    stack = [(None, iter(schema.items()), config, None, False)]
 
-    for key, rules in schema.items():
+    while stack:
+        parent, entries, obj, item_rules, index = stack[-1]
+        for segment, entry in entries:
+            if max_errors and len(errors) >= max_errors:
+                return errors[:max_errors]
+            if obj is not None:
+                rules = entry
+                if segment not in obj:
+                    # Key is absent from config.
+                    if rules.get("required") and "default" not in rules:
+                        errors.append(f"Missing required key: '{_render(parent, segment, index)}'")
+                    # If optional (or defaulted) and absent — no error, move on.
+                    continue
+                value = obj[segment]
+            else:
+                rules, value = item_rules, entry
+            expected_type = rules["type"]
+
+            # Special case: bool is a subclass of int in Python, so
+            # isinstance(True, int) returns True. We want to reject booleans
+            # when the schema expects an int, so check for bool first.
+            if isinstance(value, bool) and expected_type is not bool:
+                # Value is bool but schema doesn't want bool.
+                actual_name = type(value).__name__
+                errors.append(f"Key '{_render(parent, segment, index)}': expected {expected_type.__name__}, got {actual_name}")
+                continue
+            elif not isinstance(value, bool) and expected_type is bool:
+                # Schema wants bool but value is something else.
+                actual_name = type(value).__name__
+                errors.append(f"Key '{_render(parent, segment, index)}': expected bool, got {actual_name}")
+                continue
+            elif not isinstance(value, expected_type):
+                # General type mismatch.
+                actual_name = type(value).__name__
+                errors.append(f"Key '{_render(parent, segment, index)}': expected {expected_type.__name__}, got {actual_name}")
+                continue
+            if len(rules) == 2 and "required" in rules:
+                continue  # The plain {"type", "required"} case: done.
+
+            # Right type; now the value constraints.
+            if "enum" in rules and value not in rules["enum"]:
+                errors.append(f"Key '{_render(parent, segment, index)}': expected one of {list(rules['enum'])!r}, got {value!r}")
+            if "min" in rules and value < rules["min"]:
+                errors.append(f"Key '{_render(parent, segment, index)}': {value!r} is less than minimum {rules['min']!r}")
+            if "max" in rules and value > rules["max"]:
+                errors.append(f"Key '{_render(parent, segment, index)}': {value!r} is greater than maximum {rules['max']!r}")
+            if "pattern" in rules and re.search(rules["pattern"], value) is None:
+                errors.append(f"Key '{_render(parent, segment, index)}': {value!r} does not match pattern {rules['pattern']!r}")
+
+            # Containers: check their contents next, before our next sibling.
+            path = (parent, segment, index)
+            if "schema" in rules:
+                stack.append((path, iter(rules["schema"].items()), value, None, False))
+                break
+            if "items" in rules:
+                stack.append((path, enumerate(value), None, rules["items"], True))
+                break
+            if "values" in rules:
+                stack.append((path, iter(value.items()), None, rules["values"], False))
+                break
+        else:
+            # This container is done; back to its parent.
+            stack.pop()
+
+    return errors[:max_errors] if max_errors else errors
+
+
+def apply_defaults(config: dict, schema: dict) -> dict:
+    """
+    A copy of config with every missing key that has a "default" filled in,
+    in nested schemas too. Only the dicts and lists on the way to a nested
+    schema are copied; the default values themselves are shared, not copied.
+    """
+    result = dict(config)
+    stack = [(result, schema)]
+    while stack:
+        obj, schema = stack.pop()
+        for key, rules in schema.items():
+            if key not in obj:
+                if "default" in rules:
+                    obj[key] = rules["default"]
+                continue
+            value = obj[key]
+            if "schema" in rules and isinstance(value, dict):
+                obj[key] = dict(value)
+                stack.append((obj[key], rules["schema"]))
+            elif isinstance(rules.get("items"), dict) and "schema" in rules["items"] and isinstance(value, list):
+                obj[key] = [dict(item) if isinstance(item, dict) else item for item in value]
+                stack.extend((item, rules["items"]["schema"]) for item in obj[key] if isinstance(item, dict))
+    return result
+
+
+# ─── Compiled engine ─────────────────────────────────────────────────────────
+
+class CompiledSchema:
+    """
+    A schema turned into straight-line Python, for validating many configs.
+
+    Build one with `compile_schema(schema)`, then call
+    `validate(config, max_errors=0)`; it returns exactly what
+    `validate_config(config, schema, max_errors or None)` would.
+    `is_valid(config)` is a second generated function that returns False
+    at the first failure without formatting any message.
+    The schema is read once, at compile time — later edits to the dict
+    are not seen. `source` holds the generated code.
+    """
+
+    def __init__(self, source: str, validate: Callable[..., list[str]], is_valid: Callable[[dict], bool]):
+        self.source = source
+        self.validate = validate
+        self.is_valid = is_valid
+
+    def __call__(self, config: dict) -> list[str]:
+        return self.validate(config)
+
+
+class _BudgetSpent(Exception):
+    pass
+
+
+class _ErrorBudget(list):
+    """An error list that stops validation once it holds `limit` errors."""
+
+    limit = 0
+
+    def append(self, error: str) -> None:
+        super().append(error)
+        if len(self) >= self.limit:
+            raise _BudgetSpent
+
+
+class _CodeGen:
+    """
+    Emits the source of validate(config, max_errors=0), or with `fail_fast`
+    of is_valid(config). Subtrees nested deeper than MAX_INDENT levels go
+    into helper functions, which keeps the code inside Python's limits on
+    indentation and nested loops.
+    """
+
+    MAX_INDENT = 24
+
+    def __init__(self, fail_fast: bool = False):
+        self.fail_fast = fail_fast
+        self.namespace: dict = {"_ErrorBudget": _ErrorBudget, "_BudgetSpent": _BudgetSpent}
+        self.names: dict[int, str] = {}
+        self.lines: list[str] = []
+        self.helpers: list[str] = []
+
+    def function(self, schema: dict) -> str:
+        """The source of the whole function (helpers first)."""
+        if self.fail_fast:
+            self.lines = ["def is_valid(config):"]
+            self.emit_object(schema, "config", [], 1, 0)
+            self.lines.append("    return True")
+        else:
+            # The budget raises _BudgetSpent from errors.append(), which
+            # unwinds any helpers; `try` itself costs nothing until then.
+            self.lines = [
+                "def validate(config, max_errors=0):",
+                "    errors = []",
+                "    if max_errors:",
+                "        errors = _ErrorBudget()",
+                "        errors.limit = max_errors",
+                "    try:",
+                "        pass",
+            ]
+            self.emit_object(schema, "config", [], 2, 0)
+            self.lines += [
+                "    except _BudgetSpent:",
+                "        pass",
+                "    return list(errors) if max_errors else errors",
+            ]
+        return "\n\n".join(self.helpers + ["\n".join(self.lines)]) + "\n"
+
+    def fail(self, pad: str, message: Callable[[], str]) -> str:
+        """The statement for a failed check; the message is only built if kept."""
+        return f"{pad}return False" if self.fail_fast else f"{pad}errors.append({message()})"
+
+    def constant(self, value) -> str:
+        """An expression for `value`: a literal for strings, else a global."""
+        if type(value) is str:
+            return repr(value)
+        if id(value) not in self.names:
+            self.names[id(value)] = f"_c{len(self.names)}"
+            self.namespace[self.names[id(value)]] = value
+        return self.names[id(value)]
+
+    def message(self, lead: str, path: list[tuple[str, str]], *tail: tuple[str, str]) -> str:
+        """
+        An expression for lead + "'<path>'" + tail. Parts are constant text
+        ("c") or runtime expressions ("e"). Keys are folded into the
+        literals here, so only list indexes and dict keys held in loop
+        variables are joined at runtime — and only when the error happens.
+        """
+        parts = [("c", lead + "'")]
+        for i, (kind, text) in enumerate(path):
+            if kind == "key":
+                parts.append(("c", f".{text}" if i else text))
+            elif kind == "index":
+                parts += [("c", "["), ("e", f"str({text})"), ("c", "]")]
+            else:  # a dict key held in a variable
+                parts.append(("e", f"'.' + str({text})" if i else f"str({text})"))
+        parts += [("c", "'"), *tail]
+
+        pieces: list[str] = []
+        text = ""
+        for kind, value in parts:
+            if kind == "c":
+                text += value
+                continue
+            if text:
+                pieces.append(self.constant(text))
+                text = ""
+            pieces.append(value)
+        if text:
+            pieces.append(self.constant(text))
+        return " + ".join(pieces)
+
+    def emit_object(self, schema: dict, obj: str, path: list, indent: int, depth: int) -> None:
+        pad = "    " * indent
+        v = f"v{depth}"
+        for key, rules in schema.items():
+            key_path = path + [("key", str(key))]
+            k = self.constant(key)
+            self.lines += [f"{pad}if {k} in {obj}:", f"{pad}    {v} = {obj}[{k}]"]
+            self.emit_value(rules, v, key_path, indent + 1, depth)
+            if rules.get("required") and "default" not in rules:
+                self.lines += [f"{pad}else:", self.fail(pad + "    ", lambda: self.message("Missing required key: ", key_path))]
+
+    def emit_value(self, rules: dict, v: str, path: list, indent: int, depth: int) -> None:
+        if indent > self.MAX_INDENT:
+            # Continue in a helper taking the value, errors and loop variables.
+            number = len(self.helpers)
+            name = f"_check{number}"
+            loop_vars = [text for kind, text in path if kind != "key"]
+            pad = "    " * indent
+            if self.fail_fast:
+                args = ", ".join([v] + loop_vars)
+                self.lines += [f"{pad}if not {name}({args}):", f"{pad}    return False"]
+            else:
+                args = ", ".join([v, "errors"] + loop_vars)
+                self.lines.append(f"{pad}{name}({args})")
+            outer, self.lines = self.lines, [f"def {name}({args}):"]
+            self.helpers.append("")  # reserve the name before recursing
+            self.emit_value(rules, v, path, 1, depth)
+            if self.fail_fast:
+                self.lines.append("    return True")
+            self.helpers[number] = "\n".join(self.lines)
+            self.lines = outer
+            return
+        pad = "    " * indent
+        inner = pad + "    "
         expected_type = rules["type"]
-        required = rules["required"]
+        t = self.constant(expected_type)
+        bad_type = f"not isinstance({v}, {t})"
+        if expected_type is not bool and issubclass(bool, expected_type):
+            bad_type = f"({bad_type} or type({v}) is bool)"
+        self.lines += [
+            f"{pad}if type({v}) is not {t} and {bad_type}:",
+            self.fail(inner, lambda: self.message(
+                "Key ", path, ("c", f": expected {expected_type.__name__}, got "), ("e", f"type({v}).__name__"))),
+        ]
+        start = len(self.lines)
+
+        if "enum" in rules:
+            allowed = rules["enum"]
+            listed = self.constant(tuple(allowed))
+            try:
+                members = self.constant(frozenset(allowed))
+            except TypeError:  # unhashable members
+                self.lines.append(f"{inner}found = {v} in {listed}")
+            else:
+                # An unhashable value (a list, say) is compared member by member.
+                self.lines += [
+                    f"{inner}try:",
+                    f"{inner}    found = {v} in {members}",
+                    f"{inner}except TypeError:",
+                    f"{inner}    found = {v} in {listed}",
+                ]
+            self.lines += [
+                f"{inner}if not found:",
+                self.fail(inner + "    ", lambda: self.message(
+                    "Key ", path, ("c", f": expected one of {list(allowed)!r}, got "), ("e", f"repr({v})"))),
+            ]
+        for rule, op, words in (("min", "<", "less than minimum"), ("max", ">", "greater than maximum")):
+            if rule in rules:
+                self.lines += [
+                    f"{inner}if {v} {op} {self.constant(rules[rule])}:",
+                    self.fail(inner + "    ", lambda: self.message(
+                        "Key ", path, ("c", ": "), ("e", f"repr({v})"), ("c", f" is {words} {rules[rule]!r}"))),
+                ]
+        if "pattern" in rules:
+            pattern = self.constant(re.compile(rules["pattern"]))
+            self.lines += [
+                f"{inner}if {pattern}.search({v}) is None:",
+                self.fail(inner + "    ", lambda: self.message(
+                    "Key ", path, ("c", ": "), ("e", f"repr({v})"), ("c", f" does not match pattern {rules['pattern']!r}"))),
+            ]
+
+        child = f"v{depth + 1}"
+        if "schema" in rules:
+            self.emit_object(rules["schema"], v, path, indent + 1, depth + 1)
+        elif "items" in rules:
+            self.lines.append(f"{inner}for i{depth}, {child} in enumerate({v}):")
+            self.emit_value(rules["items"], child, path + [("index", f"i{depth}")], indent + 2, depth + 1)
+        elif "values" in rules:
+            self.lines.append(f"{inner}for k{depth}, {child} in {v}.items():")
+            self.emit_value(rules["values"], child, path + [("dict", f"k{depth}")], indent + 2, depth + 1)
+        if len(self.lines) > start:
+            # Constraints and contents are only checked once the type is right.
+            self.lines.insert(start, f"{pad}else:")
+
+
+def compile_schema(schema: dict) -> CompiledSchema:
+    """
+    Generate and compile a validator function for `schema`.
+
+    Strategy:
+    - One `if key in obj` block per schema key, in schema order, with
+      nested schemas inlined and lists/dicts checked in `for` loops, so
+      errors come out in the same order as from `validate_config`.
+    - Everything that depends only on the schema is done here: whole
+      messages for keys reached through dicts, the "expected X" part, enum
+      sets, compiled patterns, and whether the bool special case can apply
+      at all. At runtime only list indexes and dict keys are stitched into
+      a message, and only for an error.
+    - Keys, types and messages reach the generated code as constants
+      (string literals or names bound in its globals), never as lookups
+      into the schema.
+    - Type check: `type(v) is T` first, the common exact hit, then
+      `isinstance` for subclasses. A bool only needs rejecting when T is a
+      base class of bool (int, object); when T is bool, isinstance already
+      does the job, since bool can't be subclassed.
+    - is_valid is the same code with every error replaced by
+      `return False`, so it neither formats nor keeps going.
+    """
+    sources = []
+    functions = []
+    for fail_fast in (False, True):
+        gen = _CodeGen(fail_fast)
+        source = gen.function(schema)
+        exec(compile(source, "<compiled schema>", "exec"), gen.namespace)
+        sources.append(source)
+        functions.append(gen.namespace["is_valid" if fail_fast else "validate"])
+    return CompiledSchema("\n\n".join(sources), *functions)
+
+
+class ValidationCache:
+    """
+    Results of a CompiledSchema, remembered per caller-supplied key and
+    evicted least recently used first once `maxsize` keys are held.
+
+    The key must identify the config exactly — a hash of the raw blob it
+    was parsed from, or a version stamp — since the cache never looks at
+    the config itself. Deriving a key from the parsed config walks all of
+    it, which costs several times a compiled validation (see `--bench`);
+    a hit here costs one dict lookup. An entry holds the full error list
+    once `validate` has run for it, or just the answer from `is_valid`.
+    """
+
+    def __init__(self, compiled: CompiledSchema, maxsize: int = 1024):
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.compiled = compiled
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[str, ...] | bool] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable) -> tuple[str, ...] | bool | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: Hashable, entry: tuple[str, ...] | bool) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def validate(self, config: dict, key: Hashable) -> list[str]:
+        entry = self._lookup(key)
+        if type(entry) is tuple or entry is True:
+            self.hits += 1
+            return list(entry) if entry is not True else []
+        self.misses += 1
+        errors = self.compiled.validate(config)
+        self._store(key, tuple(errors))
+        return errors
+
+    def is_valid(self, config: dict, key: Hashable) -> bool:
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return entry if type(entry) is bool else not entry
+        self.misses += 1
+        valid = self.compiled.is_valid(config)
+        self._store(key, valid)
+        return valid
+
+
+# ─── Batch validation ────────────────────────────────────────────────────────
+
+@dataclass
+class RecordReport:
+    """The outcome for one record: its 0-based position, and its NDJSON line."""
+    index: int
+    line: int | None
+    errors: list[str]
+
+
+@dataclass
+class BatchSummary:
+    records: int = 0
+    invalid: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+
+    @property
+    def valid(self) -> int:
+        return self.records - self.invalid
+
+
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*\Z")
+
+
+def _json_array_items(f: TextIO, buffer: str, chunk_size: int, max_record: int) -> Iterator:
+    """
+    Values of the JSON array whose "[" starts `buffer` (the text read so
+    far), reading more of `f` only as needed. Each element is decoded with
+    raw_decode; one that fails, or a number followed only by characters
+    that could continue it up to the end of the buffer, is retried once
+    more text is in. Reads double while
+    a record keeps failing, so a big record costs O(its size), and a record
+    longer than `max_record` characters is an error rather than a reason to
+    read the rest of the file.
+    """
+    decoder = json.JSONDecoder()
+    pos = buffer.index("[") + 1
+    eof = False
+    expect_value = True  # after "[" or ","
+    read_size = chunk_size
+    count = 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        if pos < len(buffer):
+            ch = buffer[pos]
+            if not expect_value:
+                if ch == "]":
+                    return
+                if ch != ",":
+                    raise ValueError(f"Invalid JSON array: expected ',' or ']' after element {count}, got {ch!r}")
+                pos += 1
+                expect_value = True
+                continue
+            if ch == "]" and count == 0:
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as exc:
+                if eof or len(buffer) - pos > max_record:
+                    raise ValueError(f"Invalid JSON in array element {count}: {exc}") from None
+                end = None
+            if end is not None and not eof and type(value) in (int, float) and _NUMBER_TAIL.match(buffer, end):
+                end = None  # "1." or "2e" then the end of the buffer: the number may go on
+            if end is not None:
+                yield value
+                count += 1
+                pos = end
+                expect_value = False
+                read_size = chunk_size
+                continue
+            read_size = min(read_size * 2, max_record)  # this element needs more text
+        elif eof:
+            raise ValueError(f"Invalid JSON array: ends after element {count}")
+        more = f.read(read_size)
+        eof = not more
+        buffer = buffer[pos:] + more
+        pos = 0
+
+
+def iter_records(f: TextIO, chunk_size: int = 1 << 16, max_record: int = 64 << 20) -> Iterator[tuple[int, int | None, object]]:
+    """
+    (index, line, payload) for each record of an open text file: either one
+    JSON array of records, or NDJSON (one record per line, blank lines
+    skipped). The format is told by the first non-blank character. NDJSON
+    payloads are the raw line, left for `_check` to parse, so a pool of
+    workers can share the decoding; array elements come decoded.
+    """
+    buffer = ""
+    while not buffer.strip():
+        more = f.read(chunk_size)
+        if not more:
+            return
+        buffer += more
+    if buffer.lstrip()[0] == "[":
+        for index, value in enumerate(_json_array_items(f, buffer, chunk_size, max_record)):
+            yield index, None, value
+        return
+
+    # NDJSON: finish the first partial line, then read line by line.
+    head, newline, rest = buffer.rpartition("\n")
+    lines = head.split("\n") if newline else []
+    tail = rest + (f.readline() if rest else "")
+    index = 0
+    for lineno, line in enumerate(chain(lines, [tail] if tail else [], f), 1):
+        if line.strip():
+            yield index, lineno, line
+            index += 1
+
+
+def _check(batch: list[tuple[int, int | None, object]], validate: Callable[[dict], list[str]]) -> list[RecordReport]:
+    reports = []
+    for index, line, payload in batch:
+        if line is not None:
+            try:
+                payload = json.loads(payload)
+            except json.JSONDecodeError as exc:
+                reports.append(RecordReport(index, line, [f"Invalid JSON: {exc}"]))
+                continue
+        if isinstance(payload, dict):
+            errors = validate(payload)
+        else:
+            errors = [f"Expected an object, got {type(payload).__name__}"]
+        reports.append(RecordReport(index, line, errors))
+    return reports
 
-        if key not in config:
-            # Key is absent from config.
-            if required:
-                errors.append(f"Missing required key: '{key}'")
-            # If optional and absent — no error, move on.
+
+_worker_validate: Callable[[dict], list[str]] | None = None
+
+
+def _init_worker(schema: dict) -> None:
+    global _worker_validate
+    _worker_validate = compile_schema(schema).validate
+
+
+def _check_in_worker(batch: list[tuple[int, int | None, object]]) -> list[RecordReport]:
+    return _check(batch, _worker_validate)
+
+
+def iter_reports(
+    f: TextIO,
+    schema: dict,
+    workers: int = 0,
+    batch_size: int = 1000,
+    context: multiprocessing.context.BaseContext | None = None,
+) -> Iterator[RecordReport]:
+    """
+    A RecordReport for every record of `f` (see `iter_records`), in file order.
+
+    Strategy:
+    - The schema is compiled once (per process) and the file is read
+      incrementally, so memory is bounded by the batches in flight, not by
+      the file.
+    - With `workers`, batches of `batch_size` records go to a process pool
+      whose workers compile the schema in their initializer. At most two
+      batches per worker are outstanding, and results are yielded in
+      submission order, so reading never runs far ahead of the consumer.
+    """
+    records = iter_records(f)
+    if not workers:
+        validate = compile_schema(schema).validate
+        while batch := list(islice(records, batch_size)):
+            yield from _check(batch, validate)
+        return
+
+    ctx = context or multiprocessing.get_context()
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker, initargs=(schema,)) as pool:
+        pending: deque = deque()
+        while batch := list(islice(records, batch_size)):
+            pending.append(pool.submit(_check_in_worker, batch))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def validate_file(
+    path: str,
+    schema: dict,
+    output: str | None = None,
+    workers: int = 0,
+    batch_size: int = 1000,
+) -> BatchSummary:
+    """
+    Validate every record of an NDJSON or JSON-array file at `path`.
+    Reports for invalid records go to `output` as NDJSON lines of
+    {"index", "line", "errors"}; the return value sums it all up.
+    """
+    summary = BatchSummary()
+    start = time.perf_counter()
+    with open(path, encoding="utf-8") as f:
+        sink = open(output, "w", encoding="utf-8") if output is not None else None
+        try:
+            for report in iter_reports(f, schema, workers, batch_size):
+                summary.records += 1
+                if report.errors:
+                    summary.invalid += 1
+                    summary.errors += len(report.errors)
+                    if sink is not None:
+                        sink.write(json.dumps({"index": report.index, "line": report.line,
+                                               "errors": report.errors}) + "\n")
+        finally:
+            if sink is not None:
+                sink.close()
+    summary.seconds = time.perf_counter() - start
+    return summary
+
+
+# ─── Benchmarks ──────────────────────────────────────────────────────────────
+
+def generate_schema(width: int, depth: int, seed: int = 0) -> dict:
+    """
+    A random schema with `width` keys per level, nested `depth` levels deep.
+
+    Most keys are scalars — int with bounds, str with an enum or pattern,
+    float, bool, or a list of ints — and half are required. Every level
+    above the last also has one nested dict and one list of dicts, so the
+    key count roughly doubles per level of depth.
+    """
+    rng = random.Random(seed)
+
+    def level(d: int) -> dict:
+        schema = {}
+        for i in range(width):
+            kind = rng.choice(("int", "int", "str", "str", "float", "bool", "list"))
+            if kind == "int":
+                rules = {"type": int, "min": 0, "max": 1000}
+            elif kind == "str":
+                rules = {"type": str, "enum": ["a", "b", "c"]} if rng.random() < 0.5 else \
+                    {"type": str, "pattern": r"^[a-z]+$"}
+            elif kind == "list":
+                rules = {"type": list, "items": {"type": int, "min": 0}}
+            else:
+                rules = {"type": float if kind == "float" else bool}
+            rules["required"] = rng.random() < 0.5
+            schema[f"{kind}_{d}_{i}"] = rules
+        if d < depth:
+            schema[f"dict_{d}"] = {"type": dict, "required": True, "schema": level(d + 1)}
+            schema[f"items_{d}"] = {"type": list, "required": False, "items": {"type": dict, "schema": level(d + 1)}}
+        return schema
+
+    return level(0)
+
+
+_BAD_VALUES = {int: ("1", -1, True), str: (5, "d", "A1"), float: ("1.0",), bool: (1,), list: ({}, [-1])}
+
+
+def generate_config(schema: dict, error_rate: float, rng: random.Random) -> dict:
+    """
+    A config for `schema` in which each value (or required key) is wrong
+    with probability `error_rate`: the wrong type, out of range, or missing.
+    Lists of dicts get two elements; optional keys are present half the time.
+    """
+    config = {}
+    for key, rules in schema.items():
+        if not rules.get("required") and rng.random() < 0.5:
             continue
+        expected = rules["type"]
+        if rng.random() < error_rate and expected is not dict:
+            if rules.get("required") and rng.random() < 0.25:
+                continue
+            config[key] = rng.choice(_BAD_VALUES[expected])
+        elif expected is dict:
+            config[key] = generate_config(rules["schema"], error_rate, rng)
+        elif expected is list:
+            items = rules["items"]
+            config[key] = [generate_config(items["schema"], error_rate, rng) for _ in range(2)] \
+                if "schema" in items else [rng.randrange(100) for _ in range(3)]
+        elif expected is int:
+            config[key] = rng.randrange(1000)
+        elif expected is str:
+            config[key] = rules["enum"][0] if "enum" in rules else "abc"
+        else:
+            config[key] = expected(rng.random()) if expected is float else rng.random() < 0.5
+    return config
 
-        # Key is present; now check its type.
-        value = config[key]
 
-        # Special case: bool is a subclass of int in Python, so
-        # isinstance(True, int) returns True. We want to reject booleans
-        # when the schema expects an int, so check for bool first.
-        if isinstance(value, bool) and expected_type is not bool:
-            # Value is bool but schema doesn't want bool.
-            actual_name = type(value).__name__
-            errors.append(f"Key '{key}': expected {expected_type.__name__}, got {actual_name}")
-        elif not isinstance(value, bool) and expected_type is bool and not isinstance(value, bool):
-            # Schema wants bool but value is something else.
-            actual_name = type(value).__name__
-            errors.append(f"Key '{key}': expected bool, got {actual_name}")
-        elif not isinstance(value, expected_type):
-            # General type mismatch.
-            actual_name = type(value).__name__
-            errors.append(f"Key '{key}': expected {expected_type.__name__}, got {actual_name}")
+def _bench_engines(schema: dict) -> dict[str, Callable[[dict], object]]:
+    compiled = compile_schema(schema)
+    return {
+        "interpreted": lambda config: validate_config(config, schema),
+        "compiled": compiled.validate,
+        "max_errors=1": lambda config: compiled.validate(config, max_errors=1),
+        "is_valid": compiled.is_valid,
+    }
+
+
+def check_engines_agree(schema: dict, configs: list[dict]) -> None:
+    """
+    Raise AssertionError unless every engine gives the same answer for
+    every config: identical error lists from the interpreted and compiled
+    engines, their first error under a budget of one, and is_valid True
+    exactly when there are none.
+    """
+    compiled = compile_schema(schema)
+    for config in configs:
+        expected = validate_config(config, schema)
+        assert compiled.validate(config) == expected, (config, expected)
+        assert validate_config(config, schema, max_errors=1) == expected[:1], config
+        assert compiled.validate(config, max_errors=1) == expected[:1], config
+        assert compiled.is_valid(config) is (not expected), config
 
-    return errors
+
+def _bench_rate(validate: Callable[[dict], object], configs: list[dict], repeat: int = 3) -> float:
+    """Validations per second, best of `repeat` passes over `configs`."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for config in configs:
+            validate(config)
+        best = min(best, time.perf_counter() - start)
+    return len(configs) / best
+
+
+def _bench_bytes(validate: Callable[[dict], object], configs: list[dict]) -> float:
+    """
+    Mean peak bytes allocated by one validation (tracemalloc), less what
+    the measuring loop allocates around a call that does nothing.
+    """
+    validate(configs[0])  # warm up any lazily built state
+    tracemalloc.start()
+    try:
+        totals = []
+        for call in (lambda config: None, validate):
+            total = 0
+            for config in configs:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                call(config)
+                total += tracemalloc.get_traced_memory()[1] - before
+            totals.append(total)
+        return max(0, totals[1] - totals[0]) / len(configs)
+    finally:
+        tracemalloc.stop()
+
+
+def _bench_keys(schema: dict) -> Iterator[str]:
+    """Every key of a schema, nested ones included."""
+    stack = [schema]
+    while stack:
+        for key, rules in stack.pop().items():
+            yield key
+            for nested in (rules.get("schema"), rules.get("items", {}).get("schema"), rules.get("values", {}).get("schema")):
+                if nested is not None:
+                    stack.append(nested)
+
+
+def run_benchmark(scale: float = 1.0) -> None:
+    """
+    Validations/sec and allocation per validation for each engine, on
+    generated schemas of varying width and depth and configs with a
+    controlled error rate. Every engine is first checked against the
+    interpreted one on the same configs.
+
+        python 2026-03-03-json-config-validator-solution.py --bench [scale]
+
+    - err% is the chance that any one value is wrong; invalid% is the
+      share of configs with at least one error, and errs the mean count.
+    - Throughput is in thousands of validations per second, best of three.
+      "cache hit" is ValidationCache.validate with every config's key
+      already cached.
+    - B/call is the peak memory one validation allocates, error strings
+      included, as seen by tracemalloc.
+    - compile ms is the one-off cost of compile_schema; break-even is the
+      number of validations after which compiling has paid for itself.
+    """
+    n = max(10, int(500 * scale))
+    engines = list(_bench_engines({}))
+    columns = engines + ["cache hit"]
+    print(f"{'width':>5}{'depth':>6}{'keys':>6}{'err%':>6}{'invalid%':>9}{'errs':>6}"
+          + "".join(f"{name:>14}" for name in columns) + f"{'compile ms':>12}{'break-even':>12}")
+    allocations = []
+    for width, depth in ((4, 0), (16, 0), (64, 0), (8, 2), (8, 4), (32, 3)):
+        schema = generate_schema(width, depth, seed=width * 100 + depth)
+        keys = sum(1 for _ in _bench_keys(schema))
+        start = time.perf_counter()
+        compile_schema(schema)
+        compile_seconds = time.perf_counter() - start
+        for error_rate in (0.0, 0.01, 0.1):
+            rng = random.Random(1)
+            configs = [generate_config(schema, error_rate, rng) for _ in range(n)]
+            check_engines_agree(schema, configs)
+            counts = [len(validate_config(config, schema)) for config in configs]
+            validators = _bench_engines(schema)
+            rates = {name: _bench_rate(validate, configs) for name, validate in validators.items()}
+            cache = ValidationCache(compile_schema(schema), maxsize=n)
+            keyed = list(enumerate(configs))
+            rates["cache hit"] = _bench_rate(lambda item: cache.validate(item[1], item[0]), keyed)
+            saved = 1 / rates["interpreted"] - 1 / rates["compiled"]
+            break_even = f"{compile_seconds / saved:>12,.0f}" if saved > 0 else f"{'never':>12}"
+            print(
+                f"{width:>5}{depth:>6}{keys:>6}{error_rate:>6.0%}"
+                f"{sum(1 for c in counts if c) / n:>9.0%}{sum(counts) / n:>6.1f}"
+                + "".join(f"{rates[name] / 1000:>14,.1f}" for name in columns)
+                + f"{compile_seconds * 1000:>12.1f}{break_even}"
+            )
+            sample = configs[:max(10, n // 10)]
+            allocations.append((width, depth, error_rate,
+                                [_bench_bytes(validate, sample) for validate in validators.values()]))
+
+    print(f"\n{'width':>5}{'depth':>6}{'err%':>6}" + "".join(f"{name + ' B/call':>20}" for name in engines))
+    for width, depth, error_rate, sizes in allocations:
+        print(f"{width:>5}{depth:>6}{error_rate:>6.0%}" + "".join(f"{size:>20,.0f}" for size in sizes))
 
 
 # ─── Tests ───────────────────────────────────────────────────────────────────
@@ -113,8 +952,300 @@ def test_extra_keys_ignored():
     errors = validate_config(config, schema)
     assert errors == [], "Extra keys should be ignored"
 
+def test_compiled_matches_interpreted():
+    types = [str, int, float, bool, dict, list, object]
+    schema = {f"k{i}_{t.__name__}": {"type": t, "required": i % 2 == 0}
+              for i, t in enumerate(types * 2)}
+    schema["it's \"quoted\""] = {"type": int, "required": True}
+    values = ["s", 0, 1.5, True, False, {}, OrderedDict(), [], None]
+    compiled = compile_schema(schema)
+    keys = list(schema)
+    for shift in range(len(values) + 1):
+        # Every key gets every value (or goes missing) across the shifts.
+        config = {key: values[(i + shift) % len(values)]
+                  for i, key in enumerate(keys) if (i + shift) % (len(values) + 1) != len(values)}
+        assert compiled.validate(config) == validate_config(config, schema), compiled.source
+    assert compiled({}) == validate_config({}, schema)
+    # Enum checks on values that cannot be hashed, against either kind of members.
+    for allowed in ([1, 2], [[1], {"a": 1}]):
+        schema = {"x": {"type": object, "enum": allowed}}
+        compiled = compile_schema(schema)
+        for value in ([], [1], {"a": 1}, 1, ([],)):
+            config = {"x": value}
+            assert compiled.validate(config) == validate_config(config, schema), compiled.source
+            assert compiled.is_valid(config) == (value in allowed)
+
+NESTED_SCHEMA = {
+    "name":    {"type": str, "required": True, "pattern": r"^[a-z][a-z0-9-]*$"},
+    "mode":    {"type": str, "required": False, "enum": ["dev", "prod"], "default": "dev"},
+    "db": {"type": dict, "required": True, "schema": {
+        "host": {"type": str, "required": True},
+        "port": {"type": int, "required": True, "min": 1, "max": 65535},
+        "pool": {"type": dict, "required": False, "schema": {
+            "size":    {"type": int, "required": False, "min": 1, "default": 5},
+            "timeout": {"type": float, "required": False, "default": 30.0},
+        }},
+    }},
+    "servers": {"type": list, "required": False, "items": {"type": dict, "schema": {
+        "host":  {"type": str, "required": True},
+        "ports": {"type": list, "required": False, "items": {"type": int, "max": 65535}},
+    }}},
+    "labels": {"type": dict, "required": False, "values": {"type": str}},
+}
+
+def test_nested_paths():
+    config = {
+        "name": "api",
+        "db": {"port": "5432", "pool": {"size": True}},
+        "servers": [{"host": "a"}, {"ports": [80, 70000, "x"]}],
+        "labels": {"env": "prod", "tier": 3},
+    }
+    assert validate_config(config, NESTED_SCHEMA) == [
+        "Missing required key: 'db.host'",
+        "Key 'db.port': expected int, got str",
+        "Key 'db.pool.size': expected int, got bool",
+        "Missing required key: 'servers[1].host'",
+        "Key 'servers[1].ports[1]': 70000 is greater than maximum 65535",
+        "Key 'servers[1].ports[2]': expected int, got str",
+        "Key 'labels.tier': expected str, got int",
+    ]
+
+def test_constraints():
+    config = {"name": "Bad Name", "mode": "staging", "db": {"host": "h", "port": 0}}
+    assert validate_config(config, NESTED_SCHEMA) == [
+        "Key 'name': 'Bad Name' does not match pattern '^[a-z][a-z0-9-]*$'",
+        "Key 'mode': expected one of ['dev', 'prod'], got 'staging'",
+        "Key 'db.port': 0 is less than minimum 1",
+    ]
+    assert validate_config({"name": 5, "db": {"host": "h", "port": 1}}, NESTED_SCHEMA) == \
+        ["Key 'name': expected str, got int"], "Constraints only apply once the type is right"
+
+def test_defaults():
+    schema = {"port": {"type": int, "required": True, "default": 8080}}
+    assert validate_config({}, schema) == [], "A defaulted key is never missing"
+    config = {"name": "api", "db": {"host": "h", "port": 1, "pool": {}}, "servers": [{"host": "a"}]}
+    filled = apply_defaults(config, NESTED_SCHEMA)
+    assert filled["mode"] == "dev" and filled["db"]["pool"] == {"size": 5, "timeout": 30.0}
+    assert config["db"]["pool"] == {} and "mode" not in config, "The input is not modified"
+    assert validate_config(filled, NESTED_SCHEMA) == []
+
+def test_deep_documents():
+    depth = 5000
+    schema = leaf = {"x": {"type": int, "required": True}}
+    config = node = {}
+    for _ in range(depth):
+        leaf["n"] = {"type": dict, "required": True, "schema": {"x": {"type": int, "required": True}}}
+        leaf = leaf["n"]["schema"]
+        node["x"], node["n"] = 1, {}
+        node = node["n"]
+    node["x"] = "deep"
+    errors = validate_config(config, schema)
+    assert errors == ["Key '" + "n." * depth + "x': expected int, got str"], "No recursion limit"
+
+    # compile_schema moves deep subtrees into helper functions.
+    schema = leaf = {"l": {"type": list, "required": True, "items": {"type": int}}}
+    config = node = {}
+    for i in range(60):
+        leaf["n"] = {"type": dict, "required": True, "schema": {
+            "l": {"type": list, "required": True, "items": {"type": list, "items": {"type": int}}}}}
+        leaf = leaf["n"]["schema"]
+        node["l"], node["n"] = [[1, "a"]] if i % 7 == 0 else [], {}
+        node = node["n"]
+    compiled = compile_schema(schema)
+    assert "def _check" in compiled.source
+    assert compiled(config) == validate_config(config, schema) and len(compiled(config)) == 10
+
+def test_nested_compiled_matches_interpreted():
+    compiled = compile_schema(NESTED_SCHEMA)
+    configs = [
+        {},
+        {"name": "api", "db": {"host": "h", "port": 5432}},
+        {"name": "api", "db": {"port": "5432", "pool": {"size": True}},
+         "servers": [{"host": "a"}, {"ports": [80, 70000, "x"]}], "labels": {"env": "prod", "tier": 3}},
+        {"name": "Bad Name", "mode": "staging", "db": {"host": "h", "port": 0}, "labels": {5: 5}},
+        {"name": "x", "db": [], "servers": {}, "labels": []},
+    ]
+    for config in configs:
+        assert compiled(config) == validate_config(config, NESTED_SCHEMA), (config, compiled.source)
+    # Int keys are keys, whether declared or under "values"; only list positions get brackets.
+    schema = {1: {"type": int, "required": True},
+              "m": {"type": dict, "required": False, "schema": {2: {"type": int, "required": True}}},
+              "v": {"type": dict, "required": False, "values": {"type": list, "items": {"type": int}}}}
+    compiled = compile_schema(schema)
+    for config in ({}, {1: "x", "m": {}}, {1: 1, "m": {2: 2}, "v": {3: [0, "y"], "4": []}}):
+        assert compiled.validate(config) == validate_config(config, schema), (config, compiled.source)
+    assert validate_config({"m": {}, "v": {3: [0, "y"]}}, schema) == [
+        "Missing required key: '1'", "Missing required key: 'm.2'", "Key 'v.3[1]': expected int, got str"]
+
+FAIL_FAST_CONFIGS = [
+    {},
+    {"name": "api", "db": {"host": "h", "port": 5432}},
+    {"name": "api", "db": {"port": "5432", "pool": {"size": True}},
+     "servers": [{"host": "a"}, {"ports": [80, 70000, "x"]}], "labels": {"env": "prod", "tier": 3}},
+    {"name": "Bad Name", "mode": "staging", "db": {"host": "h", "port": 0}, "labels": {5: 5}},
+]
+
+def test_is_valid_fail_fast():
+    compiled = compile_schema(NESTED_SCHEMA)
+    for config in FAIL_FAST_CONFIGS:
+        assert compiled.is_valid(config) == (not validate_config(config, NESTED_SCHEMA)), config
+
+    class Counting(dict):
+        lookups = 0
+
+        def __contains__(self, key):
+            Counting.lookups += 1
+            return super().__contains__(key)
+
+    # Every key is wrong; is_valid should look at one and stop.
+    schema = {f"k{i}": {"type": int, "required": True} for i in range(50)}
+    config = Counting((f"k{i}", "x") for i in range(50))
+    assert not compile_schema(schema).is_valid(config) and Counting.lookups == 1
+    Counting.lookups = 0
+    assert len(compile_schema(schema).validate(config, max_errors=3)) == 3 and Counting.lookups == 3
+
+    # Deep schemas put the checks in helpers, which must stop as early.
+    schema = rules = {"n": {"type": dict, "required": True, "schema": {}}}
+    config = node = {}
+    for _ in range(40):
+        rules = rules["n"]["schema"]
+        rules["n"] = {"type": dict, "required": True, "schema": {}}
+        node["n"] = {}
+        node = node["n"]
+    rules["n"]["schema"]["x"] = {"type": int, "required": True}
+    node["n"] = {"x": 1}
+    deep = compile_schema(schema)
+    assert "def _check" in deep.source and deep.is_valid(config)
+    node["n"]["x"] = "1"
+    assert not deep.is_valid(config) and deep.validate(config, max_errors=1) == validate_config(config, schema)
+
+def test_max_errors():
+    compiled = compile_schema(NESTED_SCHEMA)
+    for config in FAIL_FAST_CONFIGS:
+        full = validate_config(config, NESTED_SCHEMA)
+        for n in range(1, len(full) + 2):
+            assert validate_config(config, NESTED_SCHEMA, max_errors=n) == full[:n], (config, n)
+            assert compiled.validate(config, max_errors=n) == full[:n], (config, n)
+        assert type(compiled.validate(config, max_errors=1)) is list
+
+def test_validation_cache():
+    compiled = compile_schema(NESTED_SCHEMA)
+    cache = ValidationCache(compiled, maxsize=2)
+    good, bad = FAIL_FAST_CONFIGS[1], FAIL_FAST_CONFIGS[3]
+    assert cache.validate(bad, "bad") == validate_config(bad, NESTED_SCHEMA)
+    # A hit never looks at the config, and a copy of the result comes back.
+    errors = cache.validate({}, "bad")
+    assert errors == validate_config(bad, NESTED_SCHEMA) and (cache.hits, cache.misses) == (1, 1)
+    errors.clear()
+    assert cache.is_valid(bad, "bad") is False and cache.validate(bad, "bad") and cache.hits == 3
+    # is_valid answers are cached too; a False one doesn't stand in for errors.
+    assert cache.is_valid(good, "good") and cache.validate(good, "good") == [] and cache.hits == 4
+    assert not cache.is_valid(FAIL_FAST_CONFIGS[0], "empty") and len(cache) == 2
+    assert cache.validate(FAIL_FAST_CONFIGS[0], "empty") == validate_config({}, NESTED_SCHEMA)
+    assert (cache.hits, cache.misses) == (4, 4)
+    # "bad" was least recently used, so it was evicted.
+    cache.validate(bad, "bad")
+    assert cache.misses == 5 and len(cache) == 2
+    # Configs that serialize alike but validate differently get their own keys.
+    schema = {"x": {"type": list, "required": True}}
+    cache = ValidationCache(compile_schema(schema))
+    assert cache.validate({"x": [1]}, b"list") == [] and cache.validate({"x": (1,)}, b"tuple") == validate_config({"x": (1,)}, schema)
+    assert cache.validate({1: [1]}, b"int key") == ["Missing required key: 'x'"] and cache.misses == 3
+
+BATCH_SCHEMA = {
+    "tenant": {"type": str, "required": True},
+    "limits": {"type": dict, "required": False, "schema": {"rps": {"type": int, "required": True, "min": 1}}},
+}
+
+BATCH_RECORDS = [
+    {"tenant": "a", "limits": {"rps": 10}},
+    {"tenant": 7},
+    {"tenant": "c", "limits": {"rps": 0}, "note": "x" * 300},
+    [1, 2],
+    {"tenant": "e", "limits": {"rps": 12345678901234567890}},
+    {"limits": {}},
+]
+
+def test_validate_ndjson_stream():
+    text = "\n".join(json.dumps(r) for r in BATCH_RECORDS[:3]) + "\n\n{not json\n" + \
+        "\n".join(json.dumps(r) for r in BATCH_RECORDS[3:])
+    reports = list(iter_reports(io.StringIO(text), BATCH_SCHEMA, batch_size=2))
+    assert [(r.index, r.line) for r in reports] == [(0, 1), (1, 2), (2, 3), (3, 5), (4, 6), (5, 7), (6, 8)]
+    assert reports[1].errors == ["Key 'tenant': expected str, got int"]
+    assert reports[2].errors == ["Key 'limits.rps': 0 is less than minimum 1"]
+    assert reports[3].errors[0].startswith("Invalid JSON: Expecting property name")
+    assert reports[4].errors == ["Expected an object, got list"]
+    assert reports[6].errors == ["Missing required key: 'tenant'", "Missing required key: 'limits.rps'"]
+    assert not reports[0].errors and not reports[5].errors
+
+def test_validate_json_array_incrementally():
+    text = " [\n" + ",\n".join(json.dumps(r) for r in BATCH_RECORDS) + "\n]\n"
+    expected = [validate_config(r, BATCH_SCHEMA) if isinstance(r, dict) else ["Expected an object, got list"]
+                for r in BATCH_RECORDS]
+    for chunk_size in (1, 3, 7, 64, 1 << 16):
+        # Tiny reads split numbers, strings and separators across chunks.
+        records = iter_records(io.StringIO(text), chunk_size=chunk_size, max_record=1000)
+        got = _check(list(records), compile_schema(BATCH_SCHEMA).validate)
+        assert [r.errors for r in got] == expected, chunk_size
+        assert [r.index for r in got] == list(range(len(BATCH_RECORDS)))
+    for chunk_size in (1, 2, 3):
+        # A chunk boundary inside "1.5" or "2e3" must not cut the number short.
+        records = iter_records(io.StringIO('[1.5, 2e3, -0.25E-1, {"a": 1}, 7]'), chunk_size=chunk_size)
+        assert [value for _, _, value in records] == [1.5, 2000.0, -0.025, {"a": 1}, 7], chunk_size
+    assert list(iter_records(io.StringIO("[]"))) == [] and list(iter_records(io.StringIO(""))) == []
+    for bad in ("[1, 2", "[1 2]", "[1,]", '[{"a": 1}, {"a": ]'):
+        try:
+            list(iter_records(io.StringIO(bad), chunk_size=2))
+            assert False, f"{bad!r} should not parse"
+        except ValueError:
+            pass
+    try:
+        list(iter_records(io.StringIO('["' + "x" * 5000), chunk_size=16, max_record=1000))
+        assert False, "A record over max_record should not be read to the end"
+    except ValueError:
+        pass
+
+def test_validate_file_parallel():
+    records = [BATCH_RECORDS[i % len(BATCH_RECORDS)] for i in range(600)]
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "configs.json")
+        with open(source, "w") as f:
+            json.dump(records, f)
+        serial = os.path.join(directory, "serial.ndjson")
+        parallel = os.path.join(directory, "parallel.ndjson")
+        summary = validate_file(source, BATCH_SCHEMA, output=serial, batch_size=50)
+        assert (summary.records, summary.valid, summary.invalid, summary.errors) == (600, 200, 400, 500)
+        assert validate_file(source, BATCH_SCHEMA, output=parallel, workers=2, batch_size=50).invalid == 400
+        with open(serial) as a, open(parallel) as b:
+            lines = a.read()
+            assert lines == b.read(), "Workers should report exactly what one process does"
+        first = json.loads(lines.splitlines()[0])
+        assert first == {"index": 1, "line": None, "errors": ["Key 'tenant': expected str, got int"]}
+
+def test_benchmark_engines_agree():
+    for width, depth in ((3, 0), (4, 2)):
+        schema = generate_schema(width, depth, seed=depth)
+        assert generate_schema(width, depth, seed=depth) == schema
+        rng = random.Random(0)
+        assert not any(validate_config(generate_config(schema, 0.0, rng), schema) for _ in range(20))
+        configs = [generate_config(schema, rate, rng) for rate in (0.05, 0.3, 1.0) for _ in range(20)]
+        assert all(validate_config(c, schema) for c in configs[-20:]), "Every value wrong"
+        check_engines_agree(schema, configs)
+
+def test_compiled_snapshot():
+    schema = {"port": {"type": int, "required": True}}
+    compiled = compile_schema(schema)
+    schema["host"] = {"type": str, "required": True}
+    assert compiled({"port": True}) == ["Key 'port': expected int, got bool"]
+    assert compiled({"port": 1}) == [], "Compiled schemas ignore later edits"
+
 
 if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        args = sys.argv[sys.argv.index("--bench") + 1:]
+        run_benchmark(float(args[0]) if args else 1.0)
+        sys.exit()
+
     tests = [
         test_valid_config,
         test_missing_required,
@@ -123,6 +1254,20 @@ if __name__ == "__main__":
         test_bool_not_valid_int,
         test_multiple_errors,
         test_extra_keys_ignored,
+        test_compiled_matches_interpreted,
+        test_compiled_snapshot,
+        test_nested_paths,
+        test_constraints,
+        test_defaults,
+        test_deep_documents,
+        test_nested_compiled_matches_interpreted,
+        test_is_valid_fail_fast,
+        test_max_errors,
+        test_validation_cache,
+        test_validate_ndjson_stream,
+        test_validate_json_array_incrementally,
+        test_validate_file_parallel,
+        test_benchmark_engines_agree,
     ]
     passed = 0
     for t in tests:
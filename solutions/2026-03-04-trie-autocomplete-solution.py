@@ -2,27 +2,66 @@
 
 from __future__ import annotations
 
+import heapq
+import random
+from array import array
+from bisect import bisect_left, insort
+from itertools import chain, count, groupby
+from typing import Iterable
+
 
 class TrieNode:
     def __init__(self):
         self.children: dict[str, TrieNode] = {}
         self.is_end: bool = False
         self.prefix_count: int = 0
+        self.score: float = 0.0
+        # Best words in this subtree as (-score, word), best first.
+        self.top: list[tuple[float, str]] = []
 
 
 class Trie:
-    def __init__(self):
+    def __init__(self, cache_size: int = 10):
+        if cache_size < 1:
+            raise ValueError("cache_size must be >= 1")
         self.root = TrieNode()
+        self.cache_size = cache_size
 
-    def insert(self, word: str) -> None:
+    def insert(self, word: str, score: float = 0.0) -> None:
+        """Insert `word`, or re-insert it with a new score."""
         node = self.root
         node.prefix_count += 1
+        path = [node]
         for ch in word:
             if ch not in node.children:
                 node.children[ch] = TrieNode()
             node = node.children[ch]
             node.prefix_count += 1
+            path.append(node)
+        lowered = node.is_end and score < node.score
         node.is_end = True
+        node.score = score
+        if lowered:
+            # It may drop out of some lists, letting in words they don't hold.
+            self._refresh_top(path, word)
+            return
+        entry = (-score, word)
+        for node in path:
+            top = node.top
+            for i, (_, other) in enumerate(top):
+                if other == word:
+                    del top[i]
+                    break
+            insort(top, entry)
+            if len(top) > self.cache_size:
+                top.pop()
+
+    def _refresh_top(self, path: list[TrieNode], word: str) -> None:
+        """Rebuild the cached lists along `word`'s path, deepest first."""
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            own = [(-node.score, word[:depth])] if node.is_end else []
+            node.top = heapq.nsmallest(self.cache_size, chain(own, *(child.top for child in node.children.values())))
 
     def _find_node(self, prefix: str) -> TrieNode | None:
         node = self.root
@@ -60,12 +99,262 @@ class Trie:
             return False
         node = self.root
         node.prefix_count -= 1
+        path = [node]
         for ch in word:
             node = node.children[ch]
             node.prefix_count -= 1
+            path.append(node)
         node.is_end = False
+        self._refresh_top(path, word)
         return True
 
+    def top_k(self, prefix: str, k: int = 10) -> list[str]:
+        """
+        The k highest-scored words starting with `prefix`, best first, ties
+        alphabetical.
+
+        Strategy:
+        - Every node caches its subtree's best `cache_size` words, kept up
+          to date by insert and delete, so k <= cache_size is a prefix walk
+          plus a slice.
+        - Larger k runs a best-first search: a heap of subtrees keyed by
+          their best word (the head of their cached list) and of single
+          words, popped until k words come out. Only subtrees that could
+          still hold one of the k best are ever opened.
+        """
+        node = self._find_node(prefix)
+        if node is None or k <= 0:
+            return []
+        if k <= self.cache_size:
+            return [word for _, word in node.top[:k]]
+        results: list[str] = []
+        tiebreak = count()
+        heap = [(node.top[0], 1, next(tiebreak), node, prefix)] if node.top else []
+        while heap and len(results) < k:
+            key, is_subtree, _, node, text = heapq.heappop(heap)
+            if not is_subtree:
+                results.append(text)
+                continue
+            if node.is_end:
+                heapq.heappush(heap, ((-node.score, text), 0, 0, None, text))
+            for ch, child in node.children.items():
+                if child.top:
+                    heapq.heappush(heap, (child.top[0], 1, next(tiebreak), child, text + ch))
+        return results
+
+
+_SAMPLE = 16  # nodes per sampled first-child id
+_ZEROS = bytes(8 - b.bit_count() for b in range(256))
+# _SELECT0[b << 3 | j]: the bit position of the (j + 1)-th 0 in byte b.
+_SELECT0 = bytes(([bit for bit in range(8) if not b >> bit & 1] + [0] * 8)[j] for b in range(256) for j in range(8))
+
+
+class FrozenTrie:
+    """
+    A read-only trie packed into flat buffers, about 1.6 bytes per node.
+
+    Words are stored as UTF-8, one node per byte, numbered in level order
+    (LOUDS). Node 0 is the root, and each node's children are consecutive.
+    - `_bits`: for each node, a 1 per child and then a 0. Just past the
+      i-th 0 are node i's 1s, so its first child is that position - i + 1.
+      `_firsts` samples first-child ids every _SAMPLE nodes; the 0s after
+      a sample are counted a byte at a time with lookup tables.
+    - `_labels[i]`: the byte on the edge into node i.
+    - `_ends`: bit i is set if a word ends at node i. `_end_ranks` counts
+      set bits before each 512-bit block, for count_prefix.
+    - `_extra_nodes` / `_extra_counts`: the rare nodes counted other than
+      once per word ending there (repeated inserts), as sorted ids and a
+      running total of the extra counts.
+
+    UTF-8 bytes sort like code points, so starts_with returns words in the
+    same order as Trie.
+    """
+
+    def __init__(self, words: Iterable[str] = ()):
+        keys = sorted(word.encode("utf-8", "surrogatepass") for word in words)
+        self._build([(key, sum(1 for _ in group), True) for key, group in groupby(keys)])
+
+    @classmethod
+    def from_trie(cls, trie: Trie) -> FrozenTrie:
+        """Freeze `trie` as it stands, deletes and repeated inserts included."""
+        entries = []
+        stack = [(trie.root, "")]
+        while stack:
+            node, word = stack.pop()
+            # Words ending here: what passes through, less what goes on.
+            count = node.prefix_count - sum(child.prefix_count for child in node.children.values())
+            if node.is_end or count > 0:
+                entries.append((word.encode("utf-8", "surrogatepass"), count, node.is_end))
+            for ch in sorted(node.children, reverse=True):
+                stack.append((node.children[ch], word + ch))
+        frozen = cls.__new__(cls)
+        frozen._build(entries)
+        return frozen
+
+    def _build(self, entries: list[tuple[bytes, int, bool]]) -> None:
+        """Lay out `entries` (sorted, distinct keys) one level at a time."""
+        labels = bytearray(1)
+        degrees = array("I", [0])
+        end_nodes = array("I")
+        extras: list[tuple[int, int]] = []
+
+        def mark(node: int, count: int, is_end: bool) -> None:
+            if is_end:
+                end_nodes.append(node)
+            if count != is_end:
+                extras.append((node, count - is_end))
+
+        keys = [key for key, _, _ in entries]
+        if keys and not keys[0]:
+            mark(0, entries[0][1], entries[0][2])
+        # Keys longer than `depth`, and the node each has reached so far.
+        # Within a level, sorted keys reach their nodes in level order.
+        active = [k for k, key in enumerate(keys) if key]
+        reached = [0] * len(active)
+        depth = 0
+        while active:
+            next_active, next_reached = [], []
+            last_parent = last_label = -1
+            for k, parent in zip(active, reached):
+                key = keys[k]
+                label = key[depth]
+                if parent != last_parent or label != last_label:
+                    last_parent, last_label = parent, label
+                    labels.append(label)
+                    degrees.append(0)
+                    degrees[parent] += 1
+                node = len(labels) - 1
+                if len(key) == depth + 1:
+                    mark(node, entries[k][1], entries[k][2])
+                else:
+                    next_active.append(k)
+                    next_reached.append(node)
+            active, reached = next_active, next_reached
+            depth += 1
+
+        n = len(labels)
+        bits = bytearray(b"\xff" * ((2 * n - 1 + 7) // 8))
+        firsts = array("I", [1])
+        position = -1
+        for i, degree in enumerate(degrees):
+            position += degree + 1
+            bits[position >> 3] &= ~(1 << (position & 7))
+            if (i + 1) % _SAMPLE == 0:
+                firsts.append(position + 1 - i)
+        ends = bytearray((n + 7) // 8)
+        for node in end_nodes:
+            ends[node >> 3] |= 1 << (node & 7)
+        end_ranks = array("I", [0])
+        for block in range(0, len(ends), 64):
+            end_ranks.append(end_ranks[-1] + int.from_bytes(ends[block:block + 64], "little").bit_count())
+
+        self._size = n
+        self._bits = bytes(bits)
+        self._firsts = firsts
+        self._labels = bytes(labels)
+        self._ends = bytes(ends)
+        self._end_ranks = end_ranks
+        self._extra_nodes = array("I", [node for node, _ in extras])
+        self._extra_counts = array("Q", [0])
+        for _, extra in extras:
+            self._extra_counts.append(self._extra_counts[-1] + extra)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the buffers holding the trie."""
+        return (len(self._bits) + len(self._labels) + len(self._ends)
+                + sum(len(a) * a.itemsize for a in (self._firsts, self._end_ranks, self._extra_nodes, self._extra_counts)))
+
+    def __len__(self) -> int:
+        """Number of nodes, root included."""
+        return self._size
+
+    def _first_child(self, i: int) -> int:
+        """Id of node i's first child, or of where it would be if i has none."""
+        k = i // _SAMPLE
+        remaining = i - k * _SAMPLE
+        position = self._firsts[k] + k * _SAMPLE - 1  # just past the (k * _SAMPLE)-th 0
+        if remaining:
+            # Count from the start of the byte, then a byte at a time.
+            bits = self._bits
+            index, shift = position >> 3, position & 7
+            byte = bits[index]
+            remaining += shift - (byte & ((1 << shift) - 1)).bit_count()
+            while remaining > _ZEROS[byte]:
+                remaining -= _ZEROS[byte]
+                index += 1
+                byte = bits[index]
+            position = index * 8 + _SELECT0[byte << 3 | remaining - 1] + 1
+        return position - i + 1
+
+    def _children(self, i: int) -> tuple[int, int]:
+        """Node i's children, as the id range [first, stop)."""
+        first = self._first_child(i)
+        position = first + i - 1
+        start = position >> 3
+        run = int.from_bytes(self._bits[start:start + 33], "little") >> (position & 7)
+        return first, first + (run ^ (run + 1)).bit_length() - 1
+
+    def _find_node(self, prefix: str) -> int:
+        node = 0
+        labels = self._labels
+        for byte in prefix.encode("utf-8", "surrogatepass"):
+            first, stop = self._children(node)
+            node = labels.find(byte, first, stop)
+            if node < 0:
+                return -1
+        return node
+
+    def _is_end(self, node: int) -> bool:
+        return bool(self._ends[node >> 3] >> (node & 7) & 1)
+
+    def _rank_end(self, i: int) -> int:
+        """Number of word ends among nodes [0, i)."""
+        ends = self._ends
+        stop = i >> 3
+        count = self._end_ranks[i >> 9] + int.from_bytes(ends[(i >> 9) << 6:stop], "little").bit_count()
+        if i & 7:
+            count += (ends[stop] & ((1 << (i & 7)) - 1)).bit_count()
+        return count
+
+    def search(self, word: str) -> bool:
+        node = self._find_node(word)
+        return node >= 0 and self._is_end(node)
+
+    def starts_with(self, prefix: str) -> list[str]:
+        node = self._find_node(prefix)
+        if node < 0:
+            return []
+        results = [prefix] if self._is_end(node) else []
+        path = bytearray(prefix.encode("utf-8", "surrogatepass"))
+        first, stop = self._children(node)
+        # Preorder over (node, length of its key); children pushed in reverse.
+        stack = [(child, len(path) + 1) for child in range(stop - 1, first - 1, -1)]
+        labels = self._labels
+        while stack:
+            node, depth = stack.pop()
+            del path[depth - 1:]
+            path.append(labels[node])
+            if self._is_end(node):
+                results.append(path.decode("utf-8", "surrogatepass"))
+            first, stop = self._children(node)
+            stack.extend((child, depth + 1) for child in range(stop - 1, first - 1, -1))
+        return results
+
+    def count_prefix(self, prefix: str) -> int:
+        node = self._find_node(prefix)
+        if node < 0:
+            return 0
+        # The subtree's nodes on each level below form one id range.
+        start, stop, total = node, node + 1, 0
+        extra_nodes, extra_counts = self._extra_nodes, self._extra_counts
+        while start < stop:
+            total += self._rank_end(stop) - self._rank_end(start)
+            if extra_nodes:
+                total += extra_counts[bisect_left(extra_nodes, stop)] - extra_counts[bisect_left(extra_nodes, start)]
+            start, stop = self._first_child(start), self._first_child(stop)
+        return total
+
 
 def run_tests():
     t = Trie()
@@ -95,6 +384,63 @@ def run_tests():
     assert t.count_prefix("app") == 2  # apple, application
     assert t.delete("nonexistent") is False
 
+    # Frozen trie: same answers, from the Trie or straight from words
+    frozen = FrozenTrie.from_trie(t)
+    for prefix in ["", "a", "ap", "app", "appl", "apple", "application", "apt", "b", "band", "bandanas", "z"]:
+        assert frozen.search(prefix) == t.search(prefix), prefix
+        assert frozen.starts_with(prefix) == t.starts_with(prefix), prefix
+        assert frozen.count_prefix(prefix) == t.count_prefix(prefix), prefix
+    assert FrozenTrie(words).starts_with("") == sorted(words)
+    assert FrozenTrie().starts_with("") == [] and FrozenTrie().count_prefix("") == 0
+    many = FrozenTrie(f"word{i}" for i in range(5000))
+    assert many.count_prefix("word1") == 1111 and many.nbytes < 2 * len(many)
+
+    rng = random.Random(4)
+    pool = ["", "a", "ab", "é", "éa", "日本", "日本語", "\x00", "\U0001f600"] + [
+        "".join(rng.choice("abcé日") for _ in range(rng.randrange(1, 7))) for _ in range(400)]
+    inserted = [rng.choice(pool) for _ in range(1000)]  # with repeats
+    edited, plain = Trie(), Trie()
+    for w in inserted:
+        edited.insert(w)
+        plain.insert(w)
+    for w in pool[::7]:
+        edited.delete(w)  # a repeated word stays counted but unfound, as in Trie
+    for trie, frozen in ((edited, FrozenTrie.from_trie(edited)), (plain, FrozenTrie(inserted))):
+        for w in pool + ["x", "abz", "日本語!"]:
+            for prefix in (w, w[:1], w[:2], w[:-1]):
+                assert frozen.search(prefix) == trie.search(prefix), prefix
+                assert frozen.starts_with(prefix) == trie.starts_with(prefix), prefix
+                assert frozen.count_prefix(prefix) == trie.count_prefix(prefix), prefix
+
+    # Weighted top-k: cached lists, and best-first search past them
+    t = Trie(cache_size=3)
+    scores = {"apple": 5, "app": 9, "application": 7, "apt": 1, "apex": 7, "banana": 3}
+    for w, score in scores.items():
+        t.insert(w, score)
+    assert t.top_k("ap", 3) == ["app", "apex", "application"]
+    assert t.top_k("ap", 10) == ["app", "apex", "application", "apple", "apt"]
+    assert t.top_k("b") == ["banana"] and t.top_k("z") == [] and t.top_k("a", 0) == []
+    t.insert("app", 2)  # lowered: apple moves up into the cached lists
+    assert t.top_k("ap", 3) == ["apex", "application", "apple"]
+    t.delete("apex")
+    assert t.top_k("a", 2) == ["application", "apple"]
+
+    rng = random.Random(50)
+    t, weights = Trie(cache_size=4), {}
+    for step in range(3000):
+        w = "".join(rng.choice("abc") for _ in range(rng.randrange(0, 6)))
+        if step % 5 == 4 and weights:
+            w = rng.choice(sorted(weights))
+            assert t.delete(w)
+            del weights[w]
+        else:
+            weights[w] = rng.randrange(20)
+            t.insert(w, weights[w])
+        prefix = w[:rng.randrange(len(w) + 1)]
+        k = rng.choice([1, 4, 9])
+        best = sorted((-score, word) for word, score in weights.items() if word.startswith(prefix))
+        assert t.top_k(prefix, k) == [word for _, word in best[:k]], (prefix, k)
+
     print("✅ All tests passed!")
 
 
@@ -0,0 +1,3245 @@
+"""
+Reference Solution: 2026-03-07 — Concurrent Web Crawler
+Language: Python | Difficulty: Advanced
+
+## Approach
+
+1. **A fixed pool of workers is the concurrency limit.**
+   `crawl` starts `max_concurrency` worker tasks that pull URLs from the
+   frontier. There are never more fetches in flight than workers, so no
+   semaphore is needed. A URL is marked seen *before* it is queued.
+   Check-and-add has no `await` in between, so it is atomic on the event
+   loop and no URL is queued twice. Workers exit when the frontier reports
+   that nothing is queued or in flight.
+
+2. **Fetching is pluggable.**
+   `crawl` talks to a `Fetcher`: `fetch(url)` returns the page's outgoing
+   links, and `close()` releases its resources. `GraphFetcher` is the
+   challenge's simulation (a dict and a sleep). `HttpFetcher` fetches real
+   pages. A fetch that fails at the transport level raises `FetchError`;
+   the crawl records it in `CrawlResult.failed` and carries on.
+
+3. **HTTP/1.1 with a keep-alive pool per host.**
+   Opening a TCP connection per page costs a round trip, plus a TLS
+   handshake for https, before the first request byte. `HttpFetcher`
+   keeps up to `connections_per_host` persistent connections to each
+   (scheme, host, port) and reuses them. Once a connection's first
+   response shows the server speaks persistent HTTP/1.1, up to
+   `pipeline_depth` requests are written back to back on it. Responses
+   are read in request order: each request takes a turn on the connection.
+   If a response is lost because the server closed the connection, or a
+   read fails mid-pipeline, the connection is dropped and the affected
+   requests are retried once on a fresh one. This is safe because GET is
+   idempotent.
+
+4. **Bodies are decoded, then scanned for links.**
+   The fetcher reads `Content-Length` and chunked bodies, or reads to EOF.
+   It inflates `gzip`/`deflate` with zlib, capped at `max_body`, and
+   decodes HTML using the declared charset. `html.parser` then collects
+   `<a>`/`<area>` hrefs, which are resolved against the page (or its
+   `<base>`) and stripped of fragments. A redirect's only link is its
+   `Location`.
+
+5. **The frontier is polite per host.**
+   One global queue lets a single host take every worker while the other
+   hosts sit idle. `HostFrontier` keeps a queue per host and hands out a
+   URL only from an *eligible* host: one with fewer than `max_per_host`
+   fetches in flight whose last fetch started at least `host_delay` ago.
+   Eligible hosts take turns from a FIFO. Hosts still inside their delay
+   wait in a heap ordered by the time they become eligible, with one timer
+   for the earliest of them. Workers therefore always pick up work from
+   another host instead of queueing behind a slow one.
+
+6. **Seen URLs cost tens of bytes, not hundreds.**
+   A `set[str]` of URLs plus string edge tuples costs roughly 150 bytes
+   per URL and about 130 per edge. `UrlIndex` stores:
+   - every URL exactly once, UTF-8 packed into one `bytearray` behind an
+     offsets array (`UrlTable`), so a URL's id is its position;
+   - dedup as a 64-bit BLAKE2b fingerprint of the *canonical* URL
+     (`canonicalize`: case, default ports, dot segments, escapes,
+     fragments). These live in an open-addressing table of two arrays,
+     fingerprint -> id, kept at most 2/3 full.
+   Edges and the visit order are `array('I')` columns of ids, 4 bytes
+   each. With 64-bit fingerprints, the chance of any collision among 100M
+   URLs is about 3e-4. An optional Bloom filter in front of the table
+   answers "never seen" for new URLs without probing the table. It pays
+   off once the table is too large to be cheap to probe.
+
+7. **Bounded memory and exact resume with `state_dir`.**
+   The URL text goes to a file, and only the offsets stay in memory. When
+   the in-memory fingerprint table reaches `memory_urls`, it is written
+   out as a sorted segment. The segment is binary-searched through mmap
+   behind its own Bloom filter. Past the same budget, new frontier URLs
+   are appended to spill files and read back in FIFO order. Every
+   `checkpoint_interval` seconds `CrawlState.checkpoint()` runs between
+   two awaits, so it sees a consistent crawl. It syncs the append-only
+   files, writes the in-memory fingerprints and frontier (including pages
+   in flight) under new names, and then atomically replaces
+   `checkpoint.json`. On restart, anything newer than the manifest is
+   truncated or deleted. The crawl carries on with exactly the pages that
+   were not finished at the checkpoint.
+
+8. **Sharding by host across processes.**
+   One event loop tops out at one core of parsing and bookkeeping.
+   `crawl_sharded` runs N processes. Each owns the hosts whose stable
+   hash (`shard_of`) lands on it, so per-host politeness stays local. Each
+   has its own frontier, index and fetcher. A link to a host owned
+   elsewhere is interned locally, so each one is sent only once, then
+   batched into the owner's inbox. Batches go out when full, every
+   `flush_interval`, and whenever the shard goes idle. Termination is
+   message counting: every idle shard reports (batches sent, batches
+   received), and the crawl is over when all latest reports are idle and
+   the totals match. The parent then stops the shards and re-interns each
+   shard's URL table into one index, remapping the id columns.
+
+9. **Streaming with backpressure.**
+   `crawl_stream` is an async generator of `PageRecord`s. Workers hand
+   each processed page to a bounded queue of `buffer` records and wait
+   while it is full. A waiting worker keeps its page in flight and takes
+   no new URL, so a slow consumer throttles fetching through the frontier
+   itself. Memory is the seen-URL index plus the buffer. Records can also
+   go to NDJSON, or to a columnar directory: the URL table on disk plus
+   id columns for pages and edges, which `read_columnar` loads back.
+
+10. **Benchmarking on synthetic web graphs.**
+   `generate_web_graph` builds seeded graphs with Zipf host sizes,
+   Pareto out-degree, host-local and popularity-biased links (hence
+   cycles), dangling links to missing hosts, and a few orphans.
+   `--bench` crawls them across `max_concurrency` × `fetch_delay`. It
+   reports pages/s, CPU per page (the scheduler's own cost), peak
+   tracemalloc memory, and utilisation (mean fetches in flight over the
+   limit). It then compares the seen-set designs per URL.
+
+11. **Adaptive concurrency (AIMD).**
+   With `crawl(adaptive=AdaptiveConcurrency(...))`, the global and
+   per-host limits move at run time within configured bounds. A limit that
+   is fully used grows by one per round trip of successful fetches. On
+   congestion it halves, at most once per round trip. A host is congested
+   when it times out or answers 429/503 (`OverloadError`), or is more than
+   `latency_tolerance` times slower than its baseline. The crawl is
+   congested when the recent error rate or the latency ratio across all
+   hosts passes its threshold. The frontier enforces both limits, and
+   overloaded fetches are queued again a few times before they count as
+   failed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import mmap
+import multiprocessing
+import os
+import queue
+import random
+import re
+import ssl
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from functools import partial
+from html.parser import HTMLParser
+from typing import AsyncIterator, Awaitable, Callable, Iterator
+from urllib.parse import quote, urldefrag, urljoin, urlsplit, urlunsplit
+
+_ID = "I"  # URL ids: 4 bytes, up to 4.29 billion URLs.
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+# ──────────────────────────────────────────────
+# Compact URL storage and dedup
+# ──────────────────────────────────────────────
+
+_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+_UNRESERVED = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+
+def _normalize_escape(match: re.Match) -> str:
+    byte = int(match.group(1), 16)
+    return chr(byte) if byte in _UNRESERVED else f"%{byte:02X}"
+
+
+def _remove_dot_segments(path: str) -> str:
+    out: list[str] = []
+    segments = path.split("/")
+    for segment in segments:
+        if segment == "..":
+            if len(out) > 1:
+                out.pop()
+        elif segment != ".":
+            out.append(segment)
+    if segments[-1] in (".", ".."):
+        out.append("")  # "/a/b/.." names the directory "/a/".
+    return "/".join(out)
+
+
+def canonicalize(url: str) -> str:
+    """
+    The form of a URL used for dedup: lower-case scheme and host, IDNA host,
+    no default port or fragment, dot segments resolved, percent-escapes
+    upper-cased (and decoded where they encode unreserved characters),
+    and an empty path written as "/".
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    host = parts.hostname
+    if host:
+        try:
+            host = host.encode("idna").decode("ascii")
+        except UnicodeError:
+            pass
+        if ":" in host:
+            host = f"[{host}]"  # IPv6 literal
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        userinfo = netloc.rpartition("@")[0]
+        netloc = (f"{userinfo}@" if userinfo else "") + host
+        if port is not None and port != _DEFAULT_PORTS.get(scheme):
+            netloc += f":{port}"
+    path = _ESCAPE.sub(_normalize_escape, _remove_dot_segments(parts.path))
+    if not path and netloc:
+        path = "/"
+    query = _ESCAPE.sub(_normalize_escape, parts.query)
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def url_fingerprint(url: str) -> int:
+    """Non-zero 64-bit fingerprint of a URL's canonical form."""
+    digest = hashlib.blake2b(canonicalize(url).encode("utf-8", "surrogatepass"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1  # 0 marks an empty table slot.
+
+
+def _open_rw(path: str):
+    """Open a binary file for reading and writing, creating it if needed."""
+    return open(path, "r+b" if os.path.exists(path) else "w+b")
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class UrlTable:
+    """
+    Append-only URL strings packed into one buffer; a URL's id is its index.
+
+    `UrlTable.on_disk(path)` keeps the text in a file instead, with only the
+    offsets (8 bytes per URL) and a small write buffer in memory.
+    """
+
+    __slots__ = ("_blob", "_offsets", "_base", "_data", "_index", "_synced")
+
+    FLUSH_BYTES = 1 << 20
+
+    def __init__(self):
+        self._blob = bytearray()  # text from byte offset _base on
+        self._offsets = array("Q", [0])
+        self._base = 0
+        self._data = None  # files, when on disk
+        self._index = None
+        self._synced = 0  # offsets already written to the index file
+
+    @classmethod
+    def on_disk(cls, path: str, count: int = 0) -> UrlTable:
+        """Open the table at `path` (+ ".idx"), keeping its first `count` URLs."""
+        table = cls()
+        table._data = _open_rw(path)
+        table._index = _open_rw(path + ".idx")
+        if count:
+            table._offsets = array("Q")
+            table._offsets.fromfile(table._index, count + 1)
+            table._synced = count + 1
+        table._base = table._offsets[-1]
+        # Drop whatever was appended after the checkpoint that said `count`.
+        table._index.truncate(8 * table._synced)
+        table._data.truncate(table._base)
+        return table
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = self._offsets[i], self._offsets[i + 1]
+        if start >= self._base:
+            data = self._blob[start - self._base:end - self._base]
+        else:
+            data = os.pread(self._data.fileno(), end - start, start)
+        return data.decode("utf-8", "surrogatepass")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+    def append(self, url: str) -> int:
+        self._blob += url.encode("utf-8", "surrogatepass")
+        self._offsets.append(self._base + len(self._blob))
+        if self._data is not None and len(self._blob) >= self.FLUSH_BYTES:
+            self._flush_blob()
+        return len(self._offsets) - 2
+
+    def _flush_blob(self) -> None:
+        self._data.seek(0, os.SEEK_END)
+        self._data.write(self._blob)
+        self._data.flush()
+        self._base += len(self._blob)
+        self._blob.clear()
+
+    def sync(self) -> None:
+        """Make everything appended so far durable (on-disk tables only)."""
+        self._flush_blob()
+        self._index.seek(0, os.SEEK_END)
+        self._offsets[self._synced:].tofile(self._index)
+        self._synced = len(self._offsets)
+        self._index.flush()
+        os.fsync(self._data.fileno())
+        os.fsync(self._index.fileno())
+
+    def close(self) -> None:
+        if self._data is not None:
+            self._data.close()
+            self._index.close()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in memory."""
+        return len(self._blob) + self._offsets.itemsize * len(self._offsets)
+
+
+class FingerprintTable:
+    """Open-addressing (linear probing) map from non-zero 64-bit keys to ids."""
+
+    __slots__ = ("_keys", "_values", "_mask", "_count")
+
+    def __init__(self, expected: int = 0):
+        size = 16
+        while size * 2 < expected * 3:
+            size *= 2
+        self._allocate(size)
+        self._count = 0
+
+    def _allocate(self, size: int) -> None:
+        self._keys = array("Q", bytes(8 * size))
+        self._values = array(_ID, bytes(array(_ID).itemsize * size))
+        self._mask = size - 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def get(self, key: int) -> int:
+        """The id stored for `key`, or -1."""
+        keys, mask = self._keys, self._mask
+        i = key & mask  # Fingerprints are uniformly mixed already.
+        while True:
+            found = keys[i]
+            if found == key:
+                return self._values[i]
+            if not found:
+                return -1
+            i = (i + 1) & mask
+
+    def put(self, key: int, value: int) -> None:
+        """Insert a key known to be absent."""
+        if (self._count + 1) * 3 > len(self._keys) * 2:
+            self._grow()
+        keys, mask = self._keys, self._mask
+        i = key & mask
+        while keys[i]:
+            i = (i + 1) & mask
+        keys[i] = key
+        self._values[i] = value
+        self._count += 1
+
+    def _grow(self) -> None:
+        old_keys, old_values = self._keys, self._values
+        self._allocate(2 * len(old_keys))
+        keys, values, mask = self._keys, self._values, self._mask
+        for key, value in zip(old_keys, old_values):
+            if key:
+                i = key & mask
+                while keys[i]:
+                    i = (i + 1) & mask
+                keys[i] = key
+                values[i] = value
+
+    def items(self) -> Iterator[tuple[int, int]]:
+        return ((key, value) for key, value in zip(self._keys, self._values) if key)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._keys) * (self._keys.itemsize + self._values.itemsize)
+
+
+class BloomFilter:
+    """Bloom filter over 64-bit fingerprints, sized for `capacity` keys."""
+
+    __slots__ = ("_bits", "_m", "_k")
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        if capacity < 1 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be >= 1 and error_rate in (0, 1)")
+        self._m = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._k = max(1, round(self._m / capacity * math.log(2)))
+        self._bits = bytearray((self._m + 7) // 8)
+
+    def _positions(self, key: int) -> Iterator[int]:
+        # Double hashing: the two halves of the fingerprint give k probes.
+        h1, h2 = key & 0xFFFFFFFF, (key >> 32) | 1
+        m = self._m
+        return ((h1 + i * h2) % m for i in range(self._k))
+
+    def add(self, key: int) -> None:
+        bits = self._bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: int) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class _Segment:
+    """
+    A sorted run of (fingerprint, id) pairs spilled from memory. The file
+    holds a count, the keys, the ids and a Bloom filter. The keys and ids
+    are searched in place through a memory map. Only the Bloom filter is
+    copied into memory, so a miss almost never touches the file.
+    """
+
+    __slots__ = ("name", "bloom", "_mmap", "_keys", "_ids")
+
+    def __init__(self, path: str):
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        n = view[:8].cast("Q")[0]
+        ids_at = 8 + 8 * n
+        bloom_at = ids_at + array(_ID).itemsize * n
+        self._keys = view[8:ids_at].cast("Q")
+        self._ids = view[ids_at:bloom_at].cast(_ID)
+        self.bloom = BloomFilter(max(n, 1))
+        self.bloom._bits[:] = view[bloom_at:]
+
+    @classmethod
+    def write(cls, path: str, table: FingerprintTable) -> _Segment:
+        pairs = sorted(table.items())
+        keys = array("Q", [key for key, _ in pairs])
+        ids = array(_ID, [value for _, value in pairs])
+        bloom = BloomFilter(max(len(keys), 1))
+        for key in keys:
+            bloom.add(key)
+        _write_atomic(path, array("Q", [len(keys)]).tobytes() + keys.tobytes() + ids.tobytes() + bytes(bloom._bits))
+        return cls(path)
+
+    def get(self, key: int) -> int:
+        keys = self._keys
+        i = bisect.bisect_left(keys, key)
+        return self._ids[i] if i < len(keys) and keys[i] == key else -1
+
+    def close(self) -> None:
+        self._keys.release()
+        self._ids.release()
+        self._mmap.close()
+
+
+class UrlIndex:
+    """
+    Canonical URL -> dense id. Each URL is stored once (as first spelled)
+    in `urls`; lookups go through its fingerprint.
+
+    `UrlIndex.on_disk(directory, memory_keys)` bounds memory: the URL text
+    lives in a file, and once `memory_keys` fingerprints are held in
+    memory they are written out as a sorted `_Segment` and the table starts
+    empty again. Each segment carries its own Bloom filter, so the optional
+    global one is only for the all-in-memory index.
+    """
+
+    __slots__ = ("urls", "_table", "_bloom", "_directory", "_memory_keys", "_segments", "_next_segment")
+
+    def __init__(self, expected: int = 0, bloom: bool = False, urls: UrlTable | None = None):
+        self.urls = urls if urls is not None else UrlTable()
+        self._table = FingerprintTable(expected)
+        self._bloom = BloomFilter(max(expected, 1024)) if bloom else None
+        self._directory: str | None = None
+        self._memory_keys = 0
+        self._segments: list[_Segment] = []
+        self._next_segment = 0
+
+    @classmethod
+    def on_disk(cls, directory: str, memory_keys: int, saved: dict | None = None) -> UrlIndex:
+        """Open the index under `directory` as of the checkpoint `saved`."""
+        saved = saved or {}
+        index = cls(memory_keys)
+        index._directory = directory
+        index._memory_keys = memory_keys
+        index.urls = UrlTable.on_disk(os.path.join(directory, "urls"), saved.get("urls", 0))
+        index._segments = [_Segment(os.path.join(directory, name)) for name in saved.get("segments", ())]
+        index._next_segment = saved.get("next_segment", 0)
+        if saved.get("memtable"):
+            with open(os.path.join(directory, saved["memtable"]), "rb") as f:
+                data = f.read()
+            n = len(data) // (8 + array(_ID).itemsize)
+            keys = array("Q", data[:8 * n])
+            values = array(_ID, data[8 * n:])
+            for key, value in zip(keys, values):
+                index._table.put(key, value)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def __contains__(self, url: str) -> bool:
+        return self.get(url) >= 0
+
+    def get(self, url: str) -> int:
+        """The id of `url` (or of an equivalent spelling), or -1."""
+        return self._find(url_fingerprint(url))
+
+    def _find(self, key: int) -> int:
+        if self._bloom is not None and key not in self._bloom:
+            return -1
+        found = self._table.get(key)
+        if found < 0:
+            for segment in reversed(self._segments):
+                if key in segment.bloom:
+                    found = segment.get(key)
+                    if found >= 0:
+                        break
+        return found
+
+    def intern(self, url: str) -> tuple[int, bool]:
+        """The id of `url`, adding it if new. Returns (id, is_new)."""
+        key = url_fingerprint(url)
+        found = self._find(key)
+        if found >= 0:
+            return found, False
+        if self._bloom is not None:
+            self._bloom.add(key)
+        url_id = self.urls.append(url)
+        self._table.put(key, url_id)
+        if self._directory is not None and len(self._table) >= self._memory_keys:
+            self._spill()
+        return url_id, True
+
+    def _spill(self) -> None:
+        name = f"seen-{self._next_segment:06d}.seg"
+        self._next_segment += 1
+        self._segments.append(_Segment.write(os.path.join(self._directory, name), self._table))
+        self._table = FingerprintTable(self._memory_keys)
+
+    def checkpoint(self, generation: int) -> dict:
+        """Make the index durable; returns what `on_disk` needs to reopen it."""
+        self.urls.sync()
+        memtable = f"seen-mem-{generation:06d}.bin"
+        keys = array("Q")
+        values = array(_ID)
+        for key, value in self._table.items():
+            keys.append(key)
+            values.append(value)
+        _write_atomic(os.path.join(self._directory, memtable), keys.tobytes() + values.tobytes())
+        return {
+            "urls": len(self.urls),
+            "segments": [segment.name for segment in self._segments],
+            "next_segment": self._next_segment,
+            "memtable": memtable,
+        }
+
+    def close(self) -> None:
+        """Close the segments. `urls` stays open: a CrawlResult may still read it."""
+        for segment in self._segments:
+            segment.close()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in memory."""
+        total = self.urls.nbytes + self._table.nbytes
+        total += sum(segment.bloom.nbytes for segment in self._segments)
+        return total + (self._bloom.nbytes if self._bloom is not None else 0)
+
+
+@dataclass
+class CrawlResult:
+    """
+    What a crawl found, stored compactly: each URL once in `urls`, and the
+    visit order and edges as arrays of ids into it. `visited` and `edges`
+    build plain lists of strings on every access; at scale, read the id
+    arrays or `iter_edges()` instead.
+    """
+
+    urls: UrlTable = field(default_factory=UrlTable)
+    visited_ids: array = field(default_factory=lambda: array(_ID))
+    edge_src: array = field(default_factory=lambda: array(_ID))
+    edge_dst: array = field(default_factory=lambda: array(_ID))
+    unreachable: set[str] = field(default_factory=set)
+    failed: dict[str, str] = field(default_factory=dict)  # url -> error
+
+    @property
+    def visited(self) -> list[str]:
+        urls = self.urls
+        return [urls[i] for i in self.visited_ids]
+
+    @property
+    def edges(self) -> list[tuple[str, str]]:
+        return list(self.iter_edges())
+
+    def iter_edges(self) -> Iterator[tuple[str, str]]:
+        urls = self.urls
+        for src, dst in zip(self.edge_src, self.edge_dst):
+            yield urls[src], urls[dst]
+
+
+class FetchError(Exception):
+    """A page could not be fetched (network, timeout or protocol failure)."""
+
+
+class OverloadError(FetchError):
+    """The fetch timed out or the server said it is busy (429, 503)."""
+
+
+# ──────────────────────────────────────────────
+# Fetchers
+# ──────────────────────────────────────────────
+
+class Fetcher:
+    """
+    Where pages come from. `fetch(url)` returns the page's outgoing links as
+    absolute URLs; `close()` releases whatever the fetcher holds open.
+    """
+
+    async def fetch(self, url: str) -> list[str]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+async def fetch_page(url: str, graph: dict[str, list[str]], delay: float) -> list[str]:
+    """Simulate fetching a page. Returns list of linked URLs."""
+    await asyncio.sleep(delay)
+    return graph.get(url, [])
+
+
+class GraphFetcher(Fetcher):
+    """The simulated web: links come from a dict, latency from a sleep."""
+
+    def __init__(self, graph: dict[str, list[str]], delay: float = 0.05):
+        self.graph = graph
+        self.delay = delay
+
+    async def fetch(self, url: str) -> list[str]:
+        return await fetch_page(url, self.graph, self.delay)
+
+
+# Characters left as they are in a request target: RFC 3986 reserved and
+# unreserved ones, plus "%" so existing escapes aren't escaped again.
+_TARGET_SAFE = "/?#[]@!$&'()*+,;=:%~"
+_CHARSET = re.compile(r"charset\s*=\s*[\"']?([\w.:-]+)", re.IGNORECASE)
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.base: str | None = None
+        self.hrefs: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in ("a", "area"):
+            for name, value in attrs:
+                if name == "href" and value:
+                    self.hrefs.append(value)
+        elif tag == "base" and self.base is None:
+            self.base = dict(attrs).get("href")
+
+
+def extract_links(page_url: str, html: str) -> list[str]:
+    """
+    Absolute http(s) links of an HTML page, fragment-free, first occurrence
+    order. Hrefs that aren't valid URLs are skipped; markup HTMLParser
+    gives up on raises ValueError.
+    """
+    parser = _LinkParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except AssertionError as exc:  # e.g. "<![foo[": an unknown marked section
+        raise ValueError(f"unparseable HTML: {exc}") from exc
+    try:
+        base = urljoin(page_url, parser.base) if parser.base else page_url
+    except ValueError:
+        base = page_url
+    links: list[str] = []
+    seen: set[str] = set()
+    for href in parser.hrefs:
+        try:
+            url = urldefrag(urljoin(base, href.strip()))[0]
+            scheme = urlsplit(url).scheme
+        except ValueError:  # e.g. "http://[oops/"
+            continue
+        if scheme in _DEFAULT_PORTS and url not in seen:
+            seen.add(url)
+            links.append(url)
+    return links
+
+
+class _Connection:
+    """One persistent connection and the queue of requests waiting to read from it."""
+
+    __slots__ = ("reader", "writer", "inflight", "pipelining", "closed", "turns")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.inflight = 0  # requests checked out on this connection
+        self.pipelining = False  # set once the server proved persistent HTTP/1.1
+        self.closed = False
+        self.turns: deque[asyncio.Future] = deque()  # response order
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.writer.close()
+
+
+class _HostPool:
+    __slots__ = ("connections", "opening", "waiters")
+
+    def __init__(self):
+        self.connections: list[_Connection] = []
+        self.opening = 0
+        self.waiters: deque[asyncio.Future] = deque()
+
+
+class HttpFetcher(Fetcher):
+    """asyncio HTTP/1.1 client with per-host keep-alive pools and pipelining.
+
+    Args:
+        connections_per_host: Most connections open to one host at a time.
+        pipeline_depth: Most requests outstanding on one connection (1 = off).
+        timeout: Seconds allowed for connecting plus one request/response.
+        max_body: Largest body, after decompression, that is read or inflated.
+    """
+
+    USER_AGENT = "daily-challenge-crawler/1.0"
+
+    def __init__(
+        self,
+        connections_per_host: int = 2,
+        pipeline_depth: int = 4,
+        timeout: float = 10.0,
+        max_body: int = 8 << 20,
+    ):
+        if connections_per_host < 1 or pipeline_depth < 1:
+            raise ValueError("connections_per_host and pipeline_depth must be >= 1")
+        self.connections_per_host = connections_per_host
+        self.pipeline_depth = pipeline_depth
+        self.timeout = timeout
+        self.max_body = max_body
+        self._pools: dict[tuple[str, str, int], _HostPool] = {}
+        self._ssl: ssl.SSLContext | None = None
+        self.connections_opened = 0
+        self.max_pipelined = 0  # deepest pipeline actually used
+
+    async def fetch(self, url: str) -> list[str]:
+        try:
+            parts = urlsplit(url)
+            if parts.scheme not in _DEFAULT_PORTS or not parts.hostname:
+                raise ValueError("not an http(s) URL with a host")
+            port = parts.port or _DEFAULT_PORTS[parts.scheme]
+            # The request line and Host header must be ASCII: IDNA-encode the
+            # host and percent-encode the rest, keeping existing escapes.
+            hostname = parts.hostname.encode("idna").decode("ascii")
+            host = parts.netloc.rpartition("@")[2]
+            if not host.isascii():
+                host = hostname + (f":{parts.port}" if parts.port else "")
+            target = quote((parts.path or "/") + (f"?{parts.query}" if parts.query else ""), safe=_TARGET_SAFE)
+        except (UnicodeError, ValueError) as exc:
+            raise FetchError(f"Unsupported URL: {url} ({exc})") from exc
+        key = (parts.scheme, hostname, port)
+        request = (
+            f"GET {target} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            f"User-Agent: {self.USER_AGENT}\r\n"
+            "Accept: text/html,*/*;q=0.1\r\n"
+            "Accept-Encoding: gzip, deflate\r\n"
+            "\r\n"
+        ).encode("latin-1")
+
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _HostPool()
+        for attempt in range(2):
+            # A retry goes on a new connection: the old ones may all be stale.
+            conn = await self._checkout(key, pool, fresh=attempt > 0)
+            try:
+                async with asyncio.timeout(self.timeout):
+                    status, headers, body = await self._exchange(conn, request)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError) as exc:
+                # Typically a kept-alive connection the server had closed.
+                if attempt:
+                    raise FetchError(f"{url}: {exc!r}") from exc
+            except TimeoutError as exc:
+                raise OverloadError(f"{url}: timed out after {self.timeout}s") from exc
+            except (OSError, ValueError, zlib.error, asyncio.LimitOverrunError) as exc:
+                # Malformed framing, an oversized header line or a corrupt body.
+                raise FetchError(f"{url}: {exc!r}") from exc
+            finally:
+                self._release(pool, conn)
+        if status in (429, 503):
+            raise OverloadError(f"{url}: HTTP {status}")
+        try:
+            return self._links(url, status, headers, body)
+        except ValueError as exc:
+            raise FetchError(f"{url}: {exc}") from exc
+
+    async def close(self) -> None:
+        writers = []
+        for pool in self._pools.values():
+            for conn in pool.connections:
+                conn.close()
+                writers.append(conn.writer)
+        self._pools.clear()
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    # ── connection pool ───────────────────────────────────────────────
+
+    async def _checkout(self, key: tuple[str, str, int], pool: _HostPool, fresh: bool = False) -> _Connection:
+        """A connection with room for one more request: idle, pipelined, or new."""
+        while True:
+            best = None
+            for conn in pool.connections:
+                if not conn.closed and (best is None or conn.inflight < best.inflight):
+                    best = conn
+            if fresh:
+                if best is not None and not best.inflight and (
+                    len(pool.connections) + pool.opening >= self.connections_per_host
+                ):
+                    best.close()  # Make room by dropping an idle connection.
+                    pool.connections.remove(best)
+            elif best is not None and (
+                best.inflight == 0 or (best.pipelining and best.inflight < self.pipeline_depth)
+            ):
+                best.inflight += 1
+                self.max_pipelined = max(self.max_pipelined, best.inflight)
+                return best
+            if len(pool.connections) + pool.opening < self.connections_per_host:
+                return await self._open(key, pool)
+
+            waiter = asyncio.get_running_loop().create_future()
+            pool.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake(pool)  # Pass on the wake-up we were given.
+                raise
+
+    async def _open(self, key: tuple[str, str, int], pool: _HostPool) -> _Connection:
+        scheme, hostname, port = key
+        if scheme == "https" and self._ssl is None:
+            self._ssl = ssl.create_default_context()
+        pool.opening += 1
+        try:
+            async with asyncio.timeout(self.timeout):
+                reader, writer = await asyncio.open_connection(
+                    hostname, port, ssl=self._ssl if scheme == "https" else None
+                )
+        except TimeoutError as exc:
+            raise OverloadError(f"Cannot connect to {hostname}:{port}: timed out") from exc
+        except OSError as exc:
+            raise FetchError(f"Cannot connect to {hostname}:{port}: {exc!r}") from exc
+        finally:
+            pool.opening -= 1
+            self._wake(pool)
+        self.connections_opened += 1
+        self.max_pipelined = max(self.max_pipelined, 1)
+        conn = _Connection(reader, writer)
+        conn.inflight = 1
+        pool.connections.append(conn)
+        return conn
+
+    def _release(self, pool: _HostPool, conn: _Connection) -> None:
+        conn.inflight -= 1
+        if conn.closed and not conn.inflight and conn in pool.connections:
+            pool.connections.remove(conn)
+        self._wake(pool)
+
+    @staticmethod
+    def _wake(pool: _HostPool) -> None:
+        while pool.waiters:
+            waiter = pool.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    # ── protocol ──────────────────────────────────────────────────────
+
+    async def _exchange(self, conn: _Connection, request: bytes) -> tuple[int, dict[str, str], bytes]:
+        """Write a request, then wait for its turn to read the response."""
+        if conn.closed:
+            raise ConnectionResetError("connection already closed")
+        turn = asyncio.get_running_loop().create_future()
+        if not conn.turns:
+            turn.set_result(None)
+        conn.turns.append(turn)
+        conn.writer.write(request)
+        ok = False
+        try:
+            await conn.writer.drain()
+            await turn
+            if conn.closed:
+                raise ConnectionResetError("connection closed before the response")
+            response = await self._read_response(conn)
+            ok = True
+            return response
+        finally:
+            if not ok:
+                conn.close()  # Position in the response stream is unknown now.
+            conn.turns.remove(turn)
+            if conn.turns and not conn.turns[0].done():
+                conn.turns[0].set_result(None)
+
+    async def _read_response(self, conn: _Connection) -> tuple[int, dict[str, str], bytes]:
+        reader = conn.reader
+        while True:
+            version, status = self._parse_status(await reader.readuntil(b"\r\n"))
+            headers: dict[str, str] = {}
+            while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+                name, _, value = line.decode("latin-1").partition(":")
+                name = name.strip().lower()
+                value = value.strip()
+                headers[name] = f"{headers[name]}, {value}" if name in headers else value
+            if not 100 <= status < 200:
+                break  # Skip interim responses such as 100 Continue.
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = "close" not in connection if version == "HTTP/1.1" else "keep-alive" in connection
+        if status in (204, 304):
+            body = b""
+        elif "chunked" in headers.get("transfer-encoding", "").lower():
+            body = await self._read_chunked(reader)
+        elif "content-length" in headers:
+            length = int(headers["content-length"])
+            if length > self.max_body:
+                raise ValueError(f"body of {length} bytes exceeds max_body")
+            body = await reader.readexactly(length)
+        else:
+            # The body runs until the server closes the connection.
+            chunks = []
+            total = 0
+            while chunk := await reader.read(self.max_body + 1 - total):
+                chunks.append(chunk)
+                total += len(chunk)
+                if total > self.max_body:
+                    raise ValueError("body exceeds max_body")
+            body = b"".join(chunks)
+            keep_alive = False
+
+        if not keep_alive:
+            conn.close()
+        elif version == "HTTP/1.1" and self.pipeline_depth > 1:
+            conn.pipelining = True
+        return status, headers, self._decode(headers.get("content-encoding", ""), body)
+
+    @staticmethod
+    def _parse_status(line: bytes) -> tuple[str, int]:
+        parts = line.decode("latin-1").split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise ValueError(f"bad status line {line!r}")
+        return parts[0], int(parts[1])
+
+    async def _read_chunked(self, reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        total = 0
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";", 1)[0], 16)
+            if size == 0:
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass  # Trailers.
+                return b"".join(chunks)
+            total += size
+            if total > self.max_body:
+                raise ValueError("chunked body exceeds max_body")
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    def _decode(self, encoding: str, body: bytes) -> bytes:
+        encoding = encoding.strip().lower()
+        if encoding in ("gzip", "x-gzip", "deflate") and body:
+            try:
+                # 32 + MAX_WBITS auto-detects a gzip or zlib header.
+                return zlib.decompressobj(32 + zlib.MAX_WBITS).decompress(body, self.max_body)
+            except zlib.error:
+                if encoding != "deflate":
+                    raise ValueError("corrupt gzip body") from None
+                # Some servers send raw deflate without the zlib header.
+                return zlib.decompressobj(-zlib.MAX_WBITS).decompress(body, self.max_body)
+        return body
+
+    @staticmethod
+    def _links(url: str, status: int, headers: dict[str, str], body: bytes) -> list[str]:
+        if 300 <= status < 400 and "location" in headers:
+            return [urldefrag(urljoin(url, headers["location"]))[0]]
+        content_type = headers.get("content-type", "text/html")
+        if not 200 <= status < 300 or "html" not in content_type.lower():
+            return []
+        match = _CHARSET.search(content_type)
+        try:
+            text = body.decode(match.group(1) if match else "utf-8", errors="replace")
+        except LookupError:
+            text = body.decode("utf-8", errors="replace")
+        return extract_links(url, text)
+
+
+# ──────────────────────────────────────────────
+# Adaptive concurrency
+# ──────────────────────────────────────────────
+
+class _HostLimit:
+    __slots__ = ("limit", "baseline", "hold_until")
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.baseline = 0.0  # fastest recent fetch; 0 until the first success
+        self.hold_until = 0.0  # no further decrease before this time
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limits on fetches in flight, one for the whole crawl and one per
+    host, adjusted from how fetches go. Pass one to `crawl(adaptive=...)`.
+
+    A limit in use (as many fetches in flight as it allows) grows by
+    `increase` / limit per successful fetch, i.e. by `increase` per round
+    trip. On congestion it is multiplied by `decrease`, at most once per
+    round trip, so one burst of failures counts once. Limits stay within
+    [min_concurrency, max_concurrency] and [min_per_host, max_per_host].
+
+    A host is congested when a fetch from it raises `OverloadError`
+    (timeout, 429, 503), or takes more than `latency_tolerance` times its
+    baseline, the fastest of its recent fetches. The crawl as a whole is
+    congested when, averaged over about `window` fetches, the share that
+    failed exceeds `error_threshold`, or the latency ratio to the hosts'
+    baselines exceeds `latency_tolerance`: every host slowing down at once
+    points at our own side (bandwidth, CPU).
+
+    An overloaded fetch is queued again, up to `retries` times, before it
+    is recorded as failed. State for a host that is back at
+    `initial_per_host` is dropped when the frontier forgets the host.
+    """
+
+    def __init__(
+        self,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        min_per_host: int = 1,
+        max_per_host: int = 4,
+        initial_concurrency: int = 8,
+        initial_per_host: int = 2,
+        latency_tolerance: float = 2.0,
+        error_threshold: float = 0.1,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        window: int = 20,
+        retries: int = 2,
+    ):
+        if not (1 <= min_concurrency <= max_concurrency and 1 <= min_per_host <= max_per_host):
+            raise ValueError("Need 1 <= min <= max for both limits")
+        if latency_tolerance <= 1 or not 0 < decrease < 1 or increase <= 0 or window < 1 or retries < 0:
+            raise ValueError("Need latency_tolerance > 1, 0 < decrease < 1, increase > 0, window >= 1, retries >= 0")
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.min_per_host = min_per_host
+        self.max_per_host = max_per_host
+        self.initial_per_host = min(max(initial_per_host, min_per_host), max_per_host)
+        self.latency_tolerance = latency_tolerance
+        self.error_threshold = error_threshold
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.retries = retries
+        self._limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self._hold_until = 0.0
+        self._hosts: dict[str, _HostLimit] = {}
+        self.error_rate = 0.0  # moving averages over ~window fetches
+        self.latency_ratio = 1.0
+        self.decreases = 0  # global, for monitoring
+
+    @property
+    def limit(self) -> int:
+        """Fetches allowed in flight across the crawl right now."""
+        return int(self._limit)
+
+    def host_limit(self, host: str) -> int:
+        """Fetches allowed in flight to `host` right now."""
+        state = self._hosts.get(host)
+        return int(state.limit) if state is not None else self.initial_per_host
+
+    def record(
+        self,
+        host: str,
+        latency: float,
+        error: FetchError | None,
+        saturated: bool,
+        host_saturated: bool,
+    ) -> None:
+        """
+        Account for one finished fetch that took `latency` seconds.
+        `saturated` / `host_saturated` say whether the crawl / the host was
+        at its limit, which is when a success earns an increase.
+        """
+        now = time.monotonic()
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostLimit(float(self.initial_per_host))
+        if error is None:
+            if not state.baseline or latency < state.baseline:
+                state.baseline = latency
+            else:
+                # Creep up, so a host that got slower for good is re-baselined.
+                state.baseline += (latency - state.baseline) / (10 * self.window)
+            ratio = latency / state.baseline if state.baseline else 1.0
+            self.latency_ratio += (ratio - self.latency_ratio) / self.window
+            host_congested = ratio > self.latency_tolerance
+        else:
+            host_congested = isinstance(error, OverloadError)
+        self.error_rate += ((error is not None) - self.error_rate) / self.window
+        hold = max(latency, state.baseline)
+
+        if host_congested:
+            if now >= state.hold_until:
+                state.limit = max(self.min_per_host, state.limit * self.decrease)
+                state.hold_until = now + hold
+        elif error is None and host_saturated:
+            state.limit = min(self.max_per_host, state.limit + self.increase / state.limit)
+
+        if self.error_rate > self.error_threshold or self.latency_ratio > self.latency_tolerance:
+            if now >= self._hold_until:
+                self._limit = max(self.min_concurrency, self._limit * self.decrease)
+                self._hold_until = now + hold
+                self.decreases += 1
+        elif error is None and saturated:
+            self._limit = min(self.max_concurrency, self._limit + self.increase / self._limit)
+
+    def forget(self, host: str) -> None:
+        """Drop a host's state unless it is still being held back."""
+        state = self._hosts.get(host)
+        if state is not None and state.limit >= self.initial_per_host and time.monotonic() >= state.hold_until:
+            del self._hosts[host]
+
+
+# ──────────────────────────────────────────────
+# Politeness frontier
+# ──────────────────────────────────────────────
+
+def host_of(url: str) -> str:
+    """The politeness key of a URL: its host and port, lower-cased."""
+    return urlsplit(url).netloc.rpartition("@")[2].lower()
+
+
+class _Host:
+    __slots__ = ("name", "urls", "active", "ready_at", "scheduled")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.urls: deque[str] = deque()
+        self.active = 0  # fetches in flight
+        self.ready_at = 0.0  # earliest time the next fetch may start
+        self.scheduled = False  # in _ready or _sleeping
+
+
+class SpillQueue:
+    """
+    FIFO of URLs on disk: append-only segment files of `segment_lines`
+    lines under `directory`. Only the read position and open files are in
+    memory. Segments read to the end are deleted by `release()`, which the
+    caller runs once a checkpoint no longer needs them.
+    """
+
+    def __init__(self, directory: str, segment_lines: int = 100_000, saved: dict | None = None):
+        self.directory = directory
+        self.segment_lines = segment_lines
+        saved = saved or {}
+        self._segments: deque[str] = deque(saved.get("segments", ()))
+        self._offset = saved.get("offset", 0)  # bytes read from _segments[0]
+        self._length = saved.get("length", 0)
+        self._written = saved.get("written", 0)  # lines in _segments[-1]
+        self._next = saved.get("next", 0)
+        self._consumed: list[str] = []
+        self._reader = None
+        self._writer = None
+        if self._segments:
+            # Lines appended after the checkpoint are gone on resume.
+            with open(self._path(self._segments[-1]), "r+b") as f:
+                f.truncate(saved["tail"])
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def push(self, url: str) -> None:
+        if self._writer is None or self._written >= self.segment_lines:
+            if self._segments and self._written < self.segment_lines:
+                self._writer = open(self._path(self._segments[-1]), "ab")  # Resumed.
+            else:
+                if self._writer is not None:
+                    self._writer.close()
+                name = f"spill-{self._next:06d}.txt"
+                self._next += 1
+                self._segments.append(name)
+                self._writer = open(self._path(name), "wb")
+                self._written = 0
+        self._writer.write(url.encode("utf-8", "surrogatepass") + b"\n")
+        self._written += 1
+        self._length += 1
+
+    def pop(self, n: int) -> list[str]:
+        """Up to `n` URLs from the front."""
+        urls: list[str] = []
+        if self._writer is not None and n > 0:
+            self._writer.flush()
+        while len(urls) < n and self._length:
+            if self._reader is None:
+                self._reader = open(self._path(self._segments[0]), "rb")
+                self._reader.seek(self._offset)
+            line = self._reader.readline()
+            if not line:
+                # This segment is finished; the writer has moved on.
+                self._reader.close()
+                self._reader = None
+                self._consumed.append(self._segments.popleft())
+                self._offset = 0
+                continue
+            self._offset += len(line)
+            self._length -= 1
+            urls.append(line[:-1].decode("utf-8", "surrogatepass"))
+        return urls
+
+    def checkpoint(self) -> dict:
+        """Make pushed URLs durable; returns what reopens the queue as of now."""
+        tail = 0
+        if self._writer is not None:
+            self._writer.flush()
+            os.fsync(self._writer.fileno())
+            tail = self._writer.tell()
+        elif self._segments:
+            tail = os.path.getsize(self._path(self._segments[-1]))
+        return {
+            "segments": list(self._segments),
+            "offset": self._offset,
+            "length": self._length,
+            "written": self._written,
+            "next": self._next,
+            "tail": tail,
+        }
+
+    def release(self) -> None:
+        """Delete segments read to the end before the latest checkpoint."""
+        for name in self._consumed:
+            os.unlink(self._path(name))
+        self._consumed.clear()
+
+    def close(self) -> None:
+        for f in (self._reader, self._writer):
+            if f is not None:
+                f.close()
+        self._reader = self._writer = None
+
+
+class HostFrontier:
+    """
+    URLs waiting to be fetched, queued per host, handed out politely.
+
+    A host is *eligible* when it has queued URLs, fewer than `max_per_host`
+    fetches in flight, and `min_delay` seconds have passed since its last
+    fetch started. Eligible hosts wait in a FIFO and `get()` serves the one
+    at the front, so hosts take turns (round-robin), and a host that only
+    just became eligible queues behind those eligible earlier (earliest
+    ready first). Hosts still inside their delay sit in a heap keyed by
+    the time they become eligible, and one timer wakes the loop for the
+    earliest of them.
+
+    With a `spill` queue, at most `max_queued` URLs are held in memory.
+    Further URLs are appended to the spill on disk and read back in
+    batches, oldest first, when memory drains to half the budget, or
+    sooner if no in-memory host is eligible.
+
+    With `limits`, an `AdaptiveConcurrency` sets the per-host cap in place
+    of `max_per_host` and also caps fetches in flight overall; `done()`
+    feeds it each fetch's latency and error.
+
+    `get()` returns None once nothing is queued or in flight: the crawl is
+    over. An `open_ended` frontier may still be fed from elsewhere (another
+    shard), so `get()` keeps waiting until `finish()` is called. Every URL
+    that `get()` returns must be passed to `done()`.
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = 2,
+        min_delay: float = 0.0,
+        spill: SpillQueue | None = None,
+        max_queued: int = 100_000,
+        open_ended: bool = False,
+        limits: AdaptiveConcurrency | None = None,
+    ):
+        if max_per_host < 1 or min_delay < 0 or max_queued < 1:
+            raise ValueError("max_per_host, max_queued must be >= 1 and min_delay >= 0")
+        self.max_per_host = max_per_host
+        self.min_delay = min_delay
+        self.max_queued = max_queued
+        self.open_ended = open_ended
+        self.limits = limits
+        self.queued = 0  # in memory
+        self.in_flight = 0
+        self._spill = spill
+        self._fetching: set[str] = set()
+        self._hosts: dict[str, _Host] = {}
+        self._ready: deque[_Host] = deque()
+        self._sleeping: list[tuple[float, int, _Host]] = []
+        self._retiring: list[tuple[float, int, _Host]] = []  # idle, empty hosts
+        self._seq = 0
+        self._getters: deque[asyncio.Future] = deque()
+        self._timer: asyncio.TimerHandle | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def __len__(self) -> int:
+        return self.queued + (len(self._spill) if self._spill is not None else 0)
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        return self._loop
+
+    def add(self, url: str) -> None:
+        """Queue a URL (the caller has already deduplicated it)."""
+        spill = self._spill
+        if spill is not None and (spill or self.queued >= self.max_queued):
+            spill.push(url)  # Behind everything already spilled: stays FIFO.
+        else:
+            self._enqueue(url, self._get_loop().time())
+        self._notify()
+
+    def finish(self) -> None:
+        """No more URLs will come from outside: let `get()` end once drained."""
+        self.open_ended = False
+        self._notify()
+
+    @property
+    def idle(self) -> bool:
+        """Nothing queued (in memory or spilled) and nothing in flight."""
+        return not self.in_flight and not len(self)
+
+    def snapshot(self) -> list[str]:
+        """Every URL not yet done that is held in memory: in flight, then queued."""
+        urls = list(self._fetching)
+        for host in self._hosts.values():
+            urls.extend(host.urls)
+        return urls
+
+    def _enqueue(self, url: str, now: float) -> None:
+        name = host_of(url)
+        host = self._hosts.get(name)
+        if host is None:
+            host = self._hosts[name] = _Host(name)
+        host.urls.append(url)
+        self.queued += 1
+        self._schedule(host, now)
+
+    async def get(self) -> str | None:
+        """The next URL to fetch, waiting for politeness; None when finished."""
+        loop = self._get_loop()
+        while True:
+            now = loop.time()
+            self._advance(now)
+            if self._ready and (self.limits is None or self.in_flight < self.limits.limit):
+                host = self._ready.popleft()
+                host.scheduled = False
+                url = host.urls.popleft()
+                self.queued -= 1
+                host.active += 1
+                self.in_flight += 1
+                self._fetching.add(url)
+                host.ready_at = now + self.min_delay
+                self._schedule(host, now)
+                return url
+            if not self.queued and not self.in_flight and not self.open_ended:
+                return None  # _advance() has already emptied any spill.
+
+            getter = loop.create_future()
+            self._getters.append(getter)
+            self._arm_timer()
+            try:
+                await getter
+            except asyncio.CancelledError:
+                if getter.done() and not getter.cancelled():
+                    self._notify()  # Pass on the wake-up we were given.
+                raise
+
+    def done(self, url: str, latency: float | None = None, error: FetchError | None = None) -> None:
+        """
+        Report that the fetch of a URL from `get()` has finished. With
+        `limits`, a fetch that took `latency` seconds (and raised `error`)
+        is accounted for there.
+        """
+        host = self._hosts[host_of(url)]
+        limits = self.limits
+        if limits is not None and latency is not None:
+            limits.record(
+                host.name, latency, error,
+                saturated=self.in_flight >= limits.limit,
+                host_saturated=host.active >= limits.host_limit(host.name),
+            )
+        host.active -= 1
+        self.in_flight -= 1
+        self._fetching.discard(url)
+        now = self._get_loop().time()
+        if host.urls:
+            self._schedule(host, now)
+        elif not host.active:
+            # Keep its ready_at until it has passed, then forget the host.
+            self._seq += 1
+            heapq.heappush(self._retiring, (host.ready_at, self._seq, host))
+        self._notify()
+
+    def _schedule(self, host: _Host, now: float) -> None:
+        cap = self.max_per_host if self.limits is None else self.limits.host_limit(host.name)
+        if host.scheduled or not host.urls or host.active >= cap:
+            return
+        host.scheduled = True
+        if host.ready_at <= now:
+            self._ready.append(host)
+        else:
+            self._seq += 1
+            heapq.heappush(self._sleeping, (host.ready_at, self._seq, host))
+
+    def _advance(self, now: float) -> None:
+        """Refill from the spill if memory runs low, then wake due hosts."""
+        spill = self._spill
+        if spill and (self.queued <= self.max_queued // 2 or not self._ready):
+            for url in spill.pop(self.max_queued - self.queued):
+                self._enqueue(url, now)
+        self._wake_sleepers(now)
+
+    def _wake_sleepers(self, now: float) -> None:
+        sleeping = self._sleeping
+        while sleeping and sleeping[0][0] <= now:
+            self._ready.append(heapq.heappop(sleeping)[2])
+        retiring = self._retiring
+        while retiring and retiring[0][0] <= now:
+            host = heapq.heappop(retiring)[2]
+            if not host.urls and not host.active and self._hosts.get(host.name) is host:
+                del self._hosts[host.name]
+                if self.limits is not None:
+                    self.limits.forget(host.name)
+
+    def _notify(self) -> None:
+        """Wake one getter per eligible host, or all of them once finished."""
+        self._advance(self._get_loop().time())
+        finished = not self.queued and not self.in_flight and not self.open_ended
+        if finished:
+            wake = len(self._getters)
+        elif self.limits is None:
+            wake = len(self._ready)
+        else:
+            wake = max(0, min(len(self._ready), self.limits.limit - self.in_flight))
+        while wake and self._getters:
+            getter = self._getters.popleft()
+            if not getter.done():
+                getter.set_result(None)
+                wake -= 1
+        self._arm_timer()
+
+    def _arm_timer(self) -> None:
+        """Keep one timer armed for the earliest sleeping host while anyone waits."""
+        if not self._getters or not self._sleeping:
+            return
+        when = self._sleeping[0][0]
+        if self._timer is not None:
+            if self._timer.when() <= when:
+                return
+            self._timer.cancel()
+        self._timer = self._get_loop().call_at(when, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._notify()
+
+
+# ──────────────────────────────────────────────
+# Disk-backed, resumable crawl state
+# ──────────────────────────────────────────────
+
+class CrawlState:
+    """
+    A crawl's state under `directory`, bounded in memory and resumable.
+
+    Files:
+        urls, urls.idx          URL text and offsets (`UrlTable`)
+        seen-*.seg              spilled fingerprint runs (`_Segment`)
+        seen-mem-*.bin          the in-memory fingerprints at a checkpoint
+        spill-*.txt             frontier overflow (`SpillQueue`)
+        frontier-*.txt          the in-memory frontier at a checkpoint
+        visited.ids, edges.*    the result's id columns
+        checkpoint.json         which of the above form the last checkpoint
+
+    Everything is append-only or written under a new name, and
+    `checkpoint.json` is replaced atomically, so a crash at any point
+    leaves the previous checkpoint intact. Opening the directory truncates
+    anything appended since that checkpoint and deletes the state files it
+    doesn't name. Any other file or directory there is left alone.
+    """
+
+    MANIFEST = "checkpoint.json"
+    COLUMNS = ("visited.ids", "edges.src", "edges.dst")
+    # Names of the files a crawl creates under generated names (and the
+    # temporaries of _write_atomic); nothing else is ever deleted.
+    GENERATED = re.compile(r"(seen-\d+\.seg|seen-mem-\d+\.bin|spill-\d+\.txt|frontier-\d+\.txt|\.tmp-.*)\Z")
+
+    def __init__(self, directory: str, memory_urls: int = 1_000_000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.memory_urls = memory_urls
+        manifest_path = os.path.join(directory, self.MANIFEST)
+        saved: dict = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                saved = json.load(f)
+        self.resumed = bool(saved)
+        self._saved = saved
+        self.generation = saved.get("generation", 0)
+        self.root: str | None = saved.get("root")  # set by crawl() on a fresh state
+
+        self.index = UrlIndex.on_disk(directory, memory_urls, saved.get("index"))
+        self.result = CrawlResult(urls=self.index.urls)
+        self.result.failed = dict(saved.get("failed", {}))
+        columns = (self.result.visited_ids, self.result.edge_src, self.result.edge_dst)
+        lengths = (saved.get("visited", 0), saved.get("edges", 0), saved.get("edges", 0))
+        self._columns = []
+        for name, column, length in zip(self.COLUMNS, columns, lengths):
+            f = _open_rw(os.path.join(directory, name))
+            column.fromfile(f, length)
+            f.truncate(length * column.itemsize)
+            self._columns.append((f, column))
+        self._synced = list(lengths)
+
+        self.spill = SpillQueue(directory, saved=saved.get("spill"))
+        self.pending: list[str] = []  # the in-memory frontier to restore
+        if saved.get("frontier"):
+            with open(os.path.join(directory, saved["frontier"]), encoding="utf-8", errors="surrogatepass") as f:
+                self.pending = f.read().splitlines()
+        self._remove_unreferenced()
+
+    def _referenced(self, saved: dict) -> set[str]:
+        names = {self.MANIFEST, "urls", "urls.idx", *self.COLUMNS}
+        index = saved.get("index", {})
+        names.update(index.get("segments", ()))
+        names.update(saved.get("spill", {}).get("segments", ()))
+        names.update(n for n in (index.get("memtable"), saved.get("frontier")) if n)
+        return names
+
+    def _remove_unreferenced(self) -> None:
+        keep = self._referenced(self._saved)
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name not in keep and self.GENERATED.match(name) and os.path.isfile(path):
+                os.unlink(path)
+
+    def frontier(self, max_per_host: int, min_delay: float, limits: AdaptiveConcurrency | None = None) -> HostFrontier:
+        """A frontier spilling into this state, holding the restored URLs."""
+        frontier = HostFrontier(max_per_host, min_delay, spill=self.spill, max_queued=self.memory_urls, limits=limits)
+        for url in self.pending:
+            frontier.add(url)
+        self.pending = []
+        return frontier
+
+    def checkpoint(self, frontier: HostFrontier) -> None:
+        """Write a consistent snapshot. Synchronous: nothing runs meanwhile."""
+        generation = self.generation + 1
+        manifest = {"generation": generation, "root": self.root, "index": self.index.checkpoint(generation)}
+        for i, (f, column) in enumerate(self._columns):
+            f.seek(0, os.SEEK_END)
+            column[self._synced[i]:].tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+            self._synced[i] = len(column)
+        manifest["visited"] = len(self.result.visited_ids)
+        manifest["edges"] = len(self.result.edge_src)
+        manifest["failed"] = self.result.failed
+        manifest["frontier"] = f"frontier-{generation:06d}.txt"
+        text = "".join(url + "\n" for url in frontier.snapshot())
+        _write_atomic(os.path.join(self.directory, manifest["frontier"]), text.encode("utf-8", "surrogatepass"))
+        manifest["spill"] = self.spill.checkpoint()
+        _write_atomic(os.path.join(self.directory, self.MANIFEST), json.dumps(manifest).encode())
+
+        # The new checkpoint is committed; drop what only the old one needed.
+        self.spill.release()
+        keep = self._referenced(manifest)
+        for name in self._referenced(self._saved) - keep:
+            os.unlink(os.path.join(self.directory, name))
+        self._saved = manifest
+        self.generation = generation
+
+    def close(self) -> None:
+        """Close the files; the result's URL table stays open for reading."""
+        self.index.close()
+        self.spill.close()
+        for f, _ in self._columns:
+            f.close()
+
+
+# ──────────────────────────────────────────────
+# Crawler
+# ──────────────────────────────────────────────
+
+OnPage = Callable[[str, list[str] | None, str | None], Awaitable[None]]
+
+
+async def _run_workers(frontier: HostFrontier, fetcher: Fetcher, max_concurrency: int, on_page: OnPage) -> None:
+    """
+    Fetch from `frontier` with `max_concurrency` workers until it is
+    exhausted. `on_page(url, links, error)` runs for each page before the
+    frontier hears it is done; `links` is None when the fetch failed. With
+    adaptive limits, an overloaded fetch is queued again up to their
+    `retries` times before it counts as failed.
+    """
+    loop = asyncio.get_running_loop()
+    retries = frontier.limits.retries if frontier.limits is not None else 0
+    attempts: dict[str, int] = {}  # URLs being retried
+
+    async def worker() -> None:
+        # Any other exception leaves the URL in flight, so a checkpoint
+        # taken while the crawl unwinds still lists it as unfinished.
+        while (url := await frontier.get()) is not None:
+            start = loop.time()
+            try:
+                links, error = await fetcher.fetch(url), None
+            except FetchError as exc:
+                links, error = None, exc
+            latency = loop.time() - start
+            tried = attempts.pop(url, 0)
+            if isinstance(error, OverloadError) and tried < retries:
+                attempts[url] = tried + 1
+                frontier.add(url)
+            else:
+                await on_page(url, links, None if error is None else str(error))
+            frontier.done(url, latency, error)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max_concurrency)]
+    try:
+        # Workers return once the frontier is exhausted; stop early if one fails.
+        await asyncio.wait(workers, return_when=asyncio.FIRST_EXCEPTION)
+        for task in workers:
+            if task.done():
+                task.result()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def crawl(
+    root: str,
+    graph: dict[str, list[str]] | None = None,
+    max_concurrency: int = 3,
+    fetch_delay: float = 0.05,
+    fetcher: Fetcher | None = None,
+    max_per_host: int = 2,
+    host_delay: float = 0.0,
+    expected_urls: int = 0,
+    bloom: bool = False,
+    state_dir: str | None = None,
+    memory_urls: int = 1_000_000,
+    checkpoint_interval: float = 60.0,
+    adaptive: AdaptiveConcurrency | None = None,
+) -> CrawlResult:
+    """
+    Crawl breadth-first from `root` with at most `max_concurrency` fetches in
+    flight, at most `max_per_host` of them to any one host, and fetches to
+    the same host starting at least `host_delay` seconds apart. Pages come
+    from `fetcher`, or from `graph` simulated with `fetch_delay` when no
+    fetcher is given. `graph`'s keys also define which URLs count as
+    unreachable.
+
+    URLs are deduplicated by canonical form; `expected_urls` presizes the
+    seen table and `bloom` puts a Bloom filter in front of it.
+
+    With `state_dir`, the URL table, seen set and frontier live on disk
+    with at most about `memory_urls` of each in memory, and a checkpoint
+    is written every `checkpoint_interval` seconds and at the end. If
+    `state_dir` already holds a checkpoint, the crawl resumes from it. The
+    pages in flight at that checkpoint are fetched again, and none of the
+    others are. A checkpoint of a crawl from another root raises ValueError.
+
+    With `adaptive`, the global and per-host limits move within its bounds
+    (AIMD, see `AdaptiveConcurrency`), replacing `max_concurrency` and
+    `max_per_host`.
+    """
+    if adaptive is not None:
+        max_concurrency = adaptive.max_concurrency
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be >= 1")
+    own_fetcher = fetcher is None
+    if fetcher is None:
+        fetcher = GraphFetcher(graph or {}, fetch_delay)
+
+    state = None
+    if state_dir is not None:
+        state = CrawlState(state_dir, memory_urls)
+        if state.resumed and state.root is not None and canonicalize(state.root) != canonicalize(root):
+            state.close()
+            raise ValueError(f"{state_dir} holds a crawl from {state.root}, not {root}")
+        if not state.resumed:
+            state.root = root
+        index, result = state.index, state.result
+        frontier = state.frontier(max_per_host, host_delay, adaptive)
+    else:
+        index = UrlIndex(expected_urls, bloom)
+        result = CrawlResult(urls=index.urls)
+        frontier = HostFrontier(max_per_host, host_delay, limits=adaptive)
+    if state is None or not state.resumed:
+        index.intern(root)
+        frontier.add(root)
+
+    async def record(url: str, links: list[str] | None, error: str | None) -> None:
+        # No await in here: a checkpoint never sees a page half recorded.
+        if links is None:
+            result.failed[url] = error
+            return
+        src = index.get(url)
+        result.visited_ids.append(src)
+        for link in links:
+            dst, new = index.intern(link)
+            result.edge_src.append(src)
+            result.edge_dst.append(dst)
+            if new:
+                frontier.add(link)
+
+    async def checkpointer() -> None:
+        while True:
+            await asyncio.sleep(checkpoint_interval)
+            state.checkpoint(frontier)
+
+    background = [asyncio.create_task(checkpointer())] if state is not None else []
+    try:
+        await _run_workers(frontier, fetcher, max_concurrency, record)
+        if state is not None:
+            state.checkpoint(frontier)
+        result.unreachable = {url for url in graph or () if url not in index}
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        if own_fetcher:
+            await fetcher.close()
+        if state is not None:
+            state.close()
+    return result
+
+
+# ──────────────────────────────────────────────
+# Streaming crawl
+# ──────────────────────────────────────────────
+
+@dataclass
+class PageRecord:
+    """One processed page: its outgoing links, or the error that stopped it."""
+
+    url: str
+    links: list[str]
+    error: str | None = None
+
+
+class _NdjsonSink:
+    """One JSON object per page per line."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "w", encoding="utf-8", errors="surrogatepass")
+
+    def write(self, record: PageRecord, src: int, dsts: list[int]) -> None:
+        obj = {"url": record.url, "links": record.links}
+        if record.error is not None:
+            obj["error"] = record.error
+        self._file.write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ColumnarSink:
+    """
+    A directory holding the crawl's URL table (`urls`, `urls.idx`) plus
+    `pages.ids`, `edges.src` and `edges.dst` columns of ids into it, and
+    `failed.ndjson`. `read_columnar` loads it back as a CrawlResult.
+    """
+
+    FLUSH_ROWS = 1 << 16
+
+    def __init__(self, directory: str, urls: UrlTable):
+        self._urls = urls
+        self._columns = [
+            (open(os.path.join(directory, name), "wb"), array(_ID))
+            for name in ("pages.ids", "edges.src", "edges.dst")
+        ]
+        self._failed = open(os.path.join(directory, "failed.ndjson"), "w", encoding="utf-8", errors="surrogatepass")
+
+    def write(self, record: PageRecord, src: int, dsts: list[int]) -> None:
+        if record.error is not None:
+            self._failed.write(json.dumps({"url": record.url, "error": record.error}, ensure_ascii=False) + "\n")
+            return
+        (_, pages), (_, sources), (_, targets) = self._columns
+        pages.append(src)
+        sources.extend([src] * len(dsts))
+        targets.extend(dsts)
+        if len(sources) >= self.FLUSH_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        for f, column in self._columns:
+            column.tofile(f)
+            del column[:]
+
+    def close(self) -> None:
+        self._flush()
+        for f, _ in self._columns:
+            f.close()
+        self._failed.close()
+        self._urls.sync()
+        self._urls.close()
+
+
+def read_columnar(directory: str) -> CrawlResult:
+    """Load a `crawl_stream(..., output_format="columnar")` directory."""
+    count = os.path.getsize(os.path.join(directory, "urls.idx")) // 8 - 1
+    result = CrawlResult(urls=UrlTable.on_disk(os.path.join(directory, "urls"), max(count, 0)))
+    for name, column in (
+        ("pages.ids", result.visited_ids), ("edges.src", result.edge_src), ("edges.dst", result.edge_dst),
+    ):
+        with open(os.path.join(directory, name), "rb") as f:
+            column.frombytes(f.read())
+    with open(os.path.join(directory, "failed.ndjson"), encoding="utf-8", errors="surrogatepass") as f:
+        for line in f:
+            entry = json.loads(line)
+            result.failed[entry["url"]] = entry["error"]
+    return result
+
+
+async def crawl_stream(
+    root: str,
+    graph: dict[str, list[str]] | None = None,
+    max_concurrency: int = 3,
+    fetch_delay: float = 0.05,
+    fetcher: Fetcher | None = None,
+    max_per_host: int = 2,
+    host_delay: float = 0.0,
+    buffer: int = 64,
+    output: str | None = None,
+    output_format: str = "ndjson",
+    adaptive: AdaptiveConcurrency | None = None,
+) -> AsyncIterator[PageRecord]:
+    """
+    Crawl like `crawl`, yielding a PageRecord per page as soon as it is
+    processed instead of collecting a CrawlResult. Only the seen-URL index
+    is kept. At most `buffer` records wait for the consumer; when the
+    consumer falls behind, workers block on handing over their page and
+    stop taking URLs from the frontier.
+
+    With `output`, every record is also written there as it is produced:
+    `output_format="ndjson"` writes one JSON object per line to the file
+    `output`, and `"columnar"` writes id columns and the URL table into
+    the directory `output` (see `read_columnar`). `adaptive` is as for
+    `crawl`.
+    """
+    if adaptive is not None:
+        max_concurrency = adaptive.max_concurrency
+    if max_concurrency < 1 or buffer < 1:
+        raise ValueError("max_concurrency and buffer must be >= 1")
+    if output_format not in ("ndjson", "columnar"):
+        raise ValueError(f"Unknown output_format {output_format!r}")
+    own_fetcher = fetcher is None
+    if fetcher is None:
+        fetcher = GraphFetcher(graph or {}, fetch_delay)
+
+    sink: _NdjsonSink | _ColumnarSink | None = None
+    if output is not None and output_format == "columnar":
+        os.makedirs(output, exist_ok=True)
+        index = UrlIndex(urls=UrlTable.on_disk(os.path.join(output, "urls")))
+        sink = _ColumnarSink(output, index.urls)
+    else:
+        index = UrlIndex()
+        if output is not None:
+            sink = _NdjsonSink(output)
+    frontier = HostFrontier(max_per_host, host_delay, limits=adaptive)
+    index.intern(root)
+    frontier.add(root)
+    pages: asyncio.Queue[PageRecord | None] = asyncio.Queue(buffer)
+
+    async def hand_over(url: str, links: list[str] | None, error: str | None) -> None:
+        record = PageRecord(url, links if links is not None else [], error)
+        dsts = []
+        for link in record.links:
+            dst, new = index.intern(link)
+            dsts.append(dst)
+            if new:
+                frontier.add(link)
+        if sink is not None:
+            sink.write(record, index.get(url), dsts)
+        await pages.put(record)  # Blocks while the consumer is `buffer` behind.
+
+    async def produce() -> None:
+        # Not on cancellation: the consumer has closed the stream, and with
+        # the buffer full the end marker would wait for it forever.
+        try:
+            await _run_workers(frontier, fetcher, max_concurrency, hand_over)
+        except Exception:
+            await pages.put(None)  # The consumer re-raises this from `producer`.
+            raise
+        await pages.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (record := await pages.get()) is not None:
+            yield record
+        await producer  # Re-raise a worker's failure.
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        if own_fetcher:
+            await fetcher.close()
+        if sink is not None:
+            sink.close()
+
+
+# ──────────────────────────────────────────────
+# Sharded multi-process crawl
+# ──────────────────────────────────────────────
+
+def shard_of(url: str, shards: int) -> int:
+    """The shard owning a URL's host: a stable hash, the same in every process."""
+    digest = hashlib.blake2b(host_of(url).encode("utf-8", "surrogatepass"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % shards
+
+
+class ShardFailedError(RuntimeError):
+    """A crawler shard process raised or died."""
+
+
+def _shard_process(shard: int, shards: int, inboxes: list, status, fetcher_factory, options: dict) -> None:
+    try:
+        result = asyncio.run(_run_shard(shard, shards, inboxes, status, fetcher_factory, **options))
+    except BaseException as exc:
+        status.put(("error", shard, f"{type(exc).__name__}: {exc}"))
+    else:
+        status.put(("result", shard, result))
+
+
+class _Termination:
+    """
+    The parent's side of detecting that a sharded crawl is over, by
+    Mattern's four-counter method. Shards report (idle, batches sent,
+    batches received) whenever they go idle, and when probed.
+
+    Reports taken at different moments can balance while a batch is still
+    being passed on: shard X reports idle, then receives a batch and
+    forwards one to Y, and Y reports receiving it; X's unreported receive
+    and send cancel out. So balanced idle reports only start a wave of
+    probes, and the crawl is over once two consecutive waves find every
+    shard idle with the same counts, sent and received balancing. The
+    counts only grow, so nothing was sent or received between the waves:
+    at that point every shard was idle and no batch was in transit.
+    """
+
+    def __init__(self, shards: int, seeds: int = 1):
+        self.shards = shards
+        self.seeds = seeds  # batches sent by the parent
+        self.wave = 0
+        self._latest: dict[int, tuple[bool, int, int]] = {}
+        self._replies: dict[int, tuple[bool, int, int]] = {}
+        self._previous: dict[int, tuple[bool, int, int]] | None = None
+        self._probing = False
+        self._over = False
+
+    def report(self, shard: int, idle: bool, sent: int, received: int, wave: int | None = None) -> str | None:
+        """
+        Record a shard's counts, from going idle or as its reply to probe
+        `wave`. Returns "probe" when every shard should be sent probe
+        `self.wave`, "stop" once the crawl is over, and otherwise None.
+        """
+        if self._over:
+            return None
+        counts = (idle, sent, received)
+        self._latest[shard] = counts
+        if wave is not None:
+            if wave != self.wave:
+                return None
+            self._replies[shard] = counts
+            if len(self._replies) < self.shards:
+                return None
+            replies, self._replies = self._replies, {}
+            self._probing = False
+            if self._quiet(replies):
+                if replies == self._previous:
+                    self._over = True
+                    return "stop"
+                self._previous = replies
+                return self._probe()
+            self._previous = None
+        if not self._probing and self._quiet(self._latest):
+            return self._probe()
+        return None
+
+    def _quiet(self, reports: dict[int, tuple[bool, int, int]]) -> bool:
+        return (
+            len(reports) == self.shards
+            and all(idle for idle, _, _ in reports.values())
+            and self.seeds + sum(sent for _, sent, _ in reports.values())
+            == sum(received for _, _, received in reports.values())
+        )
+
+    def _probe(self) -> str:
+        self.wave += 1
+        self._probing = True
+        return "probe"
+
+
+async def _run_shard(
+    shard: int,
+    shards: int,
+    inboxes: list,
+    status,
+    fetcher_factory: Callable[[], Fetcher],
+    max_concurrency: int,
+    max_per_host: int,
+    host_delay: float,
+    batch_size: int,
+    flush_interval: float,
+    adaptive: AdaptiveConcurrency | None,
+) -> CrawlResult:
+    """
+    One shard: crawl the URLs whose host hashes here, batch links to other
+    shards into their inboxes, and report its (batches sent, batches
+    received) counts to the parent whenever it goes idle or is probed
+    (see `_Termination`).
+    """
+    loop = asyncio.get_running_loop()
+    index = UrlIndex()
+    result = CrawlResult(urls=index.urls)
+    frontier = HostFrontier(max_per_host, host_delay, open_ended=True, limits=adaptive)
+    outboxes: list[list[str]] = [[] for _ in range(shards)]
+    sent = received = 0
+    reported: tuple[int, int] | None = None
+    fetcher = fetcher_factory()
+
+    def send(dest: int) -> None:
+        nonlocal sent
+        inboxes[dest].put(outboxes[dest])
+        outboxes[dest] = []
+        sent += 1
+
+    def flush() -> None:
+        for dest in range(shards):
+            if outboxes[dest]:
+                send(dest)
+
+    def check_idle() -> None:
+        nonlocal reported
+        if frontier.idle:
+            flush()
+            if reported != (sent, received):
+                reported = (sent, received)
+                status.put(("idle", shard, sent, received))
+
+    def route(url: str) -> int:
+        """Intern a link target; a new one is queued here or sent to its owner."""
+        url_id, new = index.intern(url)
+        if new:
+            owner = shard_of(url, shards)
+            if owner == shard:
+                frontier.add(url)
+            else:
+                outboxes[owner].append(url)
+                if len(outboxes[owner]) >= batch_size:
+                    send(owner)
+        return url_id
+
+    async def record(url: str, links: list[str] | None, error: str | None) -> None:
+        # The worker tells the frontier this page is done right after we
+        # return, so only look for idleness on the next loop iteration.
+        loop.call_soon(check_idle)
+        if links is None:
+            result.failed[url] = error
+            return
+        src = index.get(url)
+        result.visited_ids.append(src)
+        for link in links:
+            dst = route(link)
+            result.edge_src.append(src)
+            result.edge_dst.append(dst)
+
+    arrivals: asyncio.Queue[list[str] | int | None] = asyncio.Queue()
+
+    def pump(inbox) -> None:
+        # A daemon thread, so a shard that fails never waits on a blocked get().
+        while True:
+            batch = inbox.get()
+            try:
+                loop.call_soon_threadsafe(arrivals.put_nowait, batch)
+            except RuntimeError:
+                return  # The loop is gone.
+            if batch is None:
+                return
+
+    async def receiver() -> None:
+        nonlocal received
+        while (batch := await arrivals.get()) is not None:
+            if isinstance(batch, int):  # A probe from the parent.
+                check_idle()
+                status.put(("wave", shard, batch, frontier.idle, sent, received))
+                continue
+            received += 1
+            for url in batch:
+                if index.intern(url)[1]:
+                    frontier.add(url)
+            check_idle()
+
+    async def flusher() -> None:
+        # A busy shard still passes links on, rather than only when idle.
+        while True:
+            await asyncio.sleep(flush_interval)
+            flush()
+
+    threading.Thread(target=pump, args=(inboxes[shard],), daemon=True).start()
+    running = asyncio.create_task(_run_workers(frontier, fetcher, max_concurrency, record))
+    receiving = asyncio.create_task(receiver())
+    background = asyncio.create_task(flusher())
+    try:
+        check_idle()
+        # Until the parent says every shard is done, or a worker fails.
+        await asyncio.wait([receiving, running], return_when=asyncio.FIRST_COMPLETED)
+        if running.done():
+            running.result()
+        receiving.result()
+        frontier.finish()
+        await running
+    finally:
+        for task in (receiving, background, running):
+            task.cancel()
+        await asyncio.gather(receiving, background, running, return_exceptions=True)
+        await fetcher.close()
+    return result
+
+
+async def crawl_sharded(
+    root: str,
+    graph: dict[str, list[str]] | None = None,
+    shards: int = 4,
+    fetcher_factory: Callable[[], Fetcher] | None = None,
+    max_concurrency: int = 3,
+    fetch_delay: float = 0.05,
+    max_per_host: int = 2,
+    host_delay: float = 0.0,
+    batch_size: int = 256,
+    flush_interval: float = 0.01,
+    adaptive: AdaptiveConcurrency | None = None,
+    context: multiprocessing.context.BaseContext | None = None,
+) -> CrawlResult:
+    """
+    Crawl with `shards` processes. Each owns the hosts that hash to it
+    (`shard_of`) and runs `max_concurrency` workers with its own frontier,
+    URL index and fetcher from `fetcher_factory` (default: the simulated
+    `graph`). Links to another shard's hosts are sent in batches of up to
+    `batch_size`, at the latest every `flush_interval` seconds. `adaptive`
+    is as for `crawl`; each shard adapts its own copy. The shards' results
+    are merged into one CrawlResult; `visited` is grouped by shard.
+    """
+    if shards < 1:
+        raise ValueError("shards must be >= 1")
+    if adaptive is not None:
+        max_concurrency = adaptive.max_concurrency
+    if fetcher_factory is None:
+        fetcher_factory = partial(GraphFetcher, graph or {}, fetch_delay)
+    ctx = context or multiprocessing.get_context()
+    loop = asyncio.get_running_loop()
+    inboxes = [ctx.Queue() for _ in range(shards)]
+    status = ctx.Queue()
+    options = dict(
+        max_concurrency=max_concurrency, max_per_host=max_per_host, host_delay=host_delay,
+        batch_size=batch_size, flush_interval=flush_interval, adaptive=adaptive,
+    )
+    processes = [
+        ctx.Process(target=_shard_process, args=(i, shards, inboxes, status, fetcher_factory, options), daemon=True)
+        for i in range(shards)
+    ]
+    for process in processes:
+        process.start()
+
+    inboxes[shard_of(root, shards)].put([root])
+    termination = _Termination(shards)
+    results: dict[int, CrawlResult] = {}
+    try:
+        while len(results) < shards:
+            try:
+                message = await loop.run_in_executor(None, partial(status.get, timeout=1.0))
+            except queue.Empty:
+                dead = [i for i, p in enumerate(processes) if not p.is_alive() and i not in results]
+                if dead:
+                    raise ShardFailedError(f"Shard {dead[0]} exited without a result") from None
+                continue
+            kind, shard = message[0], message[1]
+            if kind == "error":
+                raise ShardFailedError(f"Shard {shard} failed: {message[2]}")
+            if kind == "result":
+                results[shard] = message[2]
+                continue
+            if kind == "idle":
+                action = termination.report(shard, True, *message[2:])
+            else:
+                action = termination.report(shard, *message[3:], wave=message[2])
+            if action is not None:
+                signal = termination.wave if action == "probe" else None
+                for inbox in inboxes:
+                    inbox.put(signal)
+    finally:
+        for process in processes:
+            if len(results) < shards:
+                process.terminate()
+            process.join()
+
+    # Merge: re-intern each shard's URLs once and remap its id columns.
+    index = UrlIndex()
+    merged = CrawlResult(urls=index.urls)
+    for shard in range(shards):
+        part = results[shard]
+        mapping = array(_ID, [index.intern(url)[0] for url in part.urls])
+        merged.visited_ids.extend(mapping[i] for i in part.visited_ids)
+        merged.edge_src.extend(mapping[i] for i in part.edge_src)
+        merged.edge_dst.extend(mapping[i] for i in part.edge_dst)
+        merged.failed.update(part.failed)
+    merged.unreachable = {url for url in graph or () if url not in index}
+    return merged
+
+
+# ──────────────────────────────────────────────
+# Benchmarks
+# ──────────────────────────────────────────────
+
+def generate_web_graph(
+    pages: int,
+    hosts: int | None = None,
+    mean_links: float = 8.0,
+    dangling: float = 0.02,
+    orphans: float = 0.01,
+    seed: int = 0,
+) -> dict[str, list[str]]:
+    """
+    A synthetic web graph for benchmarking, rooted at its first URL.
+
+    - Host sizes are Zipf-distributed over `hosts` hosts (default: one per
+      40 pages), so a few hosts hold most pages.
+    - Out-degree is Pareto (shape 2.1, mean `mean_links`, capped at 1000).
+    - 60% of links stay on the page's host; the rest favour low-numbered
+      (older, more popular) pages. Together these give plenty of cycles.
+    - A `dangling` fraction point at hosts that aren't in the graph, like
+      the challenge's missing.com.
+    - Every page except the last `orphans` fraction gets one link from an
+      earlier page, so everything else is reachable from the root.
+    """
+    rng = random.Random(seed)
+    hosts = hosts or max(1, pages // 40)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(hosts)))
+    host_of_page = [0] + rng.choices(range(hosts), cum_weights=cum_weights, k=pages - 1)
+    urls = [f"http://site{host}.example/{i}" for i, host in enumerate(host_of_page)]
+    live = pages - int(pages * orphans)  # pages [live, pages) are orphans
+    by_host: list[list[int]] = [[] for _ in range(hosts)]
+    for i in range(live):
+        by_host[host_of_page[i]].append(i)
+
+    shape = 2.1
+    scale = mean_links * (shape - 1) / shape
+    graph: dict[str, list[str]] = {}
+    for i, url in enumerate(urls):
+        links = []
+        for _ in range(min(1000, int(scale * rng.paretovariate(shape)))):
+            r = rng.random()
+            if r < dangling:
+                links.append(f"http://missing{rng.randrange(pages)}.example/")
+            elif r < 0.6 and by_host[host_of_page[i]]:
+                links.append(urls[rng.choice(by_host[host_of_page[i]])])
+            else:
+                links.append(urls[int(live * rng.random() ** 2)])
+        graph[url] = links
+    for i in range(1, live):
+        graph[urls[rng.randrange(i)]].append(urls[i])
+    return graph
+
+
+class _MeteredFetcher(GraphFetcher):
+    """GraphFetcher that totals the time fetches spend in flight."""
+
+    def __init__(self, graph: dict[str, list[str]], delay: float):
+        super().__init__(graph, delay)
+        self.busy = 0.0
+
+    async def fetch(self, url: str) -> list[str]:
+        start = time.perf_counter()
+        try:
+            return await super().fetch(url)
+        finally:
+            self.busy += time.perf_counter() - start
+
+
+def _bench_crawl(graph: dict[str, list[str]], concurrency: int, delay: float) -> tuple[int, float, float, float]:
+    """(pages, wall seconds, CPU seconds, mean fetches in flight) of one crawl."""
+    fetcher = _MeteredFetcher(graph, delay)
+    root = next(iter(graph))
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = asyncio.run(crawl(root, max_concurrency=concurrency, fetcher=fetcher))
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return len(result.visited_ids), wall, cpu, fetcher.busy / wall
+
+
+def _bench_peak(graph: dict[str, list[str]], concurrency: int) -> float:
+    """Peak MiB allocated during a crawl (beyond the graph itself)."""
+    tracemalloc.start()
+    try:
+        asyncio.run(crawl(next(iter(graph)), graph, max_concurrency=concurrency, fetch_delay=0))
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def _bench_urls(n: int) -> Iterator[str]:
+    for i in range(n):
+        yield f"http://site{i % 5000}.example/section/{i // 7}/page-{i}.html"
+
+
+def _fill_index(index: UrlIndex, urls: Iterator[str]) -> UrlIndex:
+    for url in urls:
+        index.intern(url)
+    return index
+
+
+def run_benchmark(scale: float = 1.0) -> None:
+    """
+    Throughput, scheduler cost, memory and utilisation of `crawl` on
+    synthetic graphs, then the cost of the seen-URL structures.
+
+        python 2026-03-07-concurrent-web-crawler-solution.py --bench [scale]
+
+    - CPU µs/page is process time per page, i.e. everything the crawler
+      does besides waiting on fetches.
+    - util is the mean number of fetches in flight over `max_concurrency`.
+      The default per-host cap of 2 limits it on graphs with few hosts.
+    - With a fetch delay, the graph is cut down so a run ideally takes
+      about a second.
+    """
+    pages = int(20_000 * scale)
+    graphs: dict[int, dict[str, list[str]]] = {}
+    print(f"{'conc':>5}{'delay ms':>10}{'pages':>9}{'pages/s':>11}{'CPU µs/page':>13}{'util':>7}{'peak MiB':>10}")
+    for delay in (0.0, 0.001, 0.01):
+        for concurrency in (1, 8, 64, 256):
+            n = pages if not delay else max(100, min(pages, int(concurrency / delay)))
+            if n not in graphs:
+                graphs[n] = generate_web_graph(n, seed=1)
+            graph = graphs[n]
+            visited, wall, cpu, in_flight = _bench_crawl(graph, concurrency, delay)
+            peak = f"{_bench_peak(graph, concurrency):>10.1f}" if not delay else f"{'-':>10}"
+            print(
+                f"{concurrency:>5}{delay * 1000:>10g}{visited:>9,}{visited / wall:>11,.0f}"
+                f"{cpu / visited * 1e6:>13,.0f}{in_flight / concurrency:>7.0%}{peak}"
+            )
+
+    # Seen-set designs: bytes per URL (tracemalloc, strings included) and
+    # ns per insert, including canonicalization for the UrlIndex.
+    n = int(100_000 * scale)
+    print(f"\n{'seen set':<22}{'bytes/URL':>10}{'ns/insert':>11}")
+    for label, build in (
+        ("set[str]", lambda: set(_bench_urls(n))),
+        ("UrlIndex", lambda: _fill_index(UrlIndex(), _bench_urls(n))),
+        ("UrlIndex + Bloom", lambda: _fill_index(UrlIndex(n, bloom=True), _bench_urls(n))),
+    ):
+        start = time.perf_counter()
+        built = build()
+        elapsed = time.perf_counter() - start
+        del built
+        tracemalloc.start()
+        built = build()
+        used = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del built
+        print(f"{label:<22}{used / n:>10.0f}{elapsed / n * 1e9:>11,.0f}")
+
+
+# ──────────────────────────────────────────────
+# Localhost stand-in server (tests)
+# ──────────────────────────────────────────────
+
+class StandInServer:
+    """
+    A small HTTP/1.1 server on 127.0.0.1 serving `pages` (path -> HTML).
+
+    It speaks just enough of the protocol to exercise `HttpFetcher`. It
+    gzips bodies when asked, uses chunked encoding for `chunked` paths, and
+    reads pipelined requests. It can also refuse keep-alive, or drop every
+    connection after `max_requests` responses without saying so first.
+    With `capacity`, a request arriving while that many are being served
+    gets a 503. Paths in `raw` get that exact response, malformed or not;
+    a tuple of parts is sent `raw_pause` seconds apart.
+    """
+
+    def __init__(
+        self,
+        pages: dict[str, str],
+        keep_alive: bool = True,
+        max_requests: int | None = None,
+        chunked: tuple[str, ...] = (),
+        latency: float = 0.0,
+        capacity: int | None = None,
+        raw: dict[str, bytes | tuple[bytes, ...]] | None = None,
+        raw_pause: float = 0.05,
+    ):
+        self.pages = pages
+        self.raw = raw or {}
+        self.raw_pause = raw_pause
+        self.keep_alive = keep_alive
+        self.max_requests = max_requests
+        self.chunked = chunked
+        self.latency = latency
+        self.capacity = capacity
+        self.connections = 0
+        self.requests = 0
+        self.busy = 0
+        self.rejected = 0
+        self.base = ""
+        self._server: asyncio.Server | None = None
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.base = f"http://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        served = 0
+        try:
+            while True:
+                try:
+                    request_line = await reader.readuntil(b"\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                headers = {}
+                while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                self.requests += 1
+                path = request_line.split()[1].decode()
+                if self.capacity is not None and self.busy >= self.capacity:
+                    self.rejected += 1
+                    path = "/busy"
+                self.busy += 1
+                try:
+                    if self.latency:
+                        await asyncio.sleep(self.latency)
+                finally:
+                    self.busy -= 1
+                response = self._response(path, headers)
+                for i, part in enumerate(response if isinstance(response, tuple) else (response,)):
+                    if i:
+                        await asyncio.sleep(self.raw_pause)
+                    writer.write(part)
+                    await writer.drain()
+                served += 1
+                if not self.keep_alive or served == self.max_requests:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _response(self, path: str, headers: dict[str, str]) -> bytes | tuple[bytes, ...]:
+        if path in self.raw:
+            return self.raw[path]
+        if path == "/busy":
+            return ("HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n" + self._connection_header() + "\r\n").encode()
+        if path.startswith("/redirect"):
+            head = "HTTP/1.1 301 Moved Permanently\r\nLocation: /a\r\nContent-Length: 0\r\n"
+            return (head + self._connection_header() + "\r\n").encode()
+        page = self.pages.get(path)
+        status = "200 OK" if page is not None else "404 Not Found"
+        content_type = "text/plain" if path.endswith(".txt") else "text/html; charset=utf-8"
+        body = (page or "<h1>not found</h1>").encode()
+        head = f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n" + self._connection_header()
+        if "gzip" in headers.get("accept-encoding", ""):
+            body = gzip.compress(body)
+            head += "Content-Encoding: gzip\r\n"
+        if path in self.chunked:
+            half = len(body) // 2
+            framed = b"".join(b"%x\r\n%s\r\n" % (len(c), c) for c in (body[:half], body[half:]) if c)
+            return (head + "Transfer-Encoding: chunked\r\n\r\n").encode() + framed + b"0\r\n\r\n"
+        return (head + f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+
+    def _connection_header(self) -> str:
+        return "" if self.keep_alive else "Connection: close\r\n"
+
+
+def _site(n: int = 12) -> dict[str, str]:
+    """A small site: an index linking to n pages that link on in a ring."""
+    pages = {"/": "<html><body>" + "".join(f'<a href="/p{i}">p{i}</a>' for i in range(n)) + "</body></html>"}
+    for i in range(n):
+        pages[f"/p{i}"] = f'<p><a href="p{(i + 1) % n}#top">next</a> <a href="/">home</a></p>'
+    return pages
+
+
+# === Test Suite ===
+
+async def test_crawler():
+    graph = {
+        "https://a.com": ["https://b.com", "https://c.com"],
+        "https://b.com": ["https://d.com", "https://a.com"],
+        "https://c.com": ["https://d.com"],
+        "https://d.com": [],
+        "https://orphan.com": ["https://a.com"],
+    }
+
+    result = await crawl("https://a.com", graph, max_concurrency=2, fetch_delay=0.01)
+
+    assert len(result.visited) == 4, f"Expected 4 visited, got {len(result.visited)}"
+    assert "https://a.com" in result.visited
+    assert "https://orphan.com" not in result.visited
+    assert "https://orphan.com" in result.unreachable
+    assert ("https://b.com", "https://a.com") in result.edges
+
+    # Test with unknown links
+    graph2 = {
+        "https://start.com": ["https://missing.com"],
+    }
+    result2 = await crawl("https://start.com", graph2, max_concurrency=1, fetch_delay=0.01)
+    assert "https://start.com" in result2.visited
+    assert "https://missing.com" in result2.visited  # visited even though not in graph
+
+    # Test single node
+    result3 = await crawl("https://solo.com", {"https://solo.com": []}, max_concurrency=5, fetch_delay=0.01)
+    assert result3.visited == ["https://solo.com"]
+    assert result3.edges == []
+
+    # Test concurrency is actually limited (timing-based)
+    large_graph = {"https://root.com": [f"https://p{i}.com" for i in range(10)]}
+    for i in range(10):
+        large_graph[f"https://p{i}.com"] = []
+
+    start = time.monotonic()
+    result4 = await crawl("https://root.com", large_graph, max_concurrency=2, fetch_delay=0.1)
+    elapsed = time.monotonic() - start
+    # 11 pages, 2 at a time, 0.1s each → at least 0.5s (ceil(11/2)*0.1 = 0.6)
+    # If unlimited concurrency, would be ~0.1s
+    assert elapsed > 0.4, f"Concurrency not limited? Took only {elapsed:.2f}s"
+    assert len(result4.visited) == 11
+    print("✅ test_crawler passed")
+
+
+async def test_extract_links():
+    html = """
+        <base href="/docs/">
+        <a href="intro#s1">Intro</a> <A HREF="intro">again</A>
+        <a href="mailto:x@y.z">mail</a> <a href="https://other.org/x?q=1">x</a>
+        <area href="../up"> <a name="anchor-only">no href</a>
+    """
+    links = extract_links("http://site.test/index.html", html)
+    assert links == [
+        "http://site.test/docs/intro",
+        "https://other.org/x?q=1",
+        "http://site.test/up",
+    ], links
+    print("✅ test_extract_links passed")
+
+
+async def test_http_crawl():
+    pages = _site()
+    pages["/notes.txt"] = '<a href="/hidden">not html</a>'
+    pages["/p0"] += '<a href="/missing"></a><a href="/notes.txt"></a><a href="/redirect"></a>'
+    async with StandInServer(pages, chunked=("/p3",)) as server:
+        fetcher = HttpFetcher(connections_per_host=2)
+        async with fetcher:
+            result = await crawl(server.base + "/", max_concurrency=6, fetcher=fetcher)
+    base = server.base
+    expected = {base + "/", base + "/missing", base + "/notes.txt", base + "/redirect", base + "/a"}
+    expected |= {f"{base}/p{i}" for i in range(12)}
+    assert set(result.visited) == expected, sorted(set(result.visited) ^ expected)
+    assert len(result.visited) == len(expected), "A page was fetched twice"
+    assert (base + "/p3", base + "/p4") in result.edges, "Chunked + gzip body not parsed"
+    assert (base + "/p11", base + "/p0") in result.edges, "Relative link wrapping the ring"
+    assert (base + "/redirect", base + "/a") in result.edges, "Redirect target not followed"
+    assert base + "/hidden" not in result.visited, "Links extracted from a non-HTML body"
+    assert not result.failed, result.failed
+    # 18 pages over at most two reused connections.
+    assert server.connections <= 2, f"{server.connections} connections opened"
+    print("✅ test_http_crawl passed")
+
+
+async def test_http_pipelining():
+    async with StandInServer(_site(), latency=0.005) as server:
+        async with HttpFetcher(connections_per_host=1, pipeline_depth=4) as fetcher:
+            await fetcher.fetch(server.base + "/")  # Learn that the server keeps alive.
+            urls = [f"{server.base}/p{i}" for i in range(12)]
+            links = await asyncio.gather(*(fetcher.fetch(url) for url in urls))
+    for i, page_links in enumerate(links):
+        assert page_links[0] == f"{server.base}/p{(i + 1) % 12}", "Responses matched to wrong requests"
+    assert server.connections == 1
+    assert fetcher.max_pipelined == 4, fetcher.max_pipelined
+    print("✅ test_http_pipelining passed")
+
+
+async def test_http_connection_drops():
+    """Pipelined requests lost to a server closing the connection are retried."""
+    async with StandInServer(_site(), max_requests=3, latency=0.002) as server:
+        async with HttpFetcher(connections_per_host=2, pipeline_depth=4) as fetcher:
+            result = await crawl(server.base + "/", max_concurrency=8, fetcher=fetcher)
+    assert len(result.visited) == 13 and not result.failed, (len(result.visited), result.failed)
+    assert server.connections >= 5  # 13 responses at three per connection.
+    print("✅ test_http_connection_drops passed")
+
+
+async def test_http_no_keep_alive():
+    async with StandInServer(_site(4), keep_alive=False) as server:
+        async with HttpFetcher(connections_per_host=2) as fetcher:
+            result = await crawl(server.base + "/", max_concurrency=4, fetcher=fetcher)
+    assert len(result.visited) == 5 and not result.failed
+    assert server.connections == 5, "Each page needs its own connection"
+    assert fetcher.max_pipelined == 1, "Pipelined to a server that closes connections"
+    print("✅ test_http_no_keep_alive passed")
+
+
+async def test_http_fetch_errors():
+    async with StandInServer({}) as server:
+        port = server.base.rsplit(":", 1)[1]
+    # The server is gone: connecting is refused.
+    async with HttpFetcher(timeout=2.0) as fetcher:
+        result = await crawl(f"http://127.0.0.1:{port}/", fetcher=fetcher)
+        try:
+            await fetcher.fetch("ftp://example.com/")
+            assert False, "Unsupported scheme should raise"
+        except FetchError:
+            pass
+    assert result.visited == [] and list(result.failed) == [f"http://127.0.0.1:{port}/"]
+    print("✅ test_http_fetch_errors passed")
+
+
+async def test_http_bad_pages():
+    """Odd links and broken responses fail their own page, not the crawl."""
+    bad_deflate = b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Encoding: deflate\r\nContent-Length: 4\r\n\r\n\xff\xfe\xfd\xfc"
+    long_header = b"HTTP/1.1 200 OK\r\nX-Pad: " + b"x" * 100_000 + b"\r\nContent-Length: 0\r\n\r\n"
+    pages = {
+        "/": '<a href="/日本">jp</a> <a href="/a b?q=ü">space</a> <a href="/deflate"></a> <a href="/header"></a>'
+             '<a href="/marked"></a> <a href="http://[oops/">skipped</a>',
+        "/%E6%97%A5%E6%9C%AC": "<p>nihon</p>",
+        "/a%20b?q=%C3%BC": "<p>escaped</p>",
+        "/marked": "<a href='/x'>x</a><![foo[ bar",
+    }
+    raw = {"/deflate": bad_deflate, "/header": long_header}
+    async with StandInServer(pages, raw=raw) as server:
+        async with HttpFetcher() as fetcher:
+            result = await crawl(server.base + "/", max_concurrency=4, fetcher=fetcher)
+            assert await fetcher.fetch(server.base + "/日本") == []
+    base = server.base
+    assert set(result.failed) == {base + "/deflate", base + "/header", base + "/marked"}, result.failed
+    assert {base + "/日本", base + "/a b?q=ü"} <= set(result.visited), result.visited
+
+    # No Content-Length: the body ends when the server closes, not with the first packet.
+    head = b"HTTP/1.0 200 OK\r\nContent-Type: text/html\r\n\r\n"
+    raw = {"/slow": (head + b"<a href='/one'>", b"<a href='/two'>"), "/big": (head + b"x" * 600, b"x" * 600)}
+    async with StandInServer({}, keep_alive=False, raw=raw) as server:
+        async with HttpFetcher(max_body=1000) as fetcher:
+            assert await fetcher.fetch(server.base + "/slow") == [server.base + "/one", server.base + "/two"]
+            try:
+                await fetcher.fetch(server.base + "/big")
+                assert False, "A body past max_body should fail"
+            except FetchError:
+                pass
+    print("✅ test_http_bad_pages passed")
+
+
+async def test_http_overload():
+    async with StandInServer(_site(12), latency=0.005, capacity=1) as server:
+        limits = AdaptiveConcurrency(max_per_host=4, initial_per_host=4, retries=8)
+        async with HttpFetcher(connections_per_host=4, pipeline_depth=1) as fetcher:
+            result = await crawl(server.base + "/", fetcher=fetcher, adaptive=limits)
+            try:
+                await fetcher.fetch(server.base + "/busy")
+                assert False, "503 should raise"
+            except OverloadError:
+                pass
+    assert len(result.visited) == 13 and not result.failed, result.failed
+    assert server.rejected, "Four connections against a capacity of one should be turned away"
+    assert limits.host_limit(host_of(server.base)) < 4, "503s should lower the host's limit"
+    print("✅ test_http_overload passed")
+
+
+class _RecordingFetcher(GraphFetcher):
+    """GraphFetcher that logs fetch start times and per-host concurrency."""
+
+    def __init__(self, graph: dict[str, list[str]], delay: float):
+        super().__init__(graph, delay)
+        self.starts: dict[str, list[float]] = {}
+        self.active: dict[str, int] = {}
+        self.max_active: dict[str, int] = {}
+        self.total = 0
+        self.max_total = 0
+
+    async def fetch(self, url: str) -> list[str]:
+        host = host_of(url)
+        self.starts.setdefault(host, []).append(time.monotonic())
+        self.active[host] = self.active.get(host, 0) + 1
+        self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+        self.total += 1
+        self.max_total = max(self.max_total, self.total)
+        try:
+            return await super().fetch(url)
+        finally:
+            self.active[host] -= 1
+            self.total -= 1
+
+
+async def test_frontier_round_robin():
+    frontier = HostFrontier(max_per_host=10)
+    for url in ("http://a/1", "http://a/2", "http://a/3", "http://b/1", "http://b/2", "http://c/1"):
+        frontier.add(url)
+    order = [await frontier.get() for _ in range(6)]
+    assert order == ["http://a/1", "http://b/1", "http://c/1", "http://a/2", "http://b/2", "http://a/3"], order
+    for url in order:
+        frontier.done(url)
+    assert await frontier.get() is None
+    assert not frontier._hosts, "Idle hosts should be forgotten"
+    print("✅ test_frontier_round_robin passed")
+
+
+async def test_per_host_cap():
+    """One big host can't take every worker; the others keep them busy."""
+    graph = {"http://big.com/": [f"http://big.com/{i}" for i in range(20)]}
+    graph["http://big.com/"] += [f"http://h{i}.com/" for i in range(20)]
+    fetcher = _RecordingFetcher(graph, delay=0.01)
+    result = await crawl("http://big.com/", graph, max_concurrency=8, fetcher=fetcher, max_per_host=2)
+    assert len(result.visited) == 41
+    assert fetcher.max_active["big.com"] == 2, fetcher.max_active
+    assert fetcher.max_total >= 6, f"Workers idled: at most {fetcher.max_total} in flight"
+    print("✅ test_per_host_cap passed")
+
+
+async def test_host_delay():
+    """Fetches to one host start host_delay apart; other hosts fill the gaps."""
+    graph = {"http://slow.com/": [f"http://slow.com/{i}" for i in range(4)]}
+    graph["http://slow.com/"] += [f"http://h{i}.com/" for i in range(8)]
+    fetcher = _RecordingFetcher(graph, delay=0.005)
+    start = time.monotonic()
+    result = await crawl("http://slow.com/", graph, max_concurrency=4, fetcher=fetcher, host_delay=0.05)
+    elapsed = time.monotonic() - start
+    assert len(result.visited) == 13
+    starts = fetcher.starts["slow.com"]
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert all(g >= 0.049 for g in gaps), f"Host delay violated: {gaps}"
+    # Four gaps of 50ms on slow.com; the other eight hosts ride alongside.
+    assert elapsed < 0.4, f"Other hosts waited on slow.com: {elapsed:.2f}s"
+    print("✅ test_host_delay passed")
+
+
+async def test_canonicalize():
+    cases = {
+        "HTTP://Example.COM:80": "http://example.com/",
+        "https://example.com:443/a/./b/../c#frag": "https://example.com/a/c",
+        "http://example.com:8080/%7euser/%2f?q=%3a": "http://example.com:8080/~user/%2F?q=%3A",
+        "http://example.com/a/b/..": "http://example.com/a/",
+        "http://bücher.de/": "http://xn--bcher-kva.de/",
+        "http://user@Host.com/x": "http://user@host.com/x",
+    }
+    for url, expected in cases.items():
+        assert canonicalize(url) == expected, (url, canonicalize(url))
+    assert url_fingerprint("http://a.com") == url_fingerprint("http://A.com:80/#top")
+    assert url_fingerprint("http://a.com/x") != url_fingerprint("http://a.com/y")
+    print("✅ test_canonicalize passed")
+
+
+async def test_fingerprint_table():
+    rng = random.Random(5)
+    table = FingerprintTable()
+    keys = [rng.getrandbits(64) | 1 for _ in range(50_000)]
+    for i, key in enumerate(keys):
+        table.put(key, i)
+    assert len(table) == len(keys)
+    assert all(table.get(key) == i for i, key in enumerate(keys))
+    assert sum(table.get(rng.getrandbits(64) | 1) >= 0 for _ in range(10_000)) == 0
+    assert table.nbytes <= 3 * 12 * len(keys), "Table should stay at least 1/3 full"
+    print("✅ test_fingerprint_table passed")
+
+
+async def test_url_index_compact():
+    for bloom in (False, True):
+        index = UrlIndex(expected=100_000, bloom=bloom)
+        for i in range(100_000):
+            assert index.intern(f"https://host{i % 997}.example.com/page/{i}") == (i, True)
+        assert index.intern("HTTPS://host5.example.com:443/page/5#x") == (5, False)
+        assert index.urls[5] == "https://host5.example.com/page/5"
+        assert "https://host6.example.com/page/6" in index
+        assert "https://host6.example.com/page/7" not in index
+        per_url = index.nbytes / len(index)
+        # ~38 bytes of text, 8 of offset, ~31 of table (+1.2 of Bloom); a
+        # set of str alone would be ~120.
+        assert per_url < 80, f"{per_url:.1f} bytes per URL"
+    bloom = BloomFilter(10_000, error_rate=0.01)
+    for key in range(1, 10_001):
+        bloom.add(url_fingerprint(f"http://x/{key}"))
+    misses = sum(url_fingerprint(f"http://y/{key}") in bloom for key in range(10_000))
+    assert misses < 300, f"False positive rate {misses / 10_000:.2%}"
+    print("✅ test_url_index_compact passed")
+
+
+async def test_crawl_dedups_spellings():
+    graph = {
+        "http://a.com": ["http://A.com:80/x#top", "http://a.com/./x", "http://b.com/"],
+        "http://A.com:80/x#top": ["http://a.com/"],
+        "http://b.com/": [],
+    }
+    result = await crawl("http://a.com", graph, max_concurrency=2, fetch_delay=0)
+    assert sorted(result.visited) == ["http://A.com:80/x#top", "http://a.com", "http://b.com/"]
+    assert len(result.urls) == 3 and len(result.edges) == 4
+    assert ("http://A.com:80/x#top", "http://a.com") in result.edges
+    assert result.edge_src.itemsize == 4 and result.unreachable == set()
+    print("✅ test_crawl_dedups_spellings passed")
+
+
+def _random_graph(pages: int, hosts: int, links: int = 4, seed: int = 3) -> dict[str, list[str]]:
+    rng = random.Random(seed)
+    urls = [f"http://h{i % hosts}.com/{i}" for i in range(pages)]
+    return {url: [urls[rng.randrange(pages)] for _ in range(links)] + [urls[(i + 1) % pages]]
+            for i, url in enumerate(urls)}
+
+
+class _CountingFetcher(GraphFetcher):
+    """GraphFetcher that counts fetches and can crash after `crash_after` of them."""
+
+    def __init__(self, graph: dict[str, list[str]], delay: float = 0.0, crash_after: int | None = None):
+        super().__init__(graph, delay)
+        self.fetched: list[str] = []
+        self.crash_after = crash_after
+
+    async def fetch(self, url: str) -> list[str]:
+        if self.crash_after is not None and len(self.fetched) >= self.crash_after:
+            raise _Crash
+        self.fetched.append(url)
+        return await super().fetch(url)
+
+
+class _Crash(Exception):
+    pass
+
+
+def _summary(result: CrawlResult) -> tuple[list[str], list[tuple[str, str]]]:
+    return sorted(result.visited), sorted(result.edges)
+
+
+class _LoadedFetcher(GraphFetcher):
+    """
+    A web whose hosts answer 503 to more than `capacity` concurrent
+    fetches, and which slows down in proportion past `shared` fetches in
+    flight overall.
+    """
+
+    def __init__(self, graph: dict[str, list[str]], delay: float, capacity: int, shared: int):
+        super().__init__(graph, delay)
+        self.capacity = capacity
+        self.shared = shared
+        self.active: dict[str, int] = {}
+        self.total = 0
+        self.max_active = 0
+        self.overloads = 0
+
+    async def fetch(self, url: str) -> list[str]:
+        host = host_of(url)
+        if self.active.get(host, 0) >= self.capacity:
+            self.overloads += 1
+            await asyncio.sleep(self.delay)
+            raise OverloadError(f"{url}: HTTP 503")
+        self.active[host] = self.active.get(host, 0) + 1
+        self.max_active = max(self.max_active, self.active[host])
+        self.total += 1
+        try:
+            return await fetch_page(url, self.graph, self.delay * max(1.0, self.total / self.shared))
+        finally:
+            self.active[host] -= 1
+            self.total -= 1
+
+
+async def test_adaptive_limits():
+    limits = AdaptiveConcurrency(max_concurrency=10, max_per_host=4, initial_concurrency=2, window=10)
+    for _ in range(200):
+        limits.record("a", 0.01, None, saturated=True, host_saturated=True)
+    assert limits.limit == 10 and limits.host_limit("a") == 4, "Additive increase stops at the bounds"
+    limits.record("b", 0.01, None, saturated=False, host_saturated=False)
+    assert limits.host_limit("b") == 2, "A limit that isn't used shouldn't grow"
+
+    limits.record("a", 0.5, OverloadError("busy"), saturated=True, host_saturated=True)
+    assert limits.host_limit("a") == 2 and limits.limit == 10, "One overload halves its host only"
+    limits.record("a", 0.5, OverloadError("busy"), saturated=True, host_saturated=True)
+    assert limits.host_limit("a") == 2, "At most one decrease per round trip"
+    assert limits.limit == 5, "An error rate above the threshold halves the global limit"
+
+    limits.record("c", 0.01, None, saturated=True, host_saturated=True)
+    limits.record("c", 0.05, None, saturated=True, host_saturated=True)
+    assert limits.host_limit("c") == 1, "5x the host's baseline latency is congestion"
+    limits.forget("c")
+    limits.forget("b")
+    assert limits.host_limit("c") == 1, "A host still held back is remembered"
+
+    slow = AdaptiveConcurrency(initial_concurrency=16, window=5)
+    for i in range(20):
+        slow.record(f"h{i}", 0.01, None, saturated=True, host_saturated=False)
+    for i in range(20):
+        slow.record(f"h{i}", 0.03, None, saturated=True, host_saturated=False)
+    assert slow.limit < 16 and slow.decreases, "Every host slowing down at once cuts the global limit"
+    print("✅ test_adaptive_limits passed")
+
+
+async def test_adaptive_crawl():
+    graph = _random_graph(600, hosts=6)
+    root = next(iter(graph))
+    expected = _summary(await crawl(root, graph, max_concurrency=8, fetch_delay=0))
+    fetcher = _LoadedFetcher(graph, delay=0.002, capacity=3, shared=8)
+    limits = AdaptiveConcurrency(max_concurrency=48, max_per_host=8, retries=5)
+    result = await crawl(root, fetcher=fetcher, adaptive=limits)
+    assert _summary(result) == expected and not result.failed, "Overloaded fetches should be retried"
+    assert fetcher.max_active == 3, "Hosts should be probed up to their capacity"
+    assert fetcher.overloads < len(graph) / 5, f"{fetcher.overloads} overloads: AIMD did not back off"
+    assert limits.decreases and limits.limit <= 20, "Latency past 8 in flight should hold the global limit back"
+    print("✅ test_adaptive_crawl passed")
+
+
+async def test_spill_queue():
+    with tempfile.TemporaryDirectory() as directory:
+        spill = SpillQueue(directory, segment_lines=4)
+        for i in range(10):
+            spill.push(f"http://x/{i}")
+        assert spill.pop(3) == ["http://x/0", "http://x/1", "http://x/2"]
+        saved = spill.checkpoint()
+        spill.push("http://x/lost")  # After the checkpoint.
+        assert spill.pop(3) == ["http://x/3", "http://x/4", "http://x/5"]
+        spill.close()  # Crash: no newer checkpoint, so nothing was released.
+        spill = SpillQueue(directory, segment_lines=4, saved=saved)
+        assert len(spill) == 7
+        spill.push("http://x/10")
+        assert spill.pop(100) == [f"http://x/{i}" for i in range(3, 11)]
+        spill.checkpoint()
+        spill.release()
+        assert os.listdir(directory) == ["spill-000002.txt"], os.listdir(directory)
+        spill.close()
+    print("✅ test_spill_queue passed")
+
+
+async def test_crawl_spills_to_disk():
+    graph = _random_graph(600, hosts=30)
+    root = next(iter(graph))
+    expected = _summary(await crawl(root, graph, max_concurrency=8, fetch_delay=0))
+    with tempfile.TemporaryDirectory() as directory:
+        result = await crawl(
+            root, graph, max_concurrency=8, fetch_delay=0, state_dir=directory, memory_urls=40,
+        )
+        segments = [name for name in os.listdir(directory) if name.endswith(".seg")]
+        assert _summary(result) == expected
+        assert len(segments) >= 10, f"Seen set never spilled: {segments}"
+        with open(os.path.join(directory, CrawlState.MANIFEST)) as f:
+            spill = json.load(f)["spill"]
+        assert spill["next"] >= 1 and spill["length"] == 0, f"Frontier never spilled: {spill}"
+    print("✅ test_crawl_spills_to_disk passed")
+
+
+async def test_crawl_resumes_after_crash():
+    graph = _random_graph(400, hosts=20)
+    root = next(iter(graph))
+    expected = _summary(await crawl(root, graph, max_concurrency=4, fetch_delay=0))
+    with tempfile.TemporaryDirectory() as directory:
+        options = dict(max_concurrency=4, state_dir=directory, memory_urls=50, checkpoint_interval=0.01)
+        first = _CountingFetcher(graph, delay=0.001, crash_after=250)
+        try:
+            await crawl(root, fetcher=first, **options)
+            assert False, "The crawl should have crashed"
+        except _Crash:
+            pass
+        with open(os.path.join(directory, CrawlState.MANIFEST)) as f:
+            checkpointed = json.load(f)["visited"]
+        assert 0 < checkpointed <= 250, checkpointed
+
+        second = _CountingFetcher(graph)
+        result = await crawl(root, fetcher=second, **options)
+        assert _summary(result) == expected, "Resumed crawl differs from an uninterrupted one"
+        assert len(second.fetched) == len(expected[0]) - checkpointed, "Completed pages fetched again"
+        assert len(set(result.visited)) == len(result.visited)
+
+        third = _CountingFetcher(graph)
+        again = await crawl(root, fetcher=third, **options)
+        assert not third.fetched and _summary(again) == expected, "A finished crawl should stay finished"
+        try:
+            await crawl("http://h1.com/1", fetcher=_CountingFetcher(graph), **options)
+            assert False, "A different root should not get the old crawl's result"
+        except ValueError as exc:
+            assert root in str(exc), exc
+    print("✅ test_crawl_resumes_after_crash passed")
+
+
+async def test_state_dir_keeps_foreign_files():
+    graph = _random_graph(50, hosts=5)
+    root = next(iter(graph))
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "project", "src"))
+        for name in ("notes.txt", "spill-notes.txt", "frontier-000001.txt", ".tmp-abc"):
+            with open(os.path.join(directory, name), "w") as f:
+                f.write("x")
+        await crawl(root, graph, fetch_delay=0, state_dir=directory)
+        left = set(os.listdir(directory))
+        assert {"notes.txt", "spill-notes.txt", "project"} <= left, left
+        assert os.path.isdir(os.path.join(directory, "project", "src"))
+        assert ".tmp-abc" not in left, "Stray state files should still be cleaned up"
+    print("✅ test_state_dir_keeps_foreign_files passed")
+
+
+async def test_sharded_matches_single_process():
+    graph = _random_graph(500, hosts=40)
+    graph["http://h0.com/0"].append("https://missing.com")
+    graph["http://orphan.com/"] = ["http://h1.com/1"]
+    root = "http://h0.com/0"
+    single = await crawl(root, graph, max_concurrency=8, fetch_delay=0)
+    for shards in (1, 3):
+        sharded = await crawl_sharded(root, graph, shards=shards, max_concurrency=4, fetch_delay=0, batch_size=16)
+        assert _summary(sharded) == _summary(single), f"{shards} shards differ from one process"
+        assert sharded.unreachable == single.unreachable == {"http://orphan.com/"}
+        assert len(sharded.urls) == len(single.urls), "URL table not deduplicated across shards"
+    adaptive = AdaptiveConcurrency(max_concurrency=4)
+    sharded = await crawl_sharded(root, graph, shards=2, fetch_delay=0, adaptive=adaptive)
+    assert _summary(sharded) == _summary(single), "Adaptive shards differ from one process"
+    owners = {shard_of(url, 3) for url in single.visited}
+    assert owners == {0, 1, 2}, "Every shard should own some of the 40 hosts"
+    print("✅ test_sharded_matches_single_process passed")
+
+
+def _crashing_fetcher(graph: dict[str, list[str]]) -> Fetcher:
+    return _CountingFetcher(graph, crash_after=5)
+
+
+async def test_sharded_failure_propagates():
+    graph = _random_graph(200, hosts=10)
+    try:
+        await crawl_sharded("http://h0.com/0", graph, shards=2, fetcher_factory=partial(_crashing_fetcher, graph))
+        assert False, "A crashing shard should fail the crawl"
+    except ShardFailedError as exc:
+        assert "_Crash" in str(exc), exc
+    print("✅ test_sharded_failure_propagates passed")
+
+
+async def test_sharded_termination():
+    # W (0) gets the root and sends a batch to X (1), which passes one on
+    # to Y (2) before reporting again: the idle reports balance while X is busy.
+    term = _Termination(3)
+    assert term.report(1, True, 0, 0) is None
+    assert term.report(0, True, 1, 1) is None
+    assert term.report(2, True, 0, 1) == "probe", "Balanced idle reports should start a wave"
+    assert term.report(0, True, 1, 1, wave=1) is None
+    assert term.report(1, False, 1, 1, wave=1) is None
+    assert term.report(2, True, 0, 1, wave=1) is None, "A busy shard must not end the crawl"
+    assert term.report(1, True, 1, 1) == "probe"
+    for shard, counts in enumerate([(1, 1), (1, 1), (0, 1)]):
+        action = term.report(shard, True, *counts, wave=2)
+    assert action == "probe", "One idle, balanced wave is not enough"
+    # Y received another batch between the waves: the counts differ, so probe again.
+    for shard, counts in enumerate([(2, 1), (1, 1), (0, 2)]):
+        action = term.report(shard, True, *counts, wave=3)
+    assert action == "probe", action
+    for shard, counts in enumerate([(2, 1), (1, 1), (0, 2)]):
+        action = term.report(shard, True, *counts, wave=4)
+    assert action == "stop", "Two identical idle, balanced waves end the crawl"
+    assert term.report(0, True, 2, 1) is None
+    print("✅ test_sharded_termination passed")
+
+
+async def test_stream_matches_crawl():
+    graph = _random_graph(300, hosts=15)
+    graph["http://h0.com/0"].append("https://missing.com")
+    root = "http://h0.com/0"
+    expected = _summary(await crawl(root, graph, max_concurrency=6, fetch_delay=0))
+    records = [record async for record in crawl_stream(root, graph, max_concurrency=6, fetch_delay=0)]
+    edges = sorted((record.url, link) for record in records for link in record.links)
+    assert (sorted(record.url for record in records), edges) == expected
+    assert all(record.error is None for record in records)
+    print("✅ test_stream_matches_crawl passed")
+
+
+async def test_stream_backpressure():
+    """A slow consumer holds the crawl back instead of piling up records."""
+    graph = _random_graph(200, hosts=20)
+    fetcher = _CountingFetcher(graph)
+    consumed = 0
+    lead = 0
+    async for _ in crawl_stream("http://h0.com/0", fetcher=fetcher, max_concurrency=4, buffer=3):
+        consumed += 1
+        lead = max(lead, len(fetcher.fetched) - consumed)
+        await asyncio.sleep(0.001)
+    assert consumed == len(fetcher.fetched) == 200
+    # The buffer, plus one page per worker blocked on handing over.
+    assert lead <= 3 + 4, f"Fetching ran {lead} pages ahead of the consumer"
+
+    stream = crawl_stream("http://h0.com/0", graph, fetch_delay=0)
+    async for _ in stream:
+        break
+    await stream.aclose()  # Stops the workers; nothing left running.
+    assert len(asyncio.all_tasks()) == 1
+
+    # Leaving a stream whose buffer is full, with workers blocked handing over.
+    root = "http://wide.com/"
+    wide = {root: [f"{root}{i}" for i in range(50)], **{f"{root}{i}": [] for i in range(50)}}
+    stream = crawl_stream(root, wide, max_concurrency=4, fetch_delay=0, buffer=1)
+    async for record in stream:
+        await asyncio.sleep(0.01)  # Let the workers fill the buffer.
+        if record.url != root:
+            break
+    await asyncio.wait_for(stream.aclose(), 3)
+    assert len(asyncio.all_tasks()) == 1
+    print("✅ test_stream_backpressure passed")
+
+
+async def test_stream_outputs():
+    graph = _random_graph(150, hosts=10)
+    graph["http://h0.com/0"].append("ftp://not-fetchable")
+    fetcher = GraphFetcher(graph, 0)
+
+    class FailingFetcher(Fetcher):
+        async def fetch(self, url):
+            if url.startswith("ftp:"):
+                raise FetchError("unsupported")
+            return await fetcher.fetch(url)
+
+    root = "http://h0.com/0"
+    expected = await crawl(root, fetcher=FailingFetcher(), max_concurrency=4)
+    with tempfile.TemporaryDirectory() as directory:
+        ndjson = os.path.join(directory, "pages.ndjson")
+        async for _ in crawl_stream(root, fetcher=FailingFetcher(), output=ndjson):
+            pass
+        with open(ndjson, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        ok = [row for row in rows if "error" not in row]
+        assert sorted(row["url"] for row in ok) == sorted(expected.visited)
+        assert sorted((row["url"], link) for row in ok for link in row["links"]) == sorted(expected.edges)
+        assert {row["url"]: row["error"] for row in rows if "error" in row} == {"ftp://not-fetchable": "unsupported"}
+
+        columns = os.path.join(directory, "columns")
+        async for _ in crawl_stream(root, fetcher=FailingFetcher(), output=columns, output_format="columnar"):
+            pass
+        loaded = read_columnar(columns)
+        assert _summary(loaded) == _summary(expected)
+        assert loaded.failed == expected.failed
+        loaded.urls.close()
+    print("✅ test_stream_outputs passed")
+
+
+async def test_generate_web_graph():
+    graph = generate_web_graph(5_000, seed=7)
+    assert graph == generate_web_graph(5_000, seed=7), "Not deterministic"
+    degrees = sorted(len(links) for links in graph.values())
+    mean = sum(degrees) / len(degrees)
+    assert 6 < mean < 12 and degrees[-1] > 8 * mean, "Out-degree should be heavy-tailed"
+    hosts: dict[str, int] = {}
+    for url in graph:
+        hosts[host_of(url)] = hosts.get(host_of(url), 0) + 1
+    assert max(hosts.values()) > 20 * len(graph) / len(hosts), "Host sizes should be skewed"
+    dangling = {link for links in graph.values() for link in links if link not in graph}
+    assert dangling and all("missing" in link for link in dangling)
+
+    result = await crawl(next(iter(graph)), graph, max_concurrency=32, fetch_delay=0)
+    assert len(result.unreachable) == 50, "The 1% orphans are unreachable"
+    visited = set(result.visited)
+    assert visited - set(graph) <= dangling and visited & dangling, "Dangling links are fetched (and fail)"
+    assert visited >= set(graph) - result.unreachable
+    print("✅ test_generate_web_graph passed")
+
+
+TESTS = [
+    test_crawler,
+    test_frontier_round_robin,
+    test_per_host_cap,
+    test_host_delay,
+    test_canonicalize,
+    test_fingerprint_table,
+    test_url_index_compact,
+    test_crawl_dedups_spellings,
+    test_spill_queue,
+    test_crawl_spills_to_disk,
+    test_crawl_resumes_after_crash,
+    test_state_dir_keeps_foreign_files,
+    test_sharded_matches_single_process,
+    test_sharded_failure_propagates,
+    test_sharded_termination,
+    test_stream_matches_crawl,
+    test_stream_backpressure,
+    test_stream_outputs,
+    test_generate_web_graph,
+    test_adaptive_limits,
+    test_adaptive_crawl,
+    test_extract_links,
+    test_http_crawl,
+    test_http_pipelining,
+    test_http_connection_drops,
+    test_http_no_keep_alive,
+    test_http_fetch_errors,
+    test_http_bad_pages,
+    test_http_overload,
+]
+
+
+def main():
+    for test in TESTS:
+        asyncio.run(test())
+    print("\n🎉 All tests passed!")
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        args = sys.argv[sys.argv.index("--bench") + 1:]
+        run_benchmark(float(args[0]) if args else 1.0)
+    else:
+        main()